@@ -4,20 +4,14 @@ from __future__ import annotations
 
 from pathlib import Path
 import json
-import re
-import unicodedata
+import os
 from difflib import SequenceMatcher
 from typing import Dict, List
 
+from .normalize import normalize_many, normalize_text
 
-def normalize_text(text: str) -> str:
-    """Return lowercase ASCII text without punctuation or extra spaces."""
-    text_norm = unicodedata.normalize("NFKD", text)
-    ascii_text = text_norm.encode("ascii", "ignore").decode("ascii")
-    lowered = ascii_text.lower()
-    no_punct = re.sub(r"[^\w\s]", "", lowered)
-    collapsed = re.sub(r"\s+", " ", no_punct)
-    return collapsed.strip()
+# Record fields compared by :meth:`ComplaintStore.search`
+SEARCH_FIELDS = ["complaint", "customer", "subject", "part_code"]
 
 
 class ComplaintStore:
@@ -43,24 +37,36 @@ class ComplaintStore:
         with open(self.path, "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
 
-    def search(self, keyword: str) -> List[Dict[str, str]]:
-        """Return complaint records fuzzy-matching ``keyword``."""
-        if not self.path.exists():
+    @staticmethod
+    def _read_array(path: Path) -> List[Dict[str, str]]:
+        """Return the records of a JSON array file, or an empty list."""
+        if not path.exists():
             return []
 
-        with open(self.path, "r", encoding="utf-8") as f:
+        with open(path, "r", encoding="utf-8") as f:
             try:
-                items: List[Dict[str, str]] = json.load(f)
+                data = json.load(f)
             except json.JSONDecodeError:
                 return []
+        return data if isinstance(data, list) else []
 
+    def _load_items(self) -> List[Dict[str, str]]:
+        """Return all stored complaint records."""
+        return self._read_array(self.path)
+
+    @staticmethod
+    def _match(items: List[Dict[str, str]], keyword: str) -> List[Dict[str, str]]:
+        """Return the records of ``items`` fuzzy-matching ``keyword``."""
         keyword_norm = normalize_text(keyword)
         results = []
+        columns = [
+            normalize_many([str(item.get(field, "")) for item in items])
+            for field in SEARCH_FIELDS
+        ]
 
-        for item in items:
-            for field in ["complaint", "customer", "subject", "part_code"]:
-                value = str(item.get(field, ""))
-                value_norm = normalize_text(value)
+        for row, item in enumerate(items):
+            for column in columns:
+                value_norm = column[row]
                 if keyword_norm in value_norm:
                     results.append(item)
                     break
@@ -70,7 +76,49 @@ class ComplaintStore:
                     break
         return results
 
+    def search(self, keyword: str) -> List[Dict[str, str]]:
+        """Return complaint records fuzzy-matching ``keyword``."""
+        return self._match(self._load_items(), keyword)
+
 
 from .claims_excel import ExcelClaimsSearcher
+from .jsonl_store import JsonlComplaintStore
+from .sqlite_store import SQLiteComplaintStore
+
+# Environment variable selecting the backend used by :func:`create_store`
+STORE_BACKEND_ENV = "COMPLAINT_STORE_BACKEND"
+
+
+def create_store(
+    backend: str | None = None, path: str | Path | None = None
+) -> ComplaintStore:
+    """Return a complaint store for ``backend``.
+
+    ``backend`` is ``"json"``, ``"jsonl"`` or ``"sqlite"`` and defaults to
+    ``COMPLAINT_STORE_BACKEND`` and then ``"json"``. The ``"jsonl"`` and
+    ``"sqlite"`` backends migrate a JSON array store with the same base
+    name the first time their file is created.
+    """
+    if backend is None:
+        backend = os.getenv(STORE_BACKEND_ENV, "json")
+    backend = backend.lower()
+    if backend == "json":
+        return ComplaintStore(path or "complaints.json")
+    if backend == "jsonl":
+        path = Path(path or "complaints.jsonl")
+        return JsonlComplaintStore(path, legacy_path=path.with_suffix(".json"))
+    if backend == "sqlite":
+        path = Path(path or "complaints.db")
+        return SQLiteComplaintStore(path, legacy_path=path.with_suffix(".json"))
+    raise ValueError(f"Unknown complaint store backend: {backend}")
+
 
-__all__ = ["ComplaintStore", "ExcelClaimsSearcher"]
+__all__ = [
+    "ComplaintStore",
+    "ExcelClaimsSearcher",
+    "JsonlComplaintStore",
+    "SQLiteComplaintStore",
+    "create_store",
+    "normalize_many",
+    "normalize_text",
+]
@@ -2,34 +2,209 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, Iterable, List, Tuple
+from typing import Any, Dict, Iterable, List, Set, Tuple
+from collections import Counter
+from itertools import islice
 from pathlib import Path
-from datetime import datetime
+import hashlib
+import heapq
+from datetime import date, datetime, time, timedelta
+import json
 import os
 import logging
 
-from difflib import SequenceMatcher
 from openpyxl import load_workbook
 
 # Normalized header names considered as date columns
 DATE_KEYS = {"date", "tarih", "hata tarihi"}
 
-from . import normalize_text
+# Bump when the persisted layout of :class:`ClaimsTable` changes
+CACHE_VERSION = 2
+# Tags of cell types that JSON cannot represent natively
+CELL_TYPES = {
+    "datetime": datetime.fromisoformat,
+    "date": date.fromisoformat,
+    "time": time.fromisoformat,
+    "timedelta": lambda value: timedelta(seconds=float(value)),
+}
+
+# Minimum ``SequenceMatcher`` ratio for a fuzzy filter match
+FUZZY_CUTOFF = 0.8
+
+from .normalize import normalize_many, normalize_text
+from .trigram_index import TrigramIndex
+
+logger = logging.getLogger(__name__)
+
+
+class ClaimsTable:
+    """Column-oriented snapshot of the rows below the header of a workbook."""
+
+    def __init__(self, headers: List[str], columns: List[List[Any]]) -> None:
+        self.headers = headers
+        self.columns = columns
+        self.indices = {normalize_text(h): idx for idx, h in enumerate(headers)}
+        self.row_count = len(columns[0]) if columns else 0
+        self._indexes: Dict[int, TrigramIndex] = {}
+        self._facets: Dict[int, Dict[str, int]] = {}
+        self.date_key = next((k for k in DATE_KEYS if k in self.indices), None)
+        # Row ids partitioned by the year of the date column
+        self.years: Dict[int, List[int]] = {}
+        self.undated: List[int] = []
+        self.yearless: List[int] = []
+        # Rows whose date text cannot be parsed; they never match a search
+        self.invalid: Set[int] = set()
+        if self.date_key is not None:
+            self._index_years(self.columns[self.indices[self.date_key]])
+
+    def _index_years(self, values: List[Any]) -> None:
+        """Parse the date column once and partition its rows by year.
+
+        Empty cells pass every year filter and values without a year only
+        pass range filters. Text that is not an ISO date is left out of
+        every partition, so such rows never appear in results.
+        """
+        for row, value in enumerate(values):
+            if value is None:
+                self.undated.append(row)
+                continue
+            if isinstance(value, str):
+                try:
+                    value = datetime.fromisoformat(value)
+                except ValueError:
+                    self.invalid.add(row)
+                    continue
+            yr = getattr(value, "year", None)
+            if yr is None:
+                self.yearless.append(row)
+            else:
+                self.years.setdefault(yr, []).append(row)
+        if self.invalid:
+            logger.warning(
+                "Skipping %d claims rows with unparseable %r values",
+                len(self.invalid),
+                self.date_key,
+            )
+
+    def rows_in_years(
+        self,
+        year: int | None = None,
+        start_year: int | None = None,
+        end_year: int | None = None,
+    ) -> Set[int] | None:
+        """Return rows passing the year constraints, or ``None`` for all rows.
+
+        ``year`` takes precedence over ``start_year``/``end_year``. Only the
+        partitions inside the requested range are visited. Without any
+        constraint no set is built; rows in :attr:`invalid` must still be
+        left out by the caller.
+        """
+        if self.date_key is None or (
+            year is None and start_year is None and end_year is None
+        ):
+            return None
+        rows = set(self.undated)
+        if year is not None:
+            rows.update(self.years.get(year, ()))
+            return rows
+        rows.update(self.yearless)
+        for yr, partition in self.years.items():
+            if start_year is not None and yr < start_year:
+                continue
+            if end_year is not None and yr > end_year:
+                continue
+            rows.update(partition)
+        return rows
+
+    def trigram_index(self, idx: int) -> TrigramIndex:
+        """Return the lazily built index over normalized values of column ``idx``."""
+        index = self._indexes.get(idx)
+        if index is None:
+            index = TrigramIndex(normalize_many([str(v) for v in self.columns[idx]]))
+            self._indexes[idx] = index
+        return index
+
+    def facet_counts(self, columns: List[int]) -> Dict[int, Dict[str, int]]:
+        """Return value counts for ``columns``, computing missing ones in one pass.
+
+        Values are stripped string forms of non-empty cells, sorted by value.
+        """
+        missing = sorted({idx for idx in columns if idx not in self._facets})
+        if missing:
+            counters: List[Counter[str]] = [Counter() for _ in missing]
+            selected = [self.columns[idx] for idx in missing]
+            for row in range(self.row_count):
+                for counter, column in zip(counters, selected):
+                    val = column[row]
+                    if val is None:
+                        continue
+                    text = str(val).strip()
+                    if text:
+                        counter[text] += 1
+            for idx, counter in zip(missing, counters):
+                self._facets[idx] = dict(sorted(counter.items()))
+        return {idx: self._facets[idx] for idx in columns}
+
+    def record(self, row: int, keys: List[str] | None = None) -> Dict[str, Any]:
+        """Return row ``row`` as a dictionary keyed by normalized headers.
+
+        ``keys`` restricts the record to those normalized headers.
+        """
+        if keys is None:
+            return {key: self.columns[idx][row] for key, idx in self.indices.items()}
+        return {
+            key: self.columns[self.indices[key]][row]
+            for key in keys
+            if key in self.indices
+        }
+
+
+def _encode_cell(value: Any) -> Any:
+    """Return a JSON representation of a cell value that is not JSON native."""
+    if isinstance(value, datetime):
+        return {"$type": "datetime", "value": value.isoformat()}
+    if isinstance(value, date):
+        return {"$type": "date", "value": value.isoformat()}
+    if isinstance(value, time):
+        return {"$type": "time", "value": value.isoformat()}
+    if isinstance(value, timedelta):
+        return {"$type": "timedelta", "value": value.total_seconds()}
+    return str(value)
+
+
+def _decode_cell(obj: Dict[str, Any]) -> Any:
+    """Return the cell value encoded by :func:`_encode_cell`."""
+    kind = obj.get("$type")
+    if kind in CELL_TYPES and set(obj) == {"$type", "value"}:
+        return CELL_TYPES[kind](obj["value"])
+    return obj
 
 
 class ExcelClaimsSearcher:
     """Search complaint records stored in an Excel file."""
 
-    def __init__(self, path: str | Path | None = None) -> None:
+    def __init__(
+        self, path: str | Path | None = None, cache_dir: str | Path | None = None
+    ) -> None:
         """Initialize with optional Excel file ``path``.
 
         When ``path`` is ``None``, ``COMPLAINTS_XLSX_PATH`` is read from the
         environment. If the variable is unset or invalid, methods will raise
         :class:`FileNotFoundError` when invoked.
+
+        The workbook is parsed once into a :class:`ClaimsTable`. When
+        ``cache_dir`` (default ``CLAIMS_CACHE_DIR``) is set the table is also
+        saved there as JSON and reused until the workbook's modification
+        time or size changes; otherwise it is kept in memory only.
         """
         if path is None:
             path = os.getenv("COMPLAINTS_XLSX_PATH")
+        if cache_dir is None:
+            cache_dir = os.getenv("CLAIMS_CACHE_DIR")
         self.path = Path(path) if path else None
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._table: ClaimsTable | None = None
+        self._signature: Tuple[str, int, int] | None = None
 
     def _ensure_path(self) -> Path:
         """Return the configured Excel path or raise if missing."""
@@ -55,12 +230,133 @@ class ExcelClaimsSearcher:
                 return headers, mapping
         return [], {}
 
+    def _cache_path(self, path: Path) -> Path:
+        """Return the location of the persisted table for ``path``."""
+        assert self.cache_dir is not None
+        digest = hashlib.sha256(str(path.resolve()).encode("utf-8")).hexdigest()
+        return self.cache_dir / f"claims_{digest[:16]}.json"
+
+    def _parse_workbook(self, path: Path) -> ClaimsTable:
+        """Read ``path`` with openpyxl and return its columns."""
+        wb = load_workbook(path, read_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            headers, _ = self._load_headers(rows)
+            columns: List[List[Any]] = [[] for _ in headers]
+            width = len(headers)
+            for row in rows:
+                for idx in range(width):
+                    columns[idx].append(row[idx] if idx < len(row) else None)
+        finally:
+            wb.close()
+        return ClaimsTable(headers, columns)
+
+    def _read_cache(
+        self, path: Path, signature: Tuple[str, int, int]
+    ) -> ClaimsTable | None:
+        """Return the persisted table when it matches ``signature``."""
+        cache_path = self._cache_path(path)
+        if not cache_path.exists():
+            return None
+        try:
+            with open(cache_path, encoding="utf-8") as f:
+                payload = json.load(f, object_hook=_decode_cell)
+            if (
+                payload.get("version") != CACHE_VERSION
+                or tuple(payload.get("signature", ())) != signature
+            ):
+                return None
+            headers, columns = payload["headers"], payload["columns"]
+            if not (
+                isinstance(headers, list)
+                and isinstance(columns, list)
+                and len(headers) == len(columns)
+                and all(isinstance(h, str) for h in headers)
+                and all(isinstance(c, list) for c in columns)
+                and len({len(c) for c in columns}) <= 1
+            ):
+                raise ValueError("invalid table layout")
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            logger.warning("Ignoring unreadable claims cache %s", cache_path)
+            return None
+        return ClaimsTable(headers, columns)
+
+    def _write_cache(
+        self, path: Path, signature: Tuple[str, int, int], table: ClaimsTable
+    ) -> None:
+        """Persist ``table`` in the cache directory; failures are only logged."""
+        cache_path = self._cache_path(path)
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        payload = {
+            "version": CACHE_VERSION,
+            "signature": signature,
+            "headers": table.headers,
+            "columns": table.columns,
+        }
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False, default=_encode_cell)
+            os.replace(tmp_path, cache_path)
+        except OSError as exc:
+            logger.warning("Could not write claims cache %s: %s", cache_path, exc)
+            tmp_path.unlink(missing_ok=True)
+
+    def _load_table(self) -> ClaimsTable:
+        """Return the cached table, rebuilding it when the workbook changed."""
+        path = self._ensure_path()
+        stat = path.stat()
+        signature = (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+        if self._table is not None and self._signature == signature:
+            return self._table
+        persist = self.cache_dir is not None
+        table = self._read_cache(path, signature) if persist else None
+        if table is None:
+            logger.info("Parsing claims workbook %s", path)
+            table = self._parse_workbook(path)
+            if persist:
+                self._write_cache(path, signature, table)
+        self._table = table
+        self._signature = signature
+        return table
+
+    @staticmethod
+    def _filter_rows(table: ClaimsTable, key: str, value: str) -> Dict[int, float]:
+        """Return rows whose ``key`` cell matches ``value`` with their scores.
+
+        ``complaint`` cells match on substring, other cells on equality, and
+        both fall back to a :data:`FUZZY_CUTOFF` similarity ratio. Exact and
+        substring matches score ``1.0``; fuzzy matches score their ratio.
+        """
+        if key not in table.indices:
+            # Missing columns behave like empty cells
+            if value == "":
+                return dict.fromkeys(range(table.row_count), 1.0)
+            return {}
+        index = table.trigram_index(table.indices[key])
+        scores = index.similar(value, FUZZY_CUTOFF)
+        if key == "complaint":
+            exact = index.containing(value)
+        else:
+            exact = index.exact(value)
+        scores.update(dict.fromkeys(exact, 1.0))
+        return {
+            row: score
+            for value_id, score in scores.items()
+            for row in index.rows[value_id]
+        }
+
     def search(
         self,
         filters: Dict[str, str],
         year: int | None = None,
         start_year: int | None = None,
         end_year: int | None = None,
+        *,
+        limit: int | None = None,
+        offset: int = 0,
+        fields: Iterable[str] | None = None,
+        rank: bool = False,
     ) -> List[Dict[str, Any]]:
         """Return rows matching ``filters`` and optional year constraints.
 
@@ -76,72 +372,64 @@ class ExcelClaimsSearcher:
         start_year, end_year:
             Optional inclusive date range boundaries applied to a ``date``
             column.
+        limit, offset:
+            Optional page size and number of matches to skip. Only the rows
+            of the requested page are turned into records.
+        fields:
+            Optional column names to include in each record, normalized
+            like filter keys. All columns are returned when omitted.
+        rank:
+            Order matches by their average filter score, best first, using a
+            heap bounded by ``offset + limit``. Rows keep their workbook
+            order otherwise and among equal scores.
 
         Returns
         -------
         List[Dict[str, Any]]
             Matching rows as dictionaries keyed by normalized headers.
         """
-        path = self._ensure_path()
-        wb = load_workbook(path, read_only=True)
-        ws = wb.active
-        rows = ws.iter_rows(values_only=True)
-        headers, indices = self._load_headers(rows)
-        if not headers:
-            wb.close()
+        table = self._load_table()
+        if not table.headers:
             return []
-        results: List[Dict[str, Any]] = []
-
-        date_key = next((k for k in DATE_KEYS if k in indices), None)
-        for row in rows:
-            record = {
-                key: row[idx] if idx < len(row) else None
-                for key, idx in indices.items()
-            }
-            if date_key is not None:
-                value = record.get(date_key)
-                if isinstance(value, str):
-                    try:
-                        value = datetime.fromisoformat(value)
-                    except ValueError:
-                        continue
+        year_rows = table.rows_in_years(year, start_year, end_year)
+        scores: Dict[int, float] | None = None
+        for key, val in filters.items():
+            if not val:
+                continue
+            if scores is not None and not scores:
+                break
+            matched = self._filter_rows(
+                table, normalize_text(key), normalize_text(str(val))
+            )
+            if scores is None:
+                scores = matched
             else:
-                value = None
+                scores = {
+                    row: score + matched[row]
+                    for row, score in scores.items()
+                    if row in matched
+                }
+        if scores is None:
+            candidates: Set[int] | None = year_rows
+        elif year_rows is None:
+            candidates = set(scores).difference(table.invalid)
+        else:
+            candidates = year_rows.intersection(scores)
 
-            if year is not None and value is not None:
-                if getattr(value, "year", None) != year:
-                    continue
-            elif value is not None:
-                yr = getattr(value, "year", None)
-                if start_year is not None and yr is not None and yr < start_year:
-                    continue
-                if end_year is not None and yr is not None and yr > end_year:
-                    continue
-            match = True
-            for key, val in filters.items():
-                if not val:
-                    continue
-                key = normalize_text(key)
-                cell_raw = str(record.get(key, ""))
-                cell = normalize_text(cell_raw)
-                val_norm = normalize_text(str(val))
-                if key == "complaint":
-                    if val_norm in cell:
-                        continue
-                    ratio = SequenceMatcher(None, val_norm, cell).ratio()
-                    if ratio < 0.8:
-                        match = False
-                        break
-                else:
-                    ratio = SequenceMatcher(None, val_norm, cell).ratio()
-                    if cell != val_norm and ratio < 0.8:
-                        match = False
-                        break
-            if match:
-                results.append(record)
-
-        wb.close()
-        return results
+        row_ids: Iterable[int]
+        if candidates is not None:
+            row_ids = sorted(candidates)
+        elif table.invalid:
+            row_ids = (r for r in range(table.row_count) if r not in table.invalid)
+        else:
+            row_ids = range(table.row_count)
+        stop = None if limit is None else offset + limit
+        if rank and scores is not None and stop is not None:
+            row_ids = heapq.nsmallest(stop, row_ids, key=lambda r: -scores[r])
+        elif rank and scores is not None:
+            row_ids = sorted(row_ids, key=lambda r: -scores[r])
+        keys = None if fields is None else [normalize_text(f) for f in fields]
+        return [table.record(row, keys) for row in islice(row_ids, offset, stop)]
 
     def unique_values(self, field: str) -> List[str]:
         """Return sorted unique values for ``field``.
@@ -157,34 +445,39 @@ class ExcelClaimsSearcher:
         List[str]
             Unique cell values as strings. Empty cells are ignored.
         """
-        path = self._ensure_path()
-        wb = load_workbook(path, read_only=True)
-        ws = wb.active
-        rows = ws.iter_rows(values_only=True)
-        headers, indices = self._load_headers(rows)
-        if not headers:
-            wb.close()
-            return []
+        return list(self.facets([field])[field])
 
-        key = normalize_text(field)
-        if key not in indices:
-            wb.close()
-            return []
+    def facets(
+        self, fields: Iterable[str] | None = None
+    ) -> Dict[str, Dict[str, int]]:
+        """Return distinct values and their counts for several columns.
 
-        index = indices[key]
-        values = set()
-        for row in rows:
-            if index >= len(row):
-                continue
-            val = row[index]
-            if val is None:
-                continue
-            text = str(val).strip()
-            if text:
-                values.add(text)
+        Parameters
+        ----------
+        fields:
+            Column names to summarize, normalized like in
+            :meth:`unique_values`. When ``None`` every column is returned
+            keyed by its normalized header.
 
-        wb.close()
-        return sorted(values)
+        Returns
+        -------
+        Dict[str, Dict[str, int]]
+            For each field a mapping of cell value to occurrence count,
+            sorted by value. Unknown fields map to an empty dictionary.
+            Counts are computed in a single pass and cached until the
+            workbook changes.
+        """
+        table = self._load_table()
+        if fields is None:
+            wanted: Dict[str, int | None] = dict(table.indices)
+        else:
+            wanted = {
+                field: table.indices.get(normalize_text(field)) for field in fields
+            }
+        counts = table.facet_counts([i for i in wanted.values() if i is not None])
+        return {
+            field: {} if idx is None else counts[idx] for field, idx in wanted.items()
+        }
 
 
-__all__ = ["ExcelClaimsSearcher"]
+__all__ = ["ClaimsTable", "ExcelClaimsSearcher"]
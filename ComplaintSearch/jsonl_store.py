@@ -0,0 +1,126 @@
+"""Append-only JSON Lines storage for complaint records."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, List
+import json
+import logging
+import os
+import threading
+
+from . import ComplaintStore
+
+logger = logging.getLogger(__name__)
+
+
+class JsonlComplaintStore(ComplaintStore):
+    """Persist complaints as one JSON object per line.
+
+    Each insert is a single ``O_APPEND`` write, so adding a record costs
+    O(1) I/O and concurrent writers cannot overwrite each other. Records
+    are kept in memory and only lines appended since the last read are
+    parsed on refresh. :meth:`compact` rewrites the log without corrupt or
+    truncated lines.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = "complaints.jsonl",
+        legacy_path: str | Path | None = None,
+    ) -> None:
+        """Open the log at ``path``.
+
+        When the log does not exist yet and ``legacy_path`` points to a JSON
+        array written by :class:`ComplaintStore`, its records are migrated
+        into the new log once.
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._items: List[Dict[str, str]] = []
+        self._offset = 0
+        self._inode: int | None = None
+        if not self.path.exists():
+            records = self._read_array(Path(legacy_path)) if legacy_path else []
+            self._write_log(records)
+            if records:
+                logger.info(
+                    "Migrated %d complaints from %s to %s",
+                    len(records),
+                    legacy_path,
+                    self.path,
+                )
+
+    @staticmethod
+    def _encode(info: Dict[str, str]) -> bytes:
+        """Return ``info`` serialized as one log line."""
+        return (json.dumps(info, ensure_ascii=False) + "\n").encode("utf-8")
+
+    def _write_log(self, records: List[Dict[str, str]]) -> None:
+        """Atomically replace the log with ``records``."""
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.writelines(self._encode(record) for record in records)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _refresh(self) -> None:
+        """Parse lines appended since the last refresh into memory.
+
+        The log is re-read from the start when it was replaced, for example
+        by :meth:`compact` in another process. A trailing line without a
+        newline is an append in progress and is left for the next refresh.
+        """
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            self._items, self._offset, self._inode = [], 0, None
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            self._items, self._offset, self._inode = [], 0, stat.st_ino
+        if stat.st_size == self._offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read()
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                self._items.append(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning("Skipping corrupt line in %s", self.path)
+        self._offset += end
+
+    def add_complaint(self, info: Dict[str, str]) -> None:
+        """Append a complaint record to the log."""
+        data = self._encode(info)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def _load_items(self) -> List[Dict[str, str]]:
+        """Return all records, reading only new lines of the log."""
+        with self._lock:
+            self._refresh()
+            return list(self._items)
+
+    def compact(self) -> int:
+        """Rewrite the log with only its valid records and return their count.
+
+        Appends made by other processes while compaction runs may be lost,
+        so run it while the store is otherwise idle.
+        """
+        with self._lock:
+            self._refresh()
+            self._write_log(self._items)
+            stat = self.path.stat()
+            self._offset, self._inode = stat.st_size, stat.st_ino
+            return len(self._items)
+
+
+__all__ = ["JsonlComplaintStore"]
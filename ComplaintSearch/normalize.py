@@ -0,0 +1,72 @@
+"""Text normalization used when comparing complaint fields."""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, List
+
+
+def _normalize_char(char: str) -> str:
+    """Return the normalized form of a single character.
+
+    Mirrors the full pipeline: NFKD, ASCII folding and lowercasing, dropping
+    punctuation and mapping any whitespace to a plain space.
+    """
+    ascii_text = unicodedata.normalize("NFKD", char).encode("ascii", "ignore")
+    lowered = ascii_text.decode("ascii").lower()
+    no_punct = re.sub(r"[^\w\s]", "", lowered)
+    return re.sub(r"\s", " ", no_punct)
+
+
+class _TranslationTable(Dict[int, str]):
+    """``str.translate`` table that fills in unseen code points on demand."""
+
+    def __missing__(self, codepoint: int) -> str:
+        value = self[codepoint] = _normalize_char(chr(codepoint))
+        return value
+
+
+# Pre-built for ASCII, Latin-1 and Latin Extended-A (covers Turkish letters)
+_TABLE = _TranslationTable()
+for _codepoint in range(0x180):
+    _TABLE[_codepoint]
+
+
+# Byte-level equivalent of ``_TABLE`` for the common pure-ASCII case
+_ASCII_TABLE = bytes(ord(_TABLE[i]) if len(_TABLE[i]) == 1 else i for i in range(256))
+_ASCII_DELETE = bytes(i for i in range(128) if not _TABLE[i])
+
+
+def _fold(text: str) -> str:
+    """Translate ``text`` through the table and collapse runs of spaces."""
+    if text.isascii():
+        data = text.encode("ascii").translate(_ASCII_TABLE, _ASCII_DELETE)
+        return " ".join(data.decode("ascii").split())
+    return " ".join(text.translate(_TABLE).split())
+
+
+@lru_cache(maxsize=65536)
+def normalize_text(text: str) -> str:
+    """Return lowercase ASCII text without punctuation or extra spaces."""
+    return _fold(text)
+
+
+def normalize_many(values: Iterable[str]) -> List[str]:
+    """Return :func:`normalize_text` applied to every item of ``values``.
+
+    Repeated values within the batch are normalized once, without filling
+    the shared cache of :func:`normalize_text` with whole columns.
+    """
+    seen: Dict[str, str] = {}
+    results: List[str] = []
+    for value in values:
+        norm = seen.get(value)
+        if norm is None:
+            norm = seen[value] = _fold(value)
+        results.append(norm)
+    return results
+
+
+__all__ = ["normalize_many", "normalize_text"]
@@ -0,0 +1,144 @@
+"""SQLite storage with an FTS5 index for complaint records."""
+
+from __future__ import annotations
+
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List
+import json
+import logging
+import sqlite3
+
+from . import SEARCH_FIELDS, ComplaintStore, normalize_text
+from .trigram_index import trigrams
+
+logger = logging.getLogger(__name__)
+
+# Tokenizers tried in order; trigram needs SQLite 3.34 and its
+# ``remove_diacritics`` option SQLite 3.45.
+TOKENIZERS = [
+    "trigram remove_diacritics 1",
+    "trigram",
+    "unicode61 remove_diacritics 2",
+]
+
+
+class SQLiteComplaintStore(ComplaintStore):
+    """Persist complaints in SQLite and shortlist searches with FTS5.
+
+    The searchable fields are indexed in normalized form, so the index folds
+    Turkish and other accented letters exactly like :func:`normalize_text`.
+    Full-text matches only select candidate rows; the usual substring and
+    fuzzy rules of :class:`ComplaintStore` are then applied to those rows.
+    With the trigram tokenizer substring hits are found exactly, while the
+    fuzzy fallback only sees rows sharing at least one trigram with the
+    keyword. Keywords too short to form a trigram are checked against all
+    rows.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = "complaints.db",
+        legacy_path: str | Path | None = None,
+    ) -> None:
+        """Open or create the database at ``path``.
+
+        A new database imports the records of a JSON array store found at
+        ``legacy_path``.
+        """
+        self.path = Path(path)
+        created = not self.path.exists()
+        with self._connect() as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS complaints ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT NOT NULL)"
+            )
+            self.tokenizer = self._create_index(conn)
+        if created and legacy_path:
+            records = self._read_array(Path(legacy_path))
+            for record in records:
+                self.add_complaint(record)
+            if records:
+                logger.info(
+                    "Migrated %d complaints from %s to %s",
+                    len(records),
+                    legacy_path,
+                    self.path,
+                )
+
+    def _connect(self) -> closing[sqlite3.Connection]:
+        """Return a connection that is closed when the block exits."""
+        return closing(sqlite3.connect(self.path))
+
+    @staticmethod
+    def _create_index(conn: sqlite3.Connection) -> str:
+        """Create the FTS5 table if needed and return its tokenizer."""
+        row = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'complaints_fts'"
+        ).fetchone()
+        if row is not None:
+            return next((t for t in TOKENIZERS if t in row[0]), TOKENIZERS[-1])
+        columns = ", ".join(SEARCH_FIELDS)
+        for tokenizer in TOKENIZERS:
+            try:
+                conn.execute(
+                    f"CREATE VIRTUAL TABLE complaints_fts USING fts5("
+                    f"{columns}, tokenize='{tokenizer}')"
+                )
+            except sqlite3.OperationalError:
+                continue
+            return tokenizer
+        raise RuntimeError("SQLite FTS5 is not available")
+
+    def add_complaint(self, info: Dict[str, str]) -> None:
+        """Store a complaint record and index its searchable fields."""
+        values = [normalize_text(str(info.get(f, ""))) for f in SEARCH_FIELDS]
+        with self._connect() as conn, conn:
+            cursor = conn.execute(
+                "INSERT INTO complaints(data) VALUES (?)",
+                (json.dumps(info, ensure_ascii=False),),
+            )
+            conn.execute(
+                f"INSERT INTO complaints_fts(rowid, {', '.join(SEARCH_FIELDS)}) "
+                f"VALUES (?, {', '.join('?' for _ in SEARCH_FIELDS)})",
+                (cursor.lastrowid, *values),
+            )
+
+    def _load_items(self) -> List[Dict[str, str]]:
+        """Return all stored complaint records in insertion order."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT data FROM complaints ORDER BY id")
+            return [json.loads(data) for (data,) in rows]
+
+    def _candidate_query(self, keyword: str) -> tuple[str, list[str]] | None:
+        """Return the SQL condition and parameters shortlisting ``keyword``.
+
+        ``None`` means no shortlist is possible and every row is a candidate.
+        """
+        if self.tokenizer.startswith("trigram"):
+            grams = sorted(trigrams(keyword))
+            if not grams:
+                return None
+            expr = " OR ".join(f'"{gram}"' for gram in grams)
+            return "complaints_fts MATCH ?", [expr]
+        expr = " OR ".join(f'"{word}"*' for word in keyword.split())
+        return "complaints_fts MATCH ?", [expr]
+
+    def search(self, keyword: str) -> List[Dict[str, str]]:
+        """Return complaint records fuzzy-matching ``keyword``."""
+        keyword_norm = normalize_text(keyword)
+        query = self._candidate_query(keyword_norm) if keyword_norm else None
+        if query is None:
+            return self._match(self._load_items(), keyword)
+        condition, params = query
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT data FROM complaints WHERE id IN ("
+                f"SELECT rowid FROM complaints_fts WHERE {condition}) ORDER BY id",
+                params,
+            )
+            candidates = [json.loads(data) for (data,) in rows]
+        return self._match(candidates, keyword)
+
+
+__all__ = ["SQLiteComplaintStore"]
@@ -0,0 +1,91 @@
+"""Trigram inverted index over normalized column values."""
+
+from __future__ import annotations
+
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Set
+
+
+def trigrams(text: str) -> Set[str]:
+    """Return the set of three-character substrings of ``text``."""
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def _length_ratio(a: int, b: int) -> float:
+    """Return the ``real_quick_ratio`` bound for strings of length ``a``/``b``."""
+    total = a + b
+    return 2.0 * min(a, b) / total if total else 1.0
+
+
+class TrigramIndex:
+    """Index the distinct values of a column for substring and fuzzy lookups.
+
+    Rows sharing a value are grouped so every check runs once per distinct
+    value. Substring lookups intersect trigram posting lists. Fuzzy lookups
+    are a scan of the distinct values, see :meth:`similar`. Both give the
+    same answers as checking every row.
+    """
+
+    def __init__(self, values: Iterable[str]) -> None:
+        """Build the index from ``values`` given in row order."""
+        self.values: List[str] = []
+        self.rows: List[List[int]] = []
+        self._ids: Dict[str, int] = {}
+        for row, value in enumerate(values):
+            value_id = self._ids.get(value)
+            if value_id is None:
+                value_id = self._ids[value] = len(self.values)
+                self.values.append(value)
+                self.rows.append([])
+            self.rows[value_id].append(row)
+
+        self._by_length: Dict[int, List[int]] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        for value_id, value in enumerate(self.values):
+            self._by_length.setdefault(len(value), []).append(value_id)
+            for gram in trigrams(value):
+                self._postings.setdefault(gram, set()).add(value_id)
+
+    def exact(self, needle: str) -> Set[int]:
+        """Return ids of values equal to ``needle``."""
+        value_id = self._ids.get(needle)
+        return set() if value_id is None else {value_id}
+
+    def containing(self, needle: str) -> Set[int]:
+        """Return ids of values that contain ``needle`` as a substring."""
+        grams = trigrams(needle)
+        if not grams:
+            return {i for i, value in enumerate(self.values) if needle in value}
+        postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                return candidates
+        return {i for i in candidates if needle in self.values[i]}
+
+    def similar(self, needle: str, cutoff: float) -> Dict[int, float]:
+        """Return ids and ratios of values with ``ratio(needle, value) >= cutoff``.
+
+        This scans every distinct value: similar strings can share few or no
+        trigrams, so the postings cannot shortlist them without losing
+        matches. Values whose length alone rules out ``cutoff`` are skipped
+        and the rest are rejected by ``quick_ratio`` before the full ratio.
+        """
+        matcher = SequenceMatcher(None, needle, "")
+        size = len(needle)
+        matches: Dict[int, float] = {}
+        for length, value_ids in self._by_length.items():
+            if _length_ratio(size, length) < cutoff:
+                continue
+            for value_id in value_ids:
+                matcher.set_seq2(self.values[value_id])
+                if matcher.quick_ratio() < cutoff:
+                    continue
+                ratio = matcher.ratio()
+                if ratio >= cutoff:
+                    matches[value_id] = ratio
+        return matches
+
+
+__all__ = ["TrigramIndex", "trigrams"]
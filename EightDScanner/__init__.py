@@ -8,6 +8,8 @@ from typing import List
 
 from openpyxl import load_workbook
 
+from .similarity import CaseIndex
+
 
 class EightDScanner:
     """Scan Excel reports for key fields and persist them."""
@@ -17,6 +19,7 @@ class EightDScanner:
         self.reports_dir.mkdir(parents=True, exist_ok=True)
         self.db_path = Path(db_path)
         self._init_db()
+        self.index = CaseIndex(self.db_path)
 
     def _init_db(self) -> None:
         with sqlite3.connect(self.db_path) as conn:
@@ -70,7 +73,10 @@ class EightDScanner:
         return results
 
     def scan(self) -> int:
-        """Scan all Excel files and persist extracted rows."""
+        """Scan all Excel files and persist extracted rows.
+
+        New rows are added to :attr:`index` afterwards.
+        """
         count = 0
         for path in self.reports_dir.glob("*.xlsx"):
             rows = self._extract_rows(path)
@@ -80,6 +86,7 @@ class EightDScanner:
                     rows,
                 )
                 count += len(rows)
+        self.index.refresh()
         return count
 
-__all__ = ["EightDScanner"]
+__all__ = ["CaseIndex", "EightDScanner"]
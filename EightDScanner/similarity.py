@@ -0,0 +1,185 @@
+"""TF-IDF similarity search over scanned 8D reports.
+
+:class:`CaseIndex` keeps sparse TF-IDF vectors of the ``reports`` table in
+an inverted index, so a lookup only touches the reports sharing a term with
+the query and takes milliseconds even for tens of thousands of rows. Rows
+are added incrementally by :meth:`CaseIndex.refresh`; document norms are
+recomputed lazily on the next lookup because new rows change the IDF.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import heapq
+import logging
+import math
+import re
+import sqlite3
+import threading
+
+COLUMNS = (
+    "id",
+    "material_code",
+    "description",
+    "customer",
+    "root_cause",
+    "permanent_action",
+)
+# Weight of the part code term relative to a description term
+CODE_WEIGHT = 2.0
+STOPWORDS = {
+    "ve",
+    "ile",
+    "bir",
+    "bu",
+    "da",
+    "de",
+    "için",
+    "olarak",
+    "olan",
+    "çok",
+    "the",
+    "and",
+    "of",
+    "in",
+    "on",
+    "for",
+    "is",
+    "to",
+    "a",
+    "an",
+}
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Return the lowercase word tokens of ``text`` without stopwords."""
+    text = text.replace("I", "ı").replace("İ", "i").lower()
+    return [
+        word for word in _WORD.findall(text) if len(word) > 1 and word not in STOPWORDS
+    ]
+
+
+def _terms(material_code: str, description: str) -> Dict[str, float]:
+    """Return the term frequencies of a report or query.
+
+    The part code becomes a single ``#code`` term so exact matches weigh in
+    next to the description words.
+    """
+    terms: Dict[str, float] = dict(Counter(tokenize(description)))
+    code = material_code.strip().lower()
+    if code:
+        terms[f"#{code}"] = CODE_WEIGHT
+    return terms
+
+
+class CaseIndex:
+    """Find historical 8D reports similar to a part code and description."""
+
+    def __init__(self, db_path: str | Path = "eight_d.db") -> None:
+        """Initialize an empty index over the ``reports`` table at ``db_path``.
+
+        Rows are loaded by the first :meth:`refresh` or lookup.
+        """
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._rows: Dict[int, Tuple[str, ...]] = {}
+        self._postings: Dict[str, List[Tuple[int, float]]] = {}
+        self._norms: Dict[int, float] = {}
+        self._last_id = 0
+        self._loaded = False
+        self._dirty = False
+
+    def _connect(self) -> closing[sqlite3.Connection]:
+        """Return a connection that is closed when the block exits."""
+        return closing(sqlite3.connect(self.db_path))
+
+    def refresh(self) -> int:
+        """Index rows added since the last refresh and return their count."""
+        if not self.db_path.exists():
+            return 0
+        with self._lock:
+            try:
+                with self._connect() as conn:
+                    rows = conn.execute(
+                        f"SELECT {', '.join(COLUMNS)} FROM reports "
+                        "WHERE id > ? ORDER BY id",
+                        (self._last_id,),
+                    ).fetchall()
+            except sqlite3.OperationalError as exc:
+                logger.warning("Could not read 8D reports: %s", exc)
+                return 0
+            for row in rows:
+                values = tuple("" if v is None else str(v) for v in row[1:])
+                self._rows[row[0]] = values
+                for term, tf in _terms(values[0], values[1]).items():
+                    self._postings.setdefault(term, []).append((row[0], tf))
+                self._last_id = row[0]
+            self._loaded = True
+            if rows:
+                self._dirty = True
+                logger.info("Indexed %d 8D reports", len(rows))
+            return len(rows)
+
+    def _idf(self, term: str) -> float:
+        """Return the smoothed inverse document frequency of ``term``."""
+        df = len(self._postings.get(term, ()))
+        return math.log((1 + len(self._rows)) / (1 + df)) + 1.0
+
+    def _update_norms(self) -> None:
+        """Recompute the vector length of every report."""
+        squares: Dict[int, float] = dict.fromkeys(self._rows, 0.0)
+        for term, postings in self._postings.items():
+            idf = self._idf(term)
+            for doc_id, tf in postings:
+                squares[doc_id] += (tf * idf) ** 2
+        self._norms = {doc_id: math.sqrt(s) for doc_id, s in squares.items()}
+        self._dirty = False
+
+    def similar(
+        self, material_code: str, description: str, k: int = 3
+    ) -> List[Dict[str, Any]]:
+        """Return up to ``k`` reports most similar to the query.
+
+        Each result holds the report columns and its cosine ``score``;
+        reports sharing no term with the query are never returned.
+        """
+        if not self._loaded:
+            self.refresh()
+        query = _terms(material_code, description)
+        with self._lock:
+            if self._dirty:
+                self._update_norms()
+            weights = {term: tf * self._idf(term) for term, tf in query.items()}
+            query_norm = math.sqrt(sum(w * w for w in weights.values()))
+            if not query_norm or k <= 0:
+                return []
+            dots: Dict[int, float] = {}
+            for term, weight in weights.items():
+                idf = self._idf(term)
+                for doc_id, tf in self._postings.get(term, ()):
+                    dots[doc_id] = dots.get(doc_id, 0.0) + weight * tf * idf
+            scores = (
+                (doc_id, dot / (query_norm * self._norms[doc_id]))
+                for doc_id, dot in dots.items()
+            )
+            best = heapq.nlargest(k, scores, key=lambda item: item[1])
+            return [
+                {
+                    **dict(zip(COLUMNS, (doc_id, *self._rows[doc_id]))),
+                    "score": round(score, 4),
+                }
+                for doc_id, score in best
+            ]
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+__all__ = ["CaseIndex", "tokenize"]
@@ -0,0 +1,338 @@
+"""Persistent background jobs processed by a bounded worker pool.
+
+A job is a list of JSON items handled one by one by a function registered
+for the job kind. Items and their results are stored in SQLite, so job
+progress and partial results can be polled and survive a restart; items
+that were still pending are resubmitted by :meth:`JobRunner.resume`.
+Runners claim an item in the database before running it and renew the
+claim while the handler runs, so several processes sharing one database
+never run the same item twice. Items whose claim expired because their
+process stopped are picked up again by the other runners.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+DEFAULT_WORKERS = 4
+DEFAULT_LEASE = 60.0
+
+logger = logging.getLogger(__name__)
+
+
+class JobStore:
+    """SQLite persistence for jobs and their items."""
+
+    def __init__(self, path: str | Path = "jobs.db") -> None:
+        """Open or create the job database at ``path``."""
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        with self._connect() as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, "
+                "total INTEGER NOT NULL, created REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_items ("
+                "job_id TEXT NOT NULL, idx INTEGER NOT NULL, "
+                "status TEXT NOT NULL, payload TEXT NOT NULL, "
+                "result TEXT, error TEXT, updated REAL NOT NULL, "
+                "PRIMARY KEY (job_id, idx))"
+            )
+            columns = conn.execute("PRAGMA table_info(job_items)").fetchall()
+            if "owner" not in [column[1] for column in columns]:
+                conn.execute("ALTER TABLE job_items ADD COLUMN owner TEXT")
+
+    def _connect(self) -> closing[sqlite3.Connection]:
+        """Return a connection that is closed when the block exits."""
+        return closing(sqlite3.connect(self.path, timeout=30))
+
+    def create(self, kind: str, items: List[Any]) -> str:
+        """Store a new job with ``items`` and return its id."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._connect() as conn, conn:
+            conn.execute(
+                "INSERT INTO jobs(id, kind, total, created) VALUES (?, ?, ?, ?)",
+                (job_id, kind, len(items), now),
+            )
+            conn.executemany(
+                "INSERT INTO job_items(job_id, idx, status, payload, updated) "
+                "VALUES (?, ?, 'pending', ?, ?)",
+                [
+                    (job_id, idx, json.dumps(item, ensure_ascii=False), now)
+                    for idx, item in enumerate(items)
+                ],
+            )
+        return job_id
+
+    def update_item(
+        self,
+        job_id: str,
+        idx: int,
+        status: str,
+        result: Any = None,
+        error: str | None = None,
+    ) -> None:
+        """Record the status and outcome of one item."""
+        encoded = None if result is None else json.dumps(result, ensure_ascii=False)
+        with self._lock, self._connect() as conn, conn:
+            conn.execute(
+                "UPDATE job_items SET status = ?, result = ?, error = ?, updated = ? "
+                "WHERE job_id = ? AND idx = ?",
+                (status, encoded, error, time.time(), job_id, idx),
+            )
+
+    def claim(self, job_id: str, idx: int, owner: str, stale_before: float) -> bool:
+        """Mark one item as running for ``owner`` and return whether it was won.
+
+        Pending items can always be claimed. Items still marked running are
+        claimed only if their owner has not renewed them since
+        ``stale_before``, meaning the process running them is gone. The
+        check and the update are one statement, so only one runner wins
+        each item.
+        """
+        with self._lock, self._connect() as conn, conn:
+            cursor = conn.execute(
+                "UPDATE job_items SET status = 'running', owner = ?, updated = ? "
+                "WHERE job_id = ? AND idx = ? AND (status = 'pending' "
+                "OR (status = 'running' AND updated < ?))",
+                (owner, time.time(), job_id, idx, stale_before),
+            )
+            return cursor.rowcount == 1
+
+    def renew(self, owner: str) -> None:
+        """Refresh the claims of the items ``owner`` is running."""
+        with self._lock, self._connect() as conn, conn:
+            conn.execute(
+                "UPDATE job_items SET updated = ? "
+                "WHERE owner = ? AND status = 'running'",
+                (time.time(), owner),
+            )
+
+    def _items(self, where: str, params: tuple) -> List[tuple[str, str, int, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT i.job_id, j.kind, i.idx, i.payload FROM job_items i "
+                f"JOIN jobs j ON j.id = i.job_id WHERE {where} "
+                "ORDER BY j.created, i.idx",
+                params,
+            ).fetchall()
+        return [(job_id, kind, idx, json.loads(p)) for job_id, kind, idx, p in rows]
+
+    def pending(
+        self, stale_before: float | None = None
+    ) -> List[tuple[str, str, int, Any]]:
+        """Return ``(job_id, kind, idx, item)`` for every unfinished item.
+
+        With ``stale_before`` running items are only included if they were
+        not updated since, see :meth:`claim`.
+        """
+        if stale_before is None:
+            return self._items("i.status IN ('pending', 'running')", ())
+        return self._items(
+            "(i.status = 'pending' OR (i.status = 'running' AND i.updated < ?))",
+            (stale_before,),
+        )
+
+    def abandoned(self, stale_before: float) -> List[tuple[str, str, int, Any]]:
+        """Return the running items not updated since ``stale_before``."""
+        return self._items("i.status = 'running' AND i.updated < ?", (stale_before,))
+
+    def get(self, job_id: str) -> Dict[str, Any] | None:
+        """Return status, progress and finished results of a job.
+
+        ``status`` is ``queued`` until an item starts, ``running`` while
+        items are pending and ``completed`` once every item has either a
+        ``result`` or an ``error``.
+        """
+        with self._connect() as conn:
+            job = conn.execute(
+                "SELECT kind, total, created FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if job is None:
+                return None
+            items = conn.execute(
+                "SELECT idx, status, result, error FROM job_items "
+                "WHERE job_id = ? ORDER BY idx",
+                (job_id,),
+            ).fetchall()
+        kind, total, created = job
+        counts = {"pending": 0, "running": 0, "done": 0, "failed": 0}
+        results: List[Dict[str, Any]] = []
+        for idx, status, result, error in items:
+            counts[status] += 1
+            if status == "done":
+                results.append(
+                    {"index": idx, "status": status, "result": json.loads(result)}
+                )
+            elif status == "failed":
+                results.append({"index": idx, "status": status, "error": error})
+        finished = counts["done"] + counts["failed"]
+        if finished == total:
+            state = "completed"
+        elif finished or counts["running"]:
+            state = "running"
+        else:
+            state = "queued"
+        return {
+            "id": job_id,
+            "kind": kind,
+            "status": state,
+            "total": total,
+            "completed": counts["done"],
+            "failed": counts["failed"],
+            "created": created,
+            "results": results,
+        }
+
+
+class JobRunner:
+    """Run job items on a bounded thread pool."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        max_workers: int | None = None,
+        lease: float = DEFAULT_LEASE,
+    ) -> None:
+        """Initialize with ``store`` and at most ``max_workers`` threads.
+
+        ``max_workers`` defaults to ``JOB_WORKERS`` or ``4``. Claims on
+        running items are renewed every third of ``lease`` seconds; items
+        of another runner that were not renewed for ``lease`` seconds are
+        taken over.
+        """
+        if max_workers is None:
+            max_workers = int(os.getenv("JOB_WORKERS", str(DEFAULT_WORKERS)))
+        self.store = store
+        self.max_workers = max(1, max_workers)
+        self.owner = uuid.uuid4().hex
+        self.lease = lease
+        self._handlers: Dict[str, Callable[[Any], Any]] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="job"
+        )
+        # Items submitted to the executor and not started yet
+        self._queued: set[tuple[str, int]] = set()
+        self._queued_lock = threading.Lock()
+        self._accepting = True
+        self._stopped = threading.Event()
+        self._heartbeat = threading.Thread(
+            target=self._renew, name="job-heartbeat", daemon=True
+        )
+        self._heartbeat.start()
+
+    def register(self, kind: str, handler: Callable[[Any], Any]) -> None:
+        """Process items of jobs of ``kind`` with ``handler``.
+
+        The handler receives one item and returns a JSON serializable
+        result; exceptions mark only that item as failed.
+        """
+        self._handlers[kind] = handler
+
+    def submit(self, kind: str, items: List[Any]) -> str:
+        """Persist a job for ``items``, queue its items and return the id.
+
+        Raises
+        ------
+        KeyError
+            If no handler is registered for ``kind``.
+        """
+        if kind not in self._handlers:
+            raise KeyError(kind)
+        job_id = self.store.create(kind, items)
+        for idx, item in enumerate(items):
+            self._queue(job_id, kind, idx, item)
+        logger.info("Queued %s job %s with %d items", kind, job_id, len(items))
+        return job_id
+
+    def resume(self) -> int:
+        """Queue items left unfinished by a previous process.
+
+        Returns the number of resubmitted items. Items of unknown kinds are
+        left untouched. When several processes resume the same database,
+        each item is still run by only one of them, see :meth:`JobStore.claim`.
+        """
+        count = 0
+        for job_id, kind, idx, item in self.store.pending(self._stale_before()):
+            if kind in self._handlers and self._queue(job_id, kind, idx, item):
+                count += 1
+        if count:
+            logger.info("Resumed %d unfinished job items", count)
+        return count
+
+    def _stale_before(self) -> float:
+        """Return the time before which a running item's claim has expired."""
+        return time.time() - self.lease
+
+    def _queue(self, job_id: str, kind: str, idx: int, item: Any) -> bool:
+        """Submit one item unless it is already queued; return whether it was."""
+        with self._queued_lock:
+            if (job_id, idx) in self._queued:
+                return False
+            self._queued.add((job_id, idx))
+        self._executor.submit(self._run_item, job_id, kind, idx, item)
+        return True
+
+    def _renew(self) -> None:
+        """Renew this runner's claims and take over expired ones until shutdown."""
+        while not self._stopped.wait(self.lease / 3):
+            try:
+                self.store.renew(self.owner)
+                if not self._accepting:
+                    continue
+                taken = 0
+                for job_id, kind, idx, item in self.store.abandoned(
+                    self._stale_before()
+                ):
+                    if kind in self._handlers and self._queue(job_id, kind, idx, item):
+                        taken += 1
+                if taken:
+                    logger.info("Took over %d abandoned job items", taken)
+            except Exception:
+                logger.exception("Renewing job claims failed")
+
+    def _run_item(self, job_id: str, kind: str, idx: int, item: Any) -> None:
+        """Run the handler for one item and persist its outcome.
+
+        The item is skipped if another runner claimed it first.
+        """
+        with self._queued_lock:
+            self._queued.discard((job_id, idx))
+        if not self.store.claim(job_id, idx, self.owner, self._stale_before()):
+            logger.debug("Job %s item %d claimed by another runner", job_id, idx)
+            return
+        try:
+            result = self._handlers[kind](item)
+        except Exception as exc:
+            logger.exception("Job %s item %d failed", job_id, idx)
+            self.store.update_item(job_id, idx, "failed", error=str(exc))
+        else:
+            self.store.update_item(job_id, idx, "done", result=result)
+
+    def get(self, job_id: str) -> Dict[str, Any] | None:
+        """Return the state of ``job_id`` or ``None`` if it is unknown."""
+        return self.store.get(job_id)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting work and optionally wait for queued items."""
+        self._accepting = False
+        self._executor.shutdown(wait=wait)
+        self._stopped.set()
+        if wait:
+            self._heartbeat.join()
+
+
+__all__ = ["JobRunner", "JobStore"]
@@ -6,11 +6,23 @@ produce structured reports from complaint data.
 
 from __future__ import annotations
 
+import asyncio
+import json
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict
-
+from typing import Any, Dict, Iterator, List, Tuple
+
+from LLMClient import (
+    Completer,
+    ResponseCache,
+    count_messages,
+    current_tags,
+    fit_sections,
+    prompt_budget,
+    tagged,
+)
 from PromptManager import PromptManager
 
 # Default prompt used for 8D analyses when no template is loaded.
@@ -54,6 +66,10 @@ ya da metodoloji açıklaması yapma. Her başlığı kendi içeriğiyle doldur,
 """
 
 
+# Result key of methods answered with a single LLM call.
+FULL_TEXT = "full_text"
+
+
 class OpenAIError(RuntimeError):
     """Raised when the OpenAI client cannot be used."""
 
@@ -61,56 +77,117 @@ class OpenAIError(RuntimeError):
 class LLMAnalyzer:
     """Analyzes text using a Large Language Model."""
 
-    def __init__(self, model: str | None = None) -> None:
+    def __init__(
+        self,
+        model: str | None = None,
+        max_concurrency: int | None = None,
+        cache: ResponseCache | None = None,
+        structured: bool | None = None,
+        cases: Any = None,
+        similar_cases: int | None = None,
+    ) -> None:
         """Initialize the analyzer with an optional LLM model name.
 
         If ``model`` is ``None``, ``OPENAI_MODEL`` environment variable is used.
         When the variable is not set, ``"gpt-3.5-turbo"`` becomes the default.
+
+        ``max_concurrency`` limits how many guideline steps are sent to the
+        LLM at once. It defaults to ``LLM_MAX_CONCURRENCY`` or ``1``, which
+        queries the steps one after another.
+
+        Responses are stored in ``cache`` when given, otherwise in the shared
+        cache enabled with ``LLM_CACHE``.
+
+        With ``structured`` all guideline steps are requested in one call
+        returning a JSON object keyed by step id. It defaults to
+        ``LLM_STRUCTURED_STEPS``.
+
+        ``cases`` is an index of past 8D reports such as
+        :class:`EightDScanner.CaseIndex`. The ``similar_cases`` reports most
+        similar to the complaint are added to the prompts as context; the
+        count defaults to ``LLM_SIMILAR_CASES`` or ``0``.
         """
         if model is None:
             model = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
         self.model = model
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "1"))
+        self.max_concurrency = max(1, max_concurrency)
+        self.cache = cache
+        if structured is None:
+            structured = os.getenv("LLM_STRUCTURED_STEPS", "").lower() in {
+                "1",
+                "true",
+                "yes",
+                "on",
+            }
+        self.structured = structured
+        self.cases = cases
+        if similar_cases is None:
+            similar_cases = int(os.getenv("LLM_SIMILAR_CASES", "0"))
+        self.similar_cases = max(0, similar_cases)
         self.logger = logging.getLogger(__name__)
+        self._completer = Completer(
+            "analyzer",
+            OpenAIError,
+            self.logger,
+            "LLMAnalyzer",
+        )
         self._8d_prompt: str | None = None
 
-    def _query_llm(self, system_prompt: str, user_prompt: str) -> str:
-        """Return the LLM response for the given prompt pair."""
+    @staticmethod
+    def _messages(system_prompt: str, user_prompt: str) -> List[Dict[str, str]]:
+        """Return the chat messages for the prompt pair."""
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    def _query_llm(
+        self, system_prompt: str, user_prompt: str, json_mode: bool = False
+    ) -> str:
+        """Return the LLM response for the given prompt pair.
+
+        ``json_mode`` asks the API to enforce a JSON object response.
+        """
         self.logger.debug("LLMAnalyzer._query_llm start")
         truncated_sys = system_prompt.replace("\n", " ")[:200]
         truncated_user = user_prompt.replace("\n", " ")[:200]
         self.logger.debug("system_prompt: %s", truncated_sys)
         self.logger.debug("user_prompt: %s", truncated_user)
-        try:
-            from openai import OpenAI  # type: ignore
-        except ImportError as exc:  # pragma: no cover - import errors not expected
-            raise OpenAIError("openai package is not installed") from exc
-
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise OpenAIError("OPENAI_API_KEY not set")
-        client = OpenAI(api_key=api_key)
-
-        try:
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-            )
-            tokens = getattr(getattr(response, "usage", None), "total_tokens", None)
-            if tokens is not None:
-                self.logger.info("LLMAnalyzer tokens used: %s", tokens)
-            result = response.choices[0].message.content.strip()
-            self.logger.debug("LLMAnalyzer returned: %s", result.replace("\n", " ")[:200])
-            self.logger.debug("LLMAnalyzer._query_llm end")
-            return result
-        except Exception as exc:  # pragma: no cover - network issues
-            if "invalid" in str(exc).lower() or "incorrect" in str(exc).lower():
-                raise OpenAIError("Invalid OpenAI API key") from exc
-            self.logger.error("LLMAnalyzer error: %s", exc)
-            self.logger.debug("LLMAnalyzer._query_llm end")
-            return f"LLM response placeholder for: {user_prompt[:50]}"
+        messages = self._messages(system_prompt, user_prompt)
+        result = self._completer.complete(self.model, messages, self.cache, json_mode)
+        self.logger.debug("LLMAnalyzer._query_llm end")
+        return result
+
+    async def _query_llm_async(
+        self, system_prompt: str, user_prompt: str, json_mode: bool = False
+    ) -> str:
+        """Return the LLM response for the prompt pair without blocking."""
+        messages = self._messages(system_prompt, user_prompt)
+        return await self._completer.complete_async(
+            self.model, messages, self.cache, json_mode
+        )
+
+    def _stream_llm(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        tags: Dict[str, str] | None = None,
+    ) -> Iterator[str]:
+        """Yield the LLM response for the prompt pair as it is generated.
+
+        ``tags`` label the call in the LLM metrics.
+
+        Raises
+        ------
+        OpenAIError
+            If the request fails, including after part of the answer was
+            yielded; no placeholder text is produced.
+        """
+        return self._completer.stream(
+            self.model, self._messages(system_prompt, user_prompt), self.cache, tags
+        )
 
     def _load_8d_prompt(self) -> str:
         """Return the 8D system prompt, loading from file if available."""
@@ -124,79 +201,73 @@ class LLMAnalyzer:
                 self._8d_prompt = DEFAULT_8D_PROMPT
         return self._8d_prompt
 
-    def analyze(
+    def _append_instructions(
         self,
-        details: Dict[str, Any],
-        guideline: Dict[str, Any],
-        directives: str = "",
-        language: str = "Türkçe",
-    ) -> Dict[str, Any]:
-        """Return analysis using complaint details.
-
-        Parameters
-        ----------
-        details
-            Complaint information such as text and customer.
-        guideline
-            Guideline describing the report format.
-        directives
-            Optional user directives to customize the report.
-        language
-            Desired language for the response.
+        user_prompt: str,
+        directives: str,
+        language: str,
+        system_prompt: str = "",
+        history: str = "",
+    ) -> str:
+        """Return ``user_prompt`` followed by past cases, directives and language.
+
+        When the request would not fit the prompt budget of the model, the
+        past cases are shortened first, then the directives and the prompt
+        itself last.
         """
-        complaint_text = details.get("complaint", "")
-        customer = details.get("customer", "")
-        subject = details.get("subject", "")
-        part_code = details.get("part_code", "")
-
-        method_field = guideline.get("method", "")
-        method = method_field.split()[0] if method_field else ""
 
-        # ``8D`` method now uses a single LLM call with a dedicated prompt.
-        if method == "8D":
-            user_prompt = (
-                f"Müşteri Şikayeti: {complaint_text}\n"
-                f"Parça Kodu: {part_code}\n"
-                f"Problem Açıklaması: {subject or complaint_text}"
-            )
-            if directives:
-                user_prompt += (
-                    "\n---\nKullanıcıdan gelen özel talimatlar:\n"
-                    f"{directives}\n\n"
-                    "Lütfen yukarıdaki taleplere ve kısıtlamalara mutlaka uy."
+        def render(sections: Dict[str, str]) -> str:
+            text = sections["prompt"]
+            if sections["history"]:
+                text += (
+                    "\n---\nBenzer geçmiş 8D vakaları (yalnızca referans için):\n"
+                    f"{sections['history']}"
                 )
-            if language:
-                user_prompt += f"\nRaporu {language} dilinde yaz."
-            answer = self._query_llm(self._load_8d_prompt(), user_prompt)
-            return {"full_text": answer}
-
-        prompt_manager = PromptManager()
-        text_template = prompt_manager.get_text_prompt(method)
-        if text_template:
-            user_prompt = (
-                text_template.replace("{{musteri_sikayeti}}", complaint_text)
-                .replace("{{parca_kodu}}", part_code)
-                .replace("{{problem_aciklamasi}}", subject or complaint_text)
-            )
-            if directives:
-                user_prompt += (
+            if sections["directives"]:
+                text += (
                     "\n---\nKullanıcıdan gelen özel talimatlar:\n"
-                    f"{directives}\n\n"
+                    f"{sections['directives']}\n\n"
                     "Lütfen yukarıdaki taleplere ve kısıtlamalara mutlaka uy."
                 )
             if language:
-                user_prompt += f"\nRaporu {language} dilinde yaz."
-            answer = self._query_llm("", user_prompt)
-            return {"full_text": answer}
+                text += f"\nRaporu {language} dilinde yaz."
+            return text
+
+        sections = {
+            "prompt": user_prompt,
+            "directives": directives,
+            "history": history,
+        }
+        overhead = count_messages(self._messages(system_prompt, ""), self.model)
+        budget = prompt_budget(self.model)["budget"] - overhead
+        fitted, tokens = fit_sections(
+            render,
+            sections,
+            ["history", "directives", "prompt"],
+            budget,
+            self.model,
+        )
+        if fitted != sections:
+            self.logger.warning(
+                "Prompt trimmed to %d tokens to fit the context of %s",
+                tokens,
+                self.model,
+            )
+        return render(fitted)
 
-        template = {"system": "", "steps": {}}
-        if method:
-            template = prompt_manager.get_template(method)
+    def _step_prompts(
+        self,
+        details: Dict[str, Any],
+        guideline: Dict[str, Any],
+        template: Dict[str, Any],
+    ) -> List[Tuple[str, str, str]]:
+        """Return ``(step_id, system_prompt, user_prompt)`` for each step."""
+        complaint_text = details.get("complaint", "")
         system_tmpl = template.get("system", "")
         step_templates = template.get("steps", {})
         template_has_steps = bool(step_templates)
 
-        results: Dict[str, Any] = {}
+        prompts: List[Tuple[str, str, str]] = []
         fields = guideline.get("fields") or guideline.get("steps", [])
         for step in fields:
             step_id = step.get("id") or step.get("step", "unknown")
@@ -204,9 +275,9 @@ class LLMAnalyzer:
 
             values = {
                 "step_id": step_id,
-                "customer": customer,
-                "subject": subject,
-                "part_code": part_code,
+                "customer": details.get("customer", ""),
+                "subject": details.get("subject", ""),
+                "part_code": details.get("part_code", ""),
                 "complaint_text": complaint_text,
                 "definition": definition,
                 "complaint": complaint_text,
@@ -223,19 +294,352 @@ class LLMAnalyzer:
                 step_entry = template.get(step_id, {})
                 system_prompt = step_entry.get("system", "").format(**values)
                 user_prompt = step_entry.get("user_template", "").format(**values)
-            if directives:
-                user_prompt += (
-                    "\n---\nKullanıcıdan gelen özel talimatlar:\n"
-                    f"{directives}\n\n"
-                    "Lütfen yukarıdaki taleplere ve kısıtlamalara mutlaka uy."
-                )
-            if language:
-                user_prompt += f"\nRaporu {language} dilinde yaz."
+            prompts.append((step_id, system_prompt, user_prompt))
+        return prompts
 
-            answer = self._query_llm(system_prompt, user_prompt)
-            results[step_id] = {"response": answer}
+    def _run_steps(self, prompts: List[Tuple[str, str, str]]) -> Dict[str, Any]:
+        """Query the LLM for every step prompt and keep guideline order.
 
-        return results
+        Up to ``max_concurrency`` requests are in flight at the same time.
+        """
+        # Worker threads do not inherit the caller's metric tags
+        tags = current_tags()
+
+        def run(prompt: Tuple[str, str, str]) -> str:
+            step_id, system_prompt, user_prompt = prompt
+            with tagged(**tags, step=step_id):
+                return self._query_llm(system_prompt, user_prompt)
+
+        workers = min(self.max_concurrency, len(prompts))
+        if workers <= 1:
+            answers = [run(prompt) for prompt in prompts]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                answers = list(pool.map(run, prompts))
+        return {
+            step_id: {"response": answer}
+            for (step_id, _, _), answer in zip(prompts, answers)
+        }
+
+    async def _run_steps_async(
+        self, prompts: List[Tuple[str, str, str]]
+    ) -> Dict[str, Any]:
+        """Async counterpart of :meth:`_run_steps`."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(step_id: str, system_prompt: str, user_prompt: str) -> str:
+            async with semaphore:
+                with tagged(step=step_id):
+                    return await self._query_llm_async(system_prompt, user_prompt)
+
+        answers = await asyncio.gather(*(run(*prompt) for prompt in prompts))
+        return {
+            step_id: {"response": answer}
+            for (step_id, _, _), answer in zip(prompts, answers)
+        }
+
+    def _combine_steps(
+        self,
+        prompts: List[Tuple[str, str, str]],
+        directives: str,
+        language: str,
+        history: str = "",
+    ) -> Tuple[str, str]:
+        """Return one prompt pair asking for every step as a JSON object.
+
+        ``prompts`` are the step prompts built without directives, language
+        and past cases, which are appended once to the combined prompt
+        instead.
+        A system prompt shared by all steps is kept as the system prompt;
+        otherwise each step carries its own.
+        """
+        systems = {system for _, system, _ in prompts}
+        shared = systems.pop() if len(systems) == 1 else ""
+        sections = []
+        for step_id, system_prompt, user_prompt in prompts:
+            section = f"### {step_id}\n"
+            if system_prompt and not shared:
+                section += f"{system_prompt}\n"
+            sections.append((section + user_prompt).rstrip())
+        step_ids = ", ".join(step_id for step_id, _, _ in prompts)
+        user_prompt = "\n\n".join(sections) + (
+            "\n---\nYanıtını yalnızca geçerli bir JSON nesnesi olarak ver. "
+            f"Anahtarlar adım kimlikleri ({step_ids}), değerler ise o adımın "
+            "yanıt metni olsun."
+        )
+        user_prompt = self._append_instructions(
+            user_prompt, directives, language, shared, history
+        )
+        return shared, user_prompt
+
+    def _parse_steps(self, answer: str, step_ids: List[str]) -> Dict[str, str]:
+        """Return the non-empty step answers found in a JSON ``answer``."""
+        try:
+            data = json.loads(answer)
+        except json.JSONDecodeError:
+            self.logger.warning("Structured analysis returned invalid JSON")
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        answers: Dict[str, str] = {}
+        for step_id in step_ids:
+            value = data.get(step_id)
+            if value is not None and not isinstance(value, str):
+                value = json.dumps(value, ensure_ascii=False)
+            if value and value.strip():
+                answers[step_id] = value.strip()
+        return answers
+
+    def _structured_request(
+        self,
+        bare: List[Tuple[str, str, str]],
+        directives: str,
+        language: str,
+        history: str,
+    ) -> Tuple[str, str, List[str]] | None:
+        """Return the combined prompt pair and step ids, if it applies.
+
+        ``bare`` is the plan of :meth:`_bare_plan` and ``history`` the past
+        cases already looked up for the request. ``None`` means the steps
+        should be queried separately.
+        """
+        if not self.structured or len(bare) < 2 or bare[0][0] == FULL_TEXT:
+            return None
+        system_prompt, user_prompt = self._combine_steps(
+            bare, directives, language, history
+        )
+        return system_prompt, user_prompt, [step_id for step_id, _, _ in bare]
+
+    def _missing_steps(
+        self,
+        prompts: List[Tuple[str, str, str]],
+        answers: Dict[str, str],
+    ) -> List[Tuple[str, str, str]]:
+        """Return the prompts of steps missing from ``answers``."""
+        missing = [p for p in prompts if p[0] not in answers]
+        if missing:
+            self.logger.warning(
+                "Structured analysis missed %d steps; querying them separately",
+                len(missing),
+            )
+        return missing
+
+    @staticmethod
+    def _method_name(guideline: Dict[str, Any]) -> str:
+        """Return the method of ``guideline`` such as ``"8D"`` or ``"A3"``."""
+        method_field = guideline.get("method", "")
+        return method_field.split()[0] if method_field else ""
+
+    def _history(self, details: Dict[str, Any]) -> str:
+        """Return the past 8D reports most similar to the complaint as text."""
+        if self.cases is None or not self.similar_cases:
+            return ""
+        description = " ".join(
+            filter(None, [details.get("subject", ""), details.get("complaint", "")])
+        )
+        cases = self.cases.similar(
+            details.get("part_code", ""), description, self.similar_cases
+        )
+        self.logger.debug("LLMAnalyzer found %d similar 8D cases", len(cases))
+        return "\n".join(
+            f"- Parça Kodu: {case['material_code']}; Tanım: {case['description']}; "
+            f"Kök Neden: {case['root_cause']}; "
+            f"Kalıcı Aksiyon: {case['permanent_action']}"
+            for case in cases
+        )
+
+    def _plan(
+        self,
+        details: Dict[str, Any],
+        guideline: Dict[str, Any],
+        directives: str,
+        language: str,
+        history: str | None = None,
+    ) -> List[Tuple[str, str, str]]:
+        """Return the ``(step_id, system_prompt, user_prompt)`` requests.
+
+        Methods answered with one call yield a single request whose step id
+        is :data:`FULL_TEXT`. ``history`` describes similar past cases and
+        is looked up from :attr:`cases` when ``None``.
+        """
+        if history is None:
+            history = self._history(details)
+        return self._instruct(
+            self._bare_plan(details, guideline), directives, language, history
+        )
+
+    def _instruct(
+        self,
+        bare: List[Tuple[str, str, str]],
+        directives: str,
+        language: str,
+        history: str,
+    ) -> List[Tuple[str, str, str]]:
+        """Return ``bare`` with past cases, directives and language appended."""
+        return [
+            (
+                step_id,
+                system_prompt,
+                self._append_instructions(
+                    user_prompt, directives, language, system_prompt, history
+                ),
+            )
+            for step_id, system_prompt, user_prompt in bare
+        ]
+
+    def _bare_plan(
+        self, details: Dict[str, Any], guideline: Dict[str, Any]
+    ) -> List[Tuple[str, str, str]]:
+        """Return the requests of :meth:`_plan` without any instructions."""
+        complaint_text = details.get("complaint", "")
+        subject = details.get("subject", "")
+        part_code = details.get("part_code", "")
+        method = self._method_name(guideline)
+
+        # ``8D`` method now uses a single LLM call with a dedicated prompt.
+        if method == "8D":
+            user_prompt = (
+                f"Müşteri Şikayeti: {complaint_text}\n"
+                f"Parça Kodu: {part_code}\n"
+                f"Problem Açıklaması: {subject or complaint_text}"
+            )
+            return [(FULL_TEXT, self._load_8d_prompt(), user_prompt)]
+
+        prompt_manager = PromptManager()
+        text_template = prompt_manager.get_text_prompt(method)
+        if text_template:
+            user_prompt = (
+                text_template.replace("{{musteri_sikayeti}}", complaint_text)
+                .replace("{{parca_kodu}}", part_code)
+                .replace("{{problem_aciklamasi}}", subject or complaint_text)
+            )
+            return [(FULL_TEXT, "", user_prompt)]
+
+        template = {"system": "", "steps": {}}
+        if method:
+            template = prompt_manager.get_template(method)
+        return self._step_prompts(details, guideline, template)
+
+    def _analyze(
+        self,
+        details: Dict[str, Any],
+        guideline: Dict[str, Any],
+        directives: str,
+        language: str,
+    ) -> Dict[str, Any]:
+        """Implement :meth:`analyze` within the method's metric tags."""
+        history = self._history(details)
+        bare = self._bare_plan(details, guideline)
+        prompts = self._instruct(bare, directives, language, history)
+        if len(prompts) == 1 and prompts[0][0] == FULL_TEXT:
+            _, system_prompt, user_prompt = prompts[0]
+            with tagged(step=FULL_TEXT):
+                return {FULL_TEXT: self._query_llm(system_prompt, user_prompt)}
+        request = self._structured_request(bare, directives, language, history)
+        if request is None:
+            return self._run_steps(prompts)
+        system_prompt, user_prompt, step_ids = request
+        with tagged(step="structured"):
+            answer = self._query_llm(system_prompt, user_prompt, json_mode=True)
+        answers = self._parse_steps(answer, step_ids)
+        result = {step_id: {"response": answers[step_id]} for step_id in answers}
+        result.update(self._run_steps(self._missing_steps(prompts, answers)))
+        return {step_id: result[step_id] for step_id in step_ids}
+
+    def analyze(
+        self,
+        details: Dict[str, Any],
+        guideline: Dict[str, Any],
+        directives: str = "",
+        language: str = "Türkçe",
+    ) -> Dict[str, Any]:
+        """Return analysis using complaint details.
+
+        Parameters
+        ----------
+        details
+            Complaint information such as text and customer.
+        guideline
+            Guideline describing the report format.
+        directives
+            Optional user directives to customize the report.
+        language
+            Desired language for the response.
+        """
+        with tagged(method=self._method_name(guideline)):
+            return self._analyze(details, guideline, directives, language)
+
+    async def _analyze_async(
+        self,
+        details: Dict[str, Any],
+        guideline: Dict[str, Any],
+        directives: str,
+        language: str,
+    ) -> Dict[str, Any]:
+        """Implement :meth:`analyze_async` within the method's metric tags."""
+        history = await asyncio.to_thread(self._history, details)
+        bare = await asyncio.to_thread(self._bare_plan, details, guideline)
+        prompts = await asyncio.to_thread(
+            self._instruct, bare, directives, language, history
+        )
+        if len(prompts) == 1 and prompts[0][0] == FULL_TEXT:
+            _, system_prompt, user_prompt = prompts[0]
+            with tagged(step=FULL_TEXT):
+                answer = await self._query_llm_async(system_prompt, user_prompt)
+            return {FULL_TEXT: answer}
+        request = await asyncio.to_thread(
+            self._structured_request, bare, directives, language, history
+        )
+        if request is None:
+            return await self._run_steps_async(prompts)
+        system_prompt, user_prompt, step_ids = request
+        with tagged(step="structured"):
+            answer = await self._query_llm_async(
+                system_prompt, user_prompt, json_mode=True
+            )
+        answers = self._parse_steps(answer, step_ids)
+        result = {step_id: {"response": answers[step_id]} for step_id in answers}
+        result.update(
+            await self._run_steps_async(self._missing_steps(prompts, answers))
+        )
+        return {step_id: result[step_id] for step_id in step_ids}
+
+    async def analyze_async(
+        self,
+        details: Dict[str, Any],
+        guideline: Dict[str, Any],
+        directives: str = "",
+        language: str = "Türkçe",
+    ) -> Dict[str, Any]:
+        """Async counterpart of :meth:`analyze` with the same arguments.
+
+        Prompt files are read in a worker thread and the LLM is awaited on
+        the event loop, so no thread is held while waiting for responses.
+        """
+        with tagged(method=self._method_name(guideline)):
+            return await self._analyze_async(details, guideline, directives, language)
+
+    def analyze_stream(
+        self,
+        details: Dict[str, Any],
+        guideline: Dict[str, Any],
+        directives: str = "",
+        language: str = "Türkçe",
+    ) -> Iterator[Dict[str, str]]:
+        """Yield the analysis as ``{"step": ..., "delta": ...}`` events.
+
+        Takes the same arguments as :meth:`analyze`. Steps are streamed one
+        after another in guideline order; single-call methods use the step
+        id ``"full_text"``.
+        """
+        method = self._method_name(guideline)
+        for step_id, system_prompt, user_prompt in self._plan(
+            details, guideline, directives, language
+        ):
+            # A generator may resume in another context, so tags are explicit
+            tags = {"method": method, "step": step_id}
+            for delta in self._stream_llm(system_prompt, user_prompt, tags):
+                yield {"step": step_id, "delta": delta}
 
 
-__all__ = ["LLMAnalyzer", "OpenAIError", "DEFAULT_8D_PROMPT"]
+__all__ = ["LLMAnalyzer", "OpenAIError", "DEFAULT_8D_PROMPT", "FULL_TEXT"]
@@ -0,0 +1,226 @@
+"""Shared OpenAI client instances for the LLM components.
+
+Creating an ``OpenAI`` client per request discards its HTTP connection pool,
+so every call pays for a new TLS handshake. :class:`ClientProvider` keeps a
+single client with a keep-alive pool and only rebuilds it when the API key
+or base URL changes. Separate providers hold the ``OpenAI`` and
+``AsyncOpenAI`` clients.
+
+``LLM_BACKEND`` selects where requests go: ``openai`` (the default) or
+``stub``, which answers locally with simulated latency for load tests and
+offline runs.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Callable, Iterable, Iterator, Tuple
+
+DEFAULT_MAX_CONNECTIONS = 10
+DEFAULT_TIMEOUT = 60.0
+BACKENDS = ("openai", "stub")
+
+logger = logging.getLogger(__name__)
+
+
+class ClientProvider:
+    """Build and reuse an OpenAI client for the current configuration."""
+
+    def __init__(
+        self,
+        max_connections: int | None = None,
+        timeout: float | None = None,
+        asynchronous: bool = False,
+    ) -> None:
+        """Initialize with optional pool size and request timeout.
+
+        ``OPENAI_MAX_CONNECTIONS`` and ``OPENAI_TIMEOUT`` (seconds) are read
+        when a client is built if the arguments are ``None``. With
+        ``asynchronous`` the provider builds ``AsyncOpenAI`` clients.
+        """
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.asynchronous = asynchronous
+        self._lock = threading.Lock()
+        self._client: Any = None
+        self._key: Tuple[Any, ...] | None = None
+
+    def _build(self, api_key: str, base_url: str | None) -> Any:
+        """Return a new client with a bounded keep-alive pool."""
+        import openai  # type: ignore
+
+        if self.asynchronous:
+            client_cls = openai.AsyncOpenAI
+            http_cls = getattr(openai, "DefaultAsyncHttpxClient", None)
+        else:
+            client_cls = openai.OpenAI
+            http_cls = getattr(openai, "DefaultHttpxClient", None)
+
+        max_connections = self.max_connections
+        if max_connections is None:
+            max_connections = int(
+                os.getenv("OPENAI_MAX_CONNECTIONS", str(DEFAULT_MAX_CONNECTIONS))
+            )
+        timeout = self.timeout
+        if timeout is None:
+            timeout = float(os.getenv("OPENAI_TIMEOUT", str(DEFAULT_TIMEOUT)))
+
+        # Retries are handled by :class:`RateLimiter` so they can be throttled
+        kwargs: dict[str, Any] = {
+            "api_key": api_key,
+            "timeout": timeout,
+            "max_retries": 0,
+        }
+        if base_url:
+            kwargs["base_url"] = base_url
+        # Older SDKs do not export the httpx defaults and manage their pool
+        if http_cls is not None:
+            import httpx
+
+            kwargs["http_client"] = http_cls(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                ),
+                timeout=timeout,
+            )
+        return client_cls(**kwargs)
+
+    def get(self, api_key: str, base_url: str | None = None, scope: Any = None) -> Any:
+        """Return the shared client for ``api_key`` and ``base_url``.
+
+        A change of ``scope`` also rebuilds the client; async callers pass
+        their event loop because a connection pool cannot move between
+        loops. The previous client is left to finish in-flight requests and
+        is garbage collected once unused.
+
+        Raises
+        ------
+        ImportError
+            If the ``openai`` package is not installed.
+        """
+        key = (api_key, base_url, scope)
+        with self._lock:
+            if self._client is None or self._key != key:
+                if self._client is not None:
+                    logger.info("OpenAI configuration changed; rebuilding client")
+                self._client = self._build(api_key, base_url)
+                self._key = key
+            return self._client
+
+    def reset(self) -> None:
+        """Drop the cached client so the next call builds a new one."""
+        with self._lock:
+            self._client = None
+            self._key = None
+
+
+_provider = ClientProvider()
+_async_provider = ClientProvider(asynchronous=True)
+
+
+def get_backend() -> str:
+    """Return the backend selected with ``LLM_BACKEND``.
+
+    Raises
+    ------
+    ValueError
+        If the variable names an unknown backend.
+    """
+    backend = os.getenv("LLM_BACKEND", "openai").strip().lower() or "openai"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND: {backend}")
+    return backend
+
+
+def requires_api_key() -> bool:
+    """Return whether the selected backend needs ``OPENAI_API_KEY``."""
+    return get_backend() == "openai"
+
+
+def get_client(api_key: str) -> Any:
+    """Return the process-wide client for ``api_key`` and ``OPENAI_BASE_URL``."""
+    if get_backend() == "stub":
+        return StubClient(get_stub_llm())
+    return _provider.get(api_key, os.getenv("OPENAI_BASE_URL") or None)
+
+
+def get_async_client(api_key: str) -> Any:
+    """Return the ``AsyncOpenAI`` client of the running event loop.
+
+    Must be called from a coroutine.
+    """
+    if get_backend() == "stub":
+        return StubClient(get_stub_llm(), asynchronous=True)
+    return _async_provider.get(
+        api_key,
+        os.getenv("OPENAI_BASE_URL") or None,
+        scope=asyncio.get_running_loop(),
+    )
+
+
+def iter_deltas(
+    stream: Iterable[Any], on_usage: Callable[[Any], None] | None = None
+) -> Iterator[str]:
+    """Yield the text of each chunk of a ``stream=True`` chat completion.
+
+    ``on_usage`` receives the usage reported by the final chunk when the
+    request set ``stream_options={"include_usage": True}``.
+    """
+    for chunk in stream:
+        usage = getattr(chunk, "usage", None)
+        if usage is not None and on_usage is not None:
+            on_usage(usage)
+        if not chunk.choices:
+            continue
+        content = getattr(chunk.choices[0].delta, "content", None)
+        if content:
+            yield content
+
+
+def reset_clients() -> None:
+    """Discard the process-wide clients."""
+    _provider.reset()
+    _async_provider.reset()
+
+
+from .cache import ResponseCache, get_response_cache  # noqa: E402
+from .completion import Completer  # noqa: E402
+from .metrics import LLMMetrics, current_tags, get_metrics, tagged  # noqa: E402
+from .ratelimit import LLMUnavailableError, RateLimiter, get_rate_limiter  # noqa: E402
+from .stub import StubClient, StubLLM, get_stub_llm  # noqa: E402
+from .tokens import (  # noqa: E402
+    count_messages,
+    fit_sections,
+    prompt_budget,
+)
+
+
+__all__ = [
+    "ClientProvider",
+    "Completer",
+    "LLMMetrics",
+    "LLMUnavailableError",
+    "RateLimiter",
+    "ResponseCache",
+    "StubClient",
+    "StubLLM",
+    "count_messages",
+    "current_tags",
+    "fit_sections",
+    "get_async_client",
+    "get_backend",
+    "get_client",
+    "get_metrics",
+    "get_rate_limiter",
+    "get_response_cache",
+    "get_stub_llm",
+    "iter_deltas",
+    "prompt_budget",
+    "requires_api_key",
+    "reset_clients",
+    "tagged",
+]
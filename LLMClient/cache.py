@@ -0,0 +1,200 @@
+"""Content-addressed cache for LLM responses."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Tuple
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MEMORY_ENTRIES = 256
+
+
+class ResponseCache:
+    """Two-tier cache keyed by a hash of the model and prompts.
+
+    Lookups try an in-memory LRU first and an optional SQLite file second.
+    Entries older than ``ttl`` seconds are treated as missing, and each tier
+    drops its least recently used entries beyond its size limit.
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        memory_entries: int = DEFAULT_MEMORY_ENTRIES,
+    ) -> None:
+        """Initialize the cache.
+
+        Parameters
+        ----------
+        path:
+            SQLite file for the persistent tier. Only memory is used when
+            ``None``.
+        ttl:
+            Lifetime of an entry in seconds.
+        max_entries, memory_entries:
+            Maximum number of entries kept on disk and in memory.
+        """
+        self.path = Path(path) if path else None
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory: OrderedDict[str, Tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.path is not None:
+            with self._connect() as conn, conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                    "created REAL NOT NULL, accessed REAL NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS responses_accessed "
+                    "ON responses(accessed)"
+                )
+
+    def _connect(self) -> closing[sqlite3.Connection]:
+        """Return a connection that is closed when the block exits."""
+        return closing(sqlite3.connect(self.path))
+
+    @staticmethod
+    def key(model: str, system_prompt: str | None, user_prompt: str) -> str:
+        """Return the cache key for a request."""
+        payload = json.dumps([model, system_prompt, user_prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, created: float, value: str) -> None:
+        """Store ``value`` in the memory tier, evicting the oldest entries."""
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(
+        self, model: str, system_prompt: str | None, user_prompt: str
+    ) -> str | None:
+        """Return the cached response for the request or ``None``.
+
+        The lock only guards the memory tier and the counters; the SQLite
+        tier is read without holding it.
+        """
+        key = self.key(model, system_prompt, user_prompt)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._memory.pop(key, None)
+        row = None
+        if self.path is not None:
+            with self._connect() as conn, conn:
+                row = conn.execute(
+                    "SELECT value, created FROM responses WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is not None and now - row[1] < self.ttl:
+                    conn.execute(
+                        "UPDATE responses SET accessed = ? WHERE key = ?",
+                        (now, key),
+                    )
+                elif row is not None:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    row = None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self._remember(key, row[1], row[0])
+            self.hits += 1
+            self.disk_hits += 1
+            return row[0]
+
+    def put(
+        self, model: str, system_prompt: str | None, user_prompt: str, value: str
+    ) -> None:
+        """Store ``value`` as the response for the request."""
+        key = self.key(model, system_prompt, user_prompt)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+        if self.path is None:
+            return
+        with self._connect() as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses(key, value, created, accessed) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            conn.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            self._memory.clear()
+            self.hits = self.disk_hits = self.misses = 0
+            if self.path is not None:
+                with self._connect() as conn, conn:
+                    conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit and miss counters and the hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+
+_cache: ResponseCache | None = None
+_cache_config: Tuple[str, ...] | None = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache | None:
+    """Return the process-wide cache, or ``None`` unless ``LLM_CACHE`` is set.
+
+    ``LLM_CACHE_PATH`` (default ``llm_cache.db``; empty for memory only),
+    ``LLM_CACHE_TTL`` and ``LLM_CACHE_MAX_ENTRIES`` configure the cache.
+    """
+    global _cache, _cache_config
+    if os.getenv("LLM_CACHE", "").lower() not in {"1", "true", "yes", "on"}:
+        return None
+    config = (
+        os.getenv("LLM_CACHE_PATH", "llm_cache.db"),
+        os.getenv("LLM_CACHE_TTL", str(DEFAULT_TTL)),
+        os.getenv("LLM_CACHE_MAX_ENTRIES", str(DEFAULT_MAX_ENTRIES)),
+    )
+    with _cache_lock:
+        if _cache is None or _cache_config != config:
+            path, ttl, max_entries = config
+            _cache = ResponseCache(path or None, float(ttl), int(max_entries))
+            _cache_config = config
+        return _cache
+
+
+__all__ = ["ResponseCache", "get_response_cache"]
@@ -0,0 +1,304 @@
+"""Chat completions shared by the LLM components.
+
+:class:`Completer` sends one chat request through everything the components
+have in common: the response cache, the prompt budget check, the shared
+rate limiter and the call metrics. Components only build their messages
+and pick the error type raised to their callers. A missing API key and
+every failed request raise that error.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, List, NoReturn, Tuple, Type
+import asyncio
+import logging
+import os
+import time
+
+from . import get_async_client, get_client, iter_deltas, requires_api_key
+from .cache import ResponseCache, get_response_cache
+from .metrics import get_metrics
+from .ratelimit import LLMUnavailableError, get_rate_limiter
+from .tokens import count_messages, prompt_budget
+
+Messages = List[Dict[str, str]]
+
+
+class Completer:
+    """Run chat completions for one component.
+
+    Parameters
+    ----------
+    component:
+        Name of the component in the LLM metrics, such as ``"analyzer"``.
+    error:
+        Exception type raised for configuration and API failures.
+    logger:
+        Logger of the component; messages are prefixed with ``label``.
+    label:
+        Name used in log messages, such as ``"LLMAnalyzer"``.
+    """
+
+    def __init__(
+        self,
+        component: str,
+        error: Type[Exception],
+        logger: logging.Logger,
+        label: str,
+    ) -> None:
+        self.component = component
+        self.error = error
+        self.logger = logger
+        self.label = label
+
+    @staticmethod
+    def _prompts(messages: Messages) -> Tuple[str | None, str]:
+        """Return the system and user prompts of ``messages`` for the cache key."""
+        system = next((m["content"] for m in messages if m["role"] == "system"), None)
+        user = next((m["content"] for m in messages if m["role"] == "user"), "")
+        return system, user
+
+    @staticmethod
+    def _cache(cache: ResponseCache | None) -> ResponseCache | None:
+        """Return ``cache`` or the shared cache enabled with ``LLM_CACHE``."""
+        return cache or get_response_cache()
+
+    def _cached(
+        self, cache: ResponseCache | None, model: str, messages: Messages
+    ) -> str | None:
+        """Return the cached answer for the request if any."""
+        if cache is None:
+            return None
+        cached = cache.get(model, *self._prompts(messages))
+        if cached is not None:
+            self.logger.debug("%s cache hit", self.label)
+        return cached
+
+    def _api_key(self) -> str:
+        """Return ``OPENAI_API_KEY`` or raise :attr:`error`.
+
+        The key may be empty for backends that do not need one.
+        """
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key and requires_api_key():
+            raise self.error("OPENAI_API_KEY not set")
+        return api_key or ""
+
+    def check_budget(self, model: str, messages: Messages) -> int:
+        """Log the prompt size against the model budget and return it.
+
+        Raises
+        ------
+        Exception
+            :attr:`error` if the prompt cannot fit the context window.
+        """
+        budget = prompt_budget(model)
+        tokens = count_messages(messages, model)
+        self.logger.info(
+            "%s prompt tokens: %d of %d (%d reserved for output)",
+            self.label,
+            tokens,
+            budget["budget"],
+            budget["output_tokens"],
+        )
+        if tokens > budget["budget"]:
+            raise self.error(
+                f"Prompt of {tokens} tokens exceeds the {budget['budget']} token "
+                f"budget of {model}"
+            )
+        return tokens
+
+    def _client(self, api_key: str, asynchronous: bool = False) -> Any:
+        try:
+            if asynchronous:
+                return get_async_client(api_key)
+            return get_client(api_key)
+        except ImportError as exc:  # pragma: no cover - optional dependency
+            raise self.error("openai package is not installed") from exc
+
+    @staticmethod
+    def _request(model: str, messages: Messages, json_mode: bool) -> Dict[str, Any]:
+        """Return the chat completion arguments."""
+        kwargs: Dict[str, Any] = {"model": model, "messages": messages}
+        if json_mode:
+            kwargs["response_format"] = {"type": "json_object"}
+        return kwargs
+
+    def _text(self, response: Any) -> str:
+        """Return the text of a completion and log its token usage."""
+        tokens = getattr(getattr(response, "usage", None), "total_tokens", None)
+        if tokens is not None:
+            self.logger.info("%s tokens used: %s", self.label, tokens)
+        result = response.choices[0].message.content.strip()
+        self.logger.debug(
+            "%s returned: %s", self.label, result.replace("\n", " ")[:200]
+        )
+        return result
+
+    def _record(
+        self,
+        model: str,
+        started: float,
+        usage: Any = None,
+        error: bool = False,
+        tags: Dict[str, str] | None = None,
+    ) -> None:
+        """Record the latency and token usage of a call since ``started``."""
+        get_metrics().record(
+            self.component,
+            model,
+            time.perf_counter() - started,
+            usage,
+            error=error,
+            tags=tags,
+        )
+
+    def _fail(self, exc: Exception) -> NoReturn:
+        """Log the failed request and raise :attr:`error` from ``exc``."""
+        self.logger.error("%s error: %s", self.label, exc)
+        if isinstance(exc, LLMUnavailableError):
+            raise self.error(str(exc)) from exc
+        message = str(exc).lower()
+        if "invalid" in message or "incorrect" in message:
+            raise self.error("Invalid OpenAI API key") from exc
+        raise self.error(f"LLM request failed: {exc}") from exc
+
+    def complete(
+        self,
+        model: str,
+        messages: Messages,
+        cache: ResponseCache | None = None,
+        json_mode: bool = False,
+    ) -> str:
+        """Return the answer to ``messages``.
+
+        ``cache`` defaults to the shared response cache. ``json_mode`` asks
+        the API to enforce a JSON object response.
+
+        Raises
+        ------
+        Exception
+            :attr:`error` if no API key is set, the prompt is too large or
+            the request fails.
+        """
+        cache = self._cache(cache)
+        cached = self._cached(cache, model, messages)
+        if cached is not None:
+            return cached
+        api_key = self._api_key()
+        tokens = self.check_budget(model, messages)
+        client = self._client(api_key)
+        kwargs = self._request(model, messages, json_mode)
+        started = time.perf_counter()
+        try:
+            response = get_rate_limiter().call(
+                lambda: client.chat.completions.create(**kwargs), tokens=tokens
+            )
+        except Exception as exc:
+            self._record(model, started, error=True)
+            self._fail(exc)
+        self._record(model, started, getattr(response, "usage", None))
+        try:
+            result = self._text(response)
+        except Exception as exc:
+            self._fail(exc)
+        if cache is not None:
+            cache.put(model, *self._prompts(messages), result)
+        return result
+
+    async def complete_async(
+        self,
+        model: str,
+        messages: Messages,
+        cache: ResponseCache | None = None,
+        json_mode: bool = False,
+    ) -> str:
+        """Async counterpart of :meth:`complete` with the same arguments.
+
+        Cache lookups and metric records may touch the disk, so they run in
+        worker threads instead of on the event loop.
+        """
+        cache = self._cache(cache)
+        cached = await asyncio.to_thread(self._cached, cache, model, messages)
+        if cached is not None:
+            return cached
+        api_key = self._api_key()
+        tokens = self.check_budget(model, messages)
+        client = self._client(api_key, asynchronous=True)
+        kwargs = self._request(model, messages, json_mode)
+        started = time.perf_counter()
+        try:
+            response = await get_rate_limiter().call_async(
+                lambda: client.chat.completions.create(**kwargs), tokens=tokens
+            )
+        except Exception as exc:
+            await asyncio.to_thread(self._record, model, started, error=True)
+            self._fail(exc)
+        await asyncio.to_thread(
+            self._record, model, started, getattr(response, "usage", None)
+        )
+        try:
+            result = self._text(response)
+        except Exception as exc:
+            self._fail(exc)
+        if cache is not None:
+            await asyncio.to_thread(cache.put, model, *self._prompts(messages), result)
+        return result
+
+    def stream(
+        self,
+        model: str,
+        messages: Messages,
+        cache: ResponseCache | None = None,
+        tags: Dict[str, str] | None = None,
+    ) -> Iterator[str]:
+        """Yield the answer to ``messages`` as it is generated.
+
+        ``tags`` label the call in the LLM metrics because a generator may
+        resume in another context.
+
+        Raises
+        ------
+        Exception
+            :attr:`error` if no API key is set or the request fails,
+            including after part of the answer was yielded; no placeholder
+            text is produced.
+        """
+        cache = self._cache(cache)
+        cached = self._cached(cache, model, messages)
+        if cached is not None:
+            yield cached
+            return
+        api_key = self._api_key()
+        tokens = self.check_budget(model, messages)
+        client = self._client(api_key)
+        parts: List[str] = []
+        usage: List[Any] = []
+        started = time.perf_counter()
+        try:
+            # Only opening the stream is limited; tokens arrive afterwards
+            stream = get_rate_limiter().call(
+                lambda: client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                ),
+                tokens=tokens,
+            )
+            for delta in iter_deltas(stream, usage.append):
+                parts.append(delta)
+                yield delta
+        except Exception as exc:
+            # Partial output must not look like a complete answer
+            self._record(model, started, error=True, tags=tags)
+            self.logger.error("%s stream failed: %s", self.label, exc)
+            if isinstance(exc, self.error):
+                raise
+            raise self.error(f"LLM stream failed: {exc}") from exc
+        self._record(model, started, usage[-1] if usage else None, tags=tags)
+        if cache is not None and parts:
+            cache.put(model, *self._prompts(messages), "".join(parts).strip())
+
+
+__all__ = ["Completer"]
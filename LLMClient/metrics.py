@@ -0,0 +1,237 @@
+"""Token and latency metrics for LLM calls.
+
+Every completion is recorded with its model, token usage and latency,
+tagged with the component and the report method and guideline step that
+were active when it was made. Tags are kept in a context variable so they
+follow a request into coroutines without changing call signatures; use
+:func:`tagged` around code that issues LLM calls.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Tuple
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+DEFAULT_WINDOW = 1000
+PERCENTILES = (50, 90, 95, 99)
+
+logger = logging.getLogger(__name__)
+
+_tags: ContextVar[Dict[str, str]] = ContextVar("llm_tags", default={})
+
+
+@contextmanager
+def tagged(**tags: str) -> Iterator[None]:
+    """Add ``tags`` to the LLM calls made inside the block."""
+    token = _tags.set({**_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+def current_tags() -> Dict[str, str]:
+    """Return the tags active in the current context."""
+    return dict(_tags.get())
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    """Return the nearest-rank percentile of sorted ``values``."""
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+class _Series:
+    """Running totals and a window of recent samples for one tag set."""
+
+    def __init__(self, window: int) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_tokens = 0
+        self.cost = 0.0
+        self.latency_total = 0.0
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.tokens: Deque[int] = deque(maxlen=window)
+
+
+class LLMMetrics:
+    """Aggregate LLM call records in memory and optionally persist them.
+
+    Totals are kept for the life of the process while percentiles are
+    computed over the last ``window`` calls of each
+    ``(component, method, step, model)`` series.
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        window: int = DEFAULT_WINDOW,
+        prices: Dict[str, Tuple[float, float]] | None = None,
+    ) -> None:
+        """Initialize the recorder.
+
+        Parameters
+        ----------
+        path:
+            JSON Lines file receiving one line per call when given.
+        window:
+            Number of recent calls per series used for percentiles.
+        prices:
+            Prices per 1000 prompt and completion tokens by model, used to
+            estimate cost.
+        """
+        self.path = Path(path) if path else None
+        self.window = window
+        self.prices = prices or {}
+        self._series: Dict[Tuple[str, str, str, str], _Series] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        component: str,
+        model: str,
+        latency: float,
+        usage: Any = None,
+        error: bool = False,
+        tags: Dict[str, str] | None = None,
+    ) -> None:
+        """Record one call.
+
+        ``usage`` is the ``usage`` object of a completion, or ``None`` when
+        the call failed or the usage is not reported. ``tags`` default to
+        those active in the current context.
+        """
+        if tags is None:
+            tags = current_tags()
+        prompt = getattr(usage, "prompt_tokens", None)
+        completion = getattr(usage, "completion_tokens", None)
+        total = getattr(usage, "total_tokens", None)
+        prompt = prompt if isinstance(prompt, int) else 0
+        completion = completion if isinstance(completion, int) else 0
+        total = total if isinstance(total, int) else prompt + completion
+        price = self.prices.get(model)
+        cost = (prompt * price[0] + completion * price[1]) / 1000 if price else 0.0
+        key = (component, tags.get("method", ""), tags.get("step", ""), model)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(self.window)
+            series.calls += 1
+            series.errors += int(error)
+            series.prompt_tokens += prompt
+            series.completion_tokens += completion
+            series.total_tokens += total
+            series.cost += cost
+            series.latency_total += latency
+            series.latencies.append(latency)
+            series.tokens.append(total)
+        if self.path is not None:
+            self._persist(
+                {
+                    "time": time.time(),
+                    "component": component,
+                    "method": key[1],
+                    "step": key[2],
+                    "model": model,
+                    "prompt_tokens": prompt,
+                    "completion_tokens": completion,
+                    "total_tokens": total,
+                    "latency": round(latency, 4),
+                    "error": error,
+                }
+            )
+
+    def _persist(self, entry: Dict[str, Any]) -> None:
+        """Append ``entry`` to the metrics log with a single write."""
+        data = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+        except OSError as exc:
+            logger.warning("Could not write LLM metrics to %s: %s", self.path, exc)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Return totals and percentiles per series, most expensive first."""
+        rows: List[Dict[str, Any]] = []
+        with self._lock:
+            for (component, method, step, model), series in self._series.items():
+                latencies = sorted(series.latencies)
+                tokens = sorted(series.tokens)
+                row: Dict[str, Any] = {
+                    "component": component,
+                    "method": method,
+                    "step": step,
+                    "model": model,
+                    "calls": series.calls,
+                    "errors": series.errors,
+                    "prompt_tokens": series.prompt_tokens,
+                    "completion_tokens": series.completion_tokens,
+                    "total_tokens": series.total_tokens,
+                    "cost": round(series.cost, 6),
+                    "latency_avg": round(series.latency_total / series.calls, 4),
+                }
+                for pct in PERCENTILES:
+                    row[f"latency_p{pct}"] = round(_percentile(latencies, pct), 4)
+                    row[f"tokens_p{pct}"] = _percentile(tokens, pct)
+                rows.append(row)
+        rows.sort(key=lambda r: (-r["total_tokens"], -r["latency_avg"]))
+        return rows
+
+    def reset(self) -> None:
+        """Forget all recorded calls."""
+        with self._lock:
+            self._series.clear()
+
+
+def _load_prices(value: str) -> Dict[str, Tuple[float, float]]:
+    """Parse ``LLM_PRICES`` JSON into prompt and completion prices."""
+    if not value:
+        return {}
+    try:
+        data = json.loads(value)
+        return {model: (float(p[0]), float(p[1])) for model, p in data.items()}
+    except (ValueError, TypeError, IndexError, AttributeError):
+        logger.warning("Ignoring malformed LLM_PRICES: %s", value)
+        return {}
+
+
+_metrics: LLMMetrics | None = None
+_metrics_config: Tuple[str, ...] | None = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> LLMMetrics:
+    """Return the process-wide recorder configured from the environment.
+
+    ``LLM_METRICS_PATH`` enables persistence to a JSON Lines file and
+    ``LLM_PRICES`` maps models to ``[prompt, completion]`` prices per 1000
+    tokens, for example ``{"gpt-4o-mini": [0.00015, 0.0006]}``. Recorded
+    calls are kept when only the configuration changes.
+    """
+    global _metrics, _metrics_config
+    config = (os.getenv("LLM_METRICS_PATH", ""), os.getenv("LLM_PRICES", ""))
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = LLMMetrics()
+        if _metrics_config != config:
+            _metrics.path = Path(config[0]) if config[0] else None
+            _metrics.prices = _load_prices(config[1])
+            _metrics_config = config
+        return _metrics
+
+
+__all__ = ["LLMMetrics", "current_tags", "get_metrics", "tagged"]
@@ -0,0 +1,380 @@
+"""Client-side rate limiting and retries for LLM requests.
+
+:class:`RateLimiter` combines token buckets for requests and tokens per
+minute with an additive-increase/multiplicative-decrease (AIMD) limit on
+requests in flight. Throttled and transient failures are retried with
+jittered exponential backoff that honours ``Retry-After``, so parallel work
+converges to the account's real limits instead of failing.
+"""
+
+from __future__ import annotations
+
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, List, Tuple, TypeVar
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_MAX_IN_FLIGHT = 16
+RETRYABLE_STATUS = {408, 409, 429}
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError"}
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised when a request still fails after all retries."""
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``per_minute`` tokens a minute.
+
+    :meth:`reserve` takes tokens immediately, letting the balance go
+    negative, and returns how long the caller must wait until the debt is
+    repaid. This keeps reservations first come, first served without
+    polling.
+    """
+
+    def __init__(self, per_minute: float, capacity: float | None = None) -> None:
+        """Initialize a full bucket holding at most ``capacity`` tokens.
+
+        ``capacity`` defaults to one minute worth of tokens.
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    def reserve(self, amount: float) -> float:
+        """Take ``amount`` tokens and return the seconds to wait before use."""
+        with self._lock:
+            self._refill()
+            self._tokens -= min(amount, self.capacity)
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def adjust(self, amount: float) -> None:
+        """Take ``amount`` more tokens, or refund them when negative."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+
+class AIMDController:
+    """Limit requests in flight, adapting the limit to throttling.
+
+    Every successful request raises the limit by ``1 / limit``, that is by
+    one per window of requests, up to ``maximum``. A throttled request
+    multiplies it by ``decrease``; further throttles within ``cooldown``
+    seconds belong to the same burst and are ignored.
+
+    Threads wait for a slot on a condition variable and coroutines on a
+    future resolved by their event loop, so neither polls.
+    """
+
+    def __init__(
+        self,
+        maximum: int,
+        minimum: int = 1,
+        decrease: float = 0.5,
+        cooldown: float = 1.0,
+    ) -> None:
+        """Initialize with the limit at ``maximum``."""
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.limit = float(self.maximum)
+        self.in_flight = 0
+        self._last_decrease = float("-inf")
+        self._cond = threading.Condition()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def try_acquire(self) -> bool:
+        """Take a slot if one is free and return whether it was taken."""
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self) -> None:
+        """Block until a slot is free and take it."""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    async def acquire_async(self) -> None:
+        """Wait without blocking the event loop until a slot is free and take it."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            await waiter
+
+    @staticmethod
+    def _wake(waiter: asyncio.Future) -> None:
+        if not waiter.done():
+            waiter.set_result(None)
+
+    def _notify(self) -> None:
+        """Wake every thread and coroutine waiting for a slot."""
+        self._cond.notify_all()
+        waiters, self._waiters = self._waiters, []
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(self._wake, waiter)
+            except RuntimeError:
+                # The waiting event loop was closed
+                pass
+
+    def release(self) -> None:
+        """Return a slot taken by one of the acquire methods."""
+        with self._cond:
+            self.in_flight -= 1
+            self._notify()
+
+    def on_success(self) -> None:
+        """Grow the limit additively."""
+        with self._cond:
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._notify()
+
+    def on_throttle(self) -> None:
+        """Shrink the limit multiplicatively once per burst of throttles."""
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+            self.limit = max(self.minimum, self.limit * self.decrease)
+            logger.warning("LLM requests throttled; concurrency limit %.1f", self.limit)
+
+
+def _status(exc: Exception) -> int | None:
+    """Return the HTTP status code carried by ``exc`` if any."""
+    status = getattr(exc, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _retry_after(exc: Exception) -> float | None:
+    """Return the delay requested by the response of ``exc`` in seconds."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        value = headers.get("retry-after-ms")
+        if value is not None:
+            return float(value) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Return whether ``exc`` is a throttled or transient failure."""
+    if getattr(exc, "code", None) == "insufficient_quota":
+        return False
+    status = _status(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    return type(exc).__name__ in RETRYABLE_ERRORS
+
+
+def _usage_tokens(result: Any) -> int | None:
+    """Return the total tokens reported by a completion if available."""
+    tokens = getattr(getattr(result, "usage", None), "total_tokens", None)
+    return tokens if isinstance(tokens, int) else None
+
+
+class RateLimiter:
+    """Throttle, bound and retry LLM requests shared across callers."""
+
+    def __init__(
+        self,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ) -> None:
+        """Initialize the limiter.
+
+        Parameters
+        ----------
+        requests_per_minute, tokens_per_minute:
+            Client-side budgets; ``None`` or ``0`` disables the bucket.
+        max_in_flight:
+            Upper bound of the adaptive concurrency limit.
+        max_retries:
+            Retries of a throttled or transient failure before giving up.
+        base_delay, max_delay:
+            First backoff delay and its upper bound in seconds.
+        """
+        self.requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = AIMDController(max_in_flight)
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def _reserve(self, tokens: int) -> float:
+        """Reserve one request and ``tokens`` and return the wait in seconds."""
+        delay = 0.0
+        if self.requests is not None:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens is not None and tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        return delay
+
+    def _succeeded(self, result: Any, tokens: int) -> None:
+        """Settle the token estimate against the reported usage."""
+        self.concurrency.on_success()
+        used = _usage_tokens(result)
+        if self.tokens is not None and used is not None:
+            self.tokens.adjust(used - tokens)
+
+    def _backoff(self, exc: Exception, attempt: int, tokens: int) -> float:
+        """Return the delay before retrying after ``exc`` or raise.
+
+        Raises
+        ------
+        Exception
+            ``exc`` itself when it is not retryable.
+        LLMUnavailableError
+            When the retries are exhausted.
+        """
+        if self.tokens is not None and tokens:
+            self.tokens.adjust(-tokens)
+        if not is_retryable(exc):
+            raise exc
+        status = _status(exc)
+        if status == 429:
+            self.concurrency.on_throttle()
+        if attempt >= self.max_retries:
+            raise LLMUnavailableError(
+                f"LLM request failed after {attempt + 1} attempts: {exc}"
+            ) from exc
+        delay = min(self.max_delay, self.base_delay * 2**attempt)
+        delay *= random.uniform(0.5, 1.0)
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        logger.warning(
+            "LLM request failed (%s); retry %d in %.1fs",
+            status or type(exc).__name__,
+            attempt + 1,
+            delay,
+        )
+        return delay
+
+    def call(self, func: Callable[[], T], tokens: int = 0) -> T:
+        """Return ``func()`` once budgets allow, retrying transient failures.
+
+        ``tokens`` is the estimated token count of the request; it is
+        corrected with the usage reported by the response.
+        """
+        attempt = 0
+        while True:
+            delay = self._reserve(tokens)
+            if delay:
+                time.sleep(delay)
+            self.concurrency.acquire()
+            try:
+                result = func()
+            except Exception as exc:
+                error = exc
+            else:
+                self._succeeded(result, tokens)
+                return result
+            finally:
+                self.concurrency.release()
+            time.sleep(self._backoff(error, attempt, tokens))
+            attempt += 1
+
+    async def call_async(self, func: Callable[[], Awaitable[T]], tokens: int = 0) -> T:
+        """Async counterpart of :meth:`call` for coroutine factories."""
+        attempt = 0
+        while True:
+            delay = self._reserve(tokens)
+            if delay:
+                await asyncio.sleep(delay)
+            await self.concurrency.acquire_async()
+            try:
+                result = await func()
+            except Exception as exc:
+                error = exc
+            else:
+                self._succeeded(result, tokens)
+                return result
+            finally:
+                self.concurrency.release()
+            await asyncio.sleep(self._backoff(error, attempt, tokens))
+            attempt += 1
+
+
+_limiter: RateLimiter | None = None
+_limiter_config: Tuple[str, ...] | None = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide limiter configured from the environment.
+
+    ``LLM_RPM`` and ``LLM_TPM`` set the request and token budgets per
+    minute (unset or ``0`` for none), ``LLM_MAX_IN_FLIGHT`` the concurrency
+    ceiling and ``LLM_MAX_RETRIES`` the retry count.
+    """
+    global _limiter, _limiter_config
+    config = (
+        os.getenv("LLM_RPM", "0"),
+        os.getenv("LLM_TPM", "0"),
+        os.getenv("LLM_MAX_IN_FLIGHT", str(DEFAULT_MAX_IN_FLIGHT)),
+        os.getenv("LLM_MAX_RETRIES", str(DEFAULT_MAX_RETRIES)),
+    )
+    with _limiter_lock:
+        if _limiter is None or _limiter_config != config:
+            rpm, tpm, in_flight, retries = config
+            _limiter = RateLimiter(
+                float(rpm or 0), float(tpm or 0), int(in_flight), int(retries)
+            )
+            _limiter_config = config
+        return _limiter
+
+
+__all__ = [
+    "AIMDController",
+    "LLMUnavailableError",
+    "RateLimiter",
+    "TokenBucket",
+    "get_rate_limiter",
+    "is_retryable",
+]
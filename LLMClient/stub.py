@@ -0,0 +1,323 @@
+"""Deterministic stand-in for the OpenAI chat completions API.
+
+:class:`StubLLM` answers chat completion requests locally with generated
+text after a simulated delay: a time to first token followed by tokens at
+a fixed rate per request. The delay, rate and answer length are drawn from
+configurable distributions with a random generator seeded by the request,
+so the same request always gets the same answer and timing. It is used by
+the ``stub`` backend and by :mod:`LLMClient.stub_server` to measure the
+application's own overhead and concurrency without network access.
+
+In JSON mode the answer is an object keyed by the ``### <step id>``
+headings of the prompt, the format of the combined structured analysis
+request, with the generated words split among the steps.
+"""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Tuple
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+
+from .tokens import count_messages
+
+DEFAULT_LATENCY = "lognormal:0.8,0.4"
+DEFAULT_TOKENS_PER_SECOND = "normal:60,10"
+DEFAULT_COMPLETION_TOKENS = "uniform:150,400"
+STEP_HEADING = re.compile(r"^### (\S[^\n]*?)\s*$", re.MULTILINE)
+
+WORDS = (
+    "kök neden analizi müşteri şikayeti parça üretim hattı kalite kontrol "
+    "düzeltici faaliyet önleyici tedarikçi ölçüm sapma proses doğrulama "
+    "ekip aksiyon tarih sorumlu risk etki tekrar sıfır hata"
+).split()
+
+Distribution = Callable[[random.Random], float]
+
+
+def parse_distribution(spec: str) -> Distribution:
+    """Return a sampler for the distribution described by ``spec``.
+
+    ``spec`` is a constant such as ``"0.5"`` or ``name:arguments`` with
+    ``uniform:low,high``, ``normal:mean,stdev``, ``lognormal:median,sigma``
+    or ``exp:mean``. Samples are never negative.
+
+    Raises
+    ------
+    ValueError
+        If ``spec`` cannot be parsed.
+    """
+    name, _, args = spec.strip().partition(":")
+    if not args:
+        value = float(name)
+        return lambda rng: max(0.0, value)
+    params = [float(arg) for arg in args.split(",")]
+    samplers: Dict[str, Tuple[int, Distribution]] = {
+        "uniform": (2, lambda rng: rng.uniform(params[0], params[1])),
+        "normal": (2, lambda rng: rng.gauss(params[0], params[1])),
+        "lognormal": (
+            2,
+            lambda rng: params[0] * rng.lognormvariate(0.0, params[1]),
+        ),
+        "exp": (1, lambda rng: rng.expovariate(1.0 / params[0])),
+    }
+    if name not in samplers or len(params) != samplers[name][0]:
+        raise ValueError(f"Invalid distribution: {spec}")
+    sampler = samplers[name][1]
+    return lambda rng: max(0.0, sampler(rng))
+
+
+def _step_ids(messages: List[Dict[str, Any]]) -> List[str]:
+    """Return the step ids of the ``### <id>`` headings in the last user message."""
+    prompt = next(
+        (m.get("content") for m in reversed(messages) if m.get("role") == "user"), ""
+    )
+    if not isinstance(prompt, str):
+        return []
+    return list(dict.fromkeys(STEP_HEADING.findall(prompt)))
+
+
+class StubLLM:
+    """Generate chat completions locally with simulated latency."""
+
+    def __init__(
+        self,
+        latency: str = DEFAULT_LATENCY,
+        tokens_per_second: str = DEFAULT_TOKENS_PER_SECOND,
+        completion_tokens: str = DEFAULT_COMPLETION_TOKENS,
+        seed: int = 0,
+    ) -> None:
+        """Initialize the stub.
+
+        Parameters
+        ----------
+        latency:
+            Distribution of the seconds before the first token.
+        tokens_per_second:
+            Distribution of the generation speed of a request.
+        completion_tokens:
+            Distribution of the answer length in tokens.
+        seed:
+            Seed mixed into every request so runs can be varied.
+        """
+        self.latency = parse_distribution(latency)
+        self.tokens_per_second = parse_distribution(tokens_per_second)
+        self.completion_tokens = parse_distribution(completion_tokens)
+        self.seed = seed
+
+    def _plan(self, model: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Return the answer and timing of a request."""
+        payload = json.dumps([self.seed, model, messages], ensure_ascii=False)
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        rng = random.Random(digest)
+        count = max(1, round(self.completion_tokens(rng)))
+        rate = max(1e-3, self.tokens_per_second(rng))
+        return {
+            "id": f"chatcmpl-stub-{digest[:24]}",
+            "model": model,
+            "words": [rng.choice(WORDS) for _ in range(count)],
+            "steps": _step_ids(messages),
+            "prompt_tokens": count_messages(messages, model),
+            "latency": self.latency(rng),
+            "token_delay": 1.0 / rate,
+        }
+
+    @staticmethod
+    def _usage(plan: Dict[str, Any]) -> Dict[str, int]:
+        completion = len(plan["words"])
+        return {
+            "prompt_tokens": plan["prompt_tokens"],
+            "completion_tokens": completion,
+            "total_tokens": plan["prompt_tokens"] + completion,
+        }
+
+    @staticmethod
+    def _content(plan: Dict[str, Any], json_mode: bool) -> str:
+        words = plan["words"]
+        if not json_mode:
+            return " ".join(words)
+        steps = plan["steps"]
+        if not steps:
+            return json.dumps({"response": " ".join(words)}, ensure_ascii=False)
+        size = math.ceil(len(words) / len(steps))
+        answer = {
+            step: " ".join(words[idx * size : (idx + 1) * size] or words[-1:])
+            for idx, step in enumerate(steps)
+        }
+        return json.dumps(answer, ensure_ascii=False)
+
+    def _completion(self, plan: Dict[str, Any], json_mode: bool) -> Dict[str, Any]:
+        """Return the JSON body of a non-streaming completion."""
+        return {
+            "id": plan["id"],
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": plan["model"],
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {
+                        "role": "assistant",
+                        "content": self._content(plan, json_mode),
+                    },
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": self._usage(plan),
+        }
+
+    def _chunks(
+        self, plan: Dict[str, Any], json_mode: bool, include_usage: bool
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield the JSON bodies of a streamed completion without delays."""
+        base = {
+            "id": plan["id"],
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": plan["model"],
+        }
+        content = self._content(plan, json_mode)
+        pieces = content.split(" ")
+        for idx, piece in enumerate(pieces):
+            text = piece if idx == len(pieces) - 1 else piece + " "
+            yield {
+                **base,
+                "choices": [
+                    {"index": 0, "delta": {"content": text}, "finish_reason": None}
+                ],
+            }
+        yield {
+            **base,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        }
+        if include_usage:
+            yield {**base, "choices": [], "usage": self._usage(plan)}
+
+    @staticmethod
+    def _options(kwargs: Dict[str, Any]) -> Tuple[bool, bool, bool]:
+        """Return ``(stream, json_mode, include_usage)`` of a request."""
+        response_format = kwargs.get("response_format") or {}
+        stream_options = kwargs.get("stream_options") or {}
+        return (
+            bool(kwargs.get("stream")),
+            response_format.get("type") == "json_object",
+            bool(stream_options.get("include_usage")),
+        )
+
+    def create(self, **kwargs: Any) -> Any:
+        """Return a completion body, or an iterator of chunks when streaming.
+
+        Blocks the calling thread for the simulated duration.
+        """
+        stream, json_mode, include_usage = self._options(kwargs)
+        plan = self._plan(kwargs.get("model", ""), kwargs.get("messages", []))
+        if not stream:
+            time.sleep(plan["latency"] + plan["token_delay"] * len(plan["words"]))
+            return self._completion(plan, json_mode)
+
+        def chunks() -> Iterator[Dict[str, Any]]:
+            time.sleep(plan["latency"])
+            for chunk in self._chunks(plan, json_mode, include_usage):
+                if chunk["choices"] and chunk["choices"][0]["delta"]:
+                    time.sleep(plan["token_delay"])
+                yield chunk
+
+        return chunks()
+
+    async def create_async(self, **kwargs: Any) -> Any:
+        """Async counterpart of :meth:`create` that does not block the loop."""
+        stream, json_mode, include_usage = self._options(kwargs)
+        plan = self._plan(kwargs.get("model", ""), kwargs.get("messages", []))
+        if not stream:
+            await asyncio.sleep(
+                plan["latency"] + plan["token_delay"] * len(plan["words"])
+            )
+            return self._completion(plan, json_mode)
+
+        async def chunks() -> AsyncIterator[Dict[str, Any]]:
+            await asyncio.sleep(plan["latency"])
+            for chunk in self._chunks(plan, json_mode, include_usage):
+                if chunk["choices"] and chunk["choices"][0]["delta"]:
+                    await asyncio.sleep(plan["token_delay"])
+                yield chunk
+
+        return chunks()
+
+
+def _namespace(value: Any) -> Any:
+    """Return ``value`` with dictionaries turned into attribute objects."""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_namespace(item) for item in value]
+    return value
+
+
+class StubClient:
+    """Client exposing ``chat.completions.create`` backed by :class:`StubLLM`.
+
+    Responses have the attributes of the OpenAI SDK objects used by the
+    application. With ``asynchronous`` ``create`` is a coroutine like in
+    ``AsyncOpenAI``.
+    """
+
+    def __init__(self, llm: StubLLM, asynchronous: bool = False) -> None:
+        """Initialize with the stub answering the requests."""
+        self.llm = llm
+        create = self._create_async if asynchronous else self._create
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+
+    def _create(self, **kwargs: Any) -> Any:
+        result = self.llm.create(**kwargs)
+        if isinstance(result, dict):
+            return _namespace(result)
+        return (_namespace(chunk) for chunk in result)
+
+    async def _create_async(self, **kwargs: Any) -> Any:
+        result = await self.llm.create_async(**kwargs)
+        if isinstance(result, dict):
+            return _namespace(result)
+
+        async def chunks() -> AsyncIterator[Any]:
+            async for chunk in result:
+                yield _namespace(chunk)
+
+        return chunks()
+
+
+_stub: StubLLM | None = None
+_stub_config: Tuple[str, ...] | None = None
+_stub_lock = threading.Lock()
+
+
+def get_stub_llm() -> StubLLM:
+    """Return the process-wide stub configured from the environment.
+
+    ``LLM_STUB_LATENCY`` (seconds to first token), ``LLM_STUB_TOKENS_PER_SECOND``
+    and ``LLM_STUB_COMPLETION_TOKENS`` take distributions understood by
+    :func:`parse_distribution`; ``LLM_STUB_SEED`` varies the answers.
+    """
+    global _stub, _stub_config
+    config = (
+        os.getenv("LLM_STUB_LATENCY", DEFAULT_LATENCY),
+        os.getenv("LLM_STUB_TOKENS_PER_SECOND", DEFAULT_TOKENS_PER_SECOND),
+        os.getenv("LLM_STUB_COMPLETION_TOKENS", DEFAULT_COMPLETION_TOKENS),
+        os.getenv("LLM_STUB_SEED", "0"),
+    )
+    with _stub_lock:
+        if _stub is None or _stub_config != config:
+            latency, rate, tokens, seed = config
+            _stub = StubLLM(latency, rate, tokens, int(seed))
+            _stub_config = config
+        return _stub
+
+
+__all__ = ["StubClient", "StubLLM", "get_stub_llm", "parse_distribution"]
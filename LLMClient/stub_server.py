@@ -0,0 +1,71 @@
+"""OpenAI-compatible HTTP server answering with :class:`StubLLM`.
+
+Point ``OPENAI_BASE_URL`` at this server to load test the full request path,
+including the OpenAI SDK and its connection pool, without network access::
+
+    python -m LLMClient.stub_server --port 8001
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=stub python run_api.py
+
+The latency and token-rate distributions are read from the ``LLM_STUB_*``
+variables described in :func:`LLMClient.stub.get_stub_llm`.
+"""
+
+from __future__ import annotations
+
+from typing import Any, AsyncIterator, Dict
+import argparse
+import json
+
+from fastapi import Body, FastAPI
+from fastapi.responses import StreamingResponse
+
+from .stub import StubLLM, get_stub_llm
+
+
+def create_app(llm: StubLLM | None = None) -> FastAPI:
+    """Return the server application answering with ``llm``.
+
+    The stub configured from the environment is used when ``llm`` is
+    ``None``.
+    """
+    app = FastAPI(title="LLM stub")
+
+    def stub() -> StubLLM:
+        return llm or get_stub_llm()
+
+    @app.get("/v1/models")
+    async def models() -> Dict[str, Any]:
+        return {"object": "list", "data": [{"id": "stub", "object": "model"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(body: Dict[str, Any] = Body(...)) -> Any:
+        result = await stub().create_async(**body)
+        if isinstance(result, dict):
+            return result
+
+        async def events() -> AsyncIterator[str]:
+            async for chunk in result:
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main() -> None:
+    """Run the stub server from the command line."""
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+    uvicorn.run(create_app(), host=args.host, port=args.port)
+
+
+__all__ = ["create_app"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Local token counting and context window budgets.
+
+Counts use ``tiktoken`` when it is installed and its encodings load, and
+fall back to a conservative character based estimate otherwise, so prompts
+can be sized before they are sent without a network round trip.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Tuple
+import logging
+import math
+import os
+
+# Context window sizes by model name prefix; the longest match wins.
+CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-3.5-turbo-instruct": 4096,
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4-1106": 128000,
+    "gpt-4-0125": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "o1": 200000,
+    "o3": 200000,
+    "o4": 200000,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+DEFAULT_OUTPUT_TOKENS = 1024
+# Tokens added per chat message and for priming the reply
+MESSAGE_OVERHEAD = 4
+REPLY_OVERHEAD = 3
+TRUNCATION_MARKER = "\n[...]"
+
+logger = logging.getLogger(__name__)
+_encoding_warned = False
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str | None) -> Any:
+    """Return the ``tiktoken`` encoding for ``model`` or ``None``.
+
+    ``tiktoken`` downloads encodings on first use, so any failure to load
+    one, such as a missing network connection, falls back to the estimate.
+    """
+    global _encoding_warned
+    try:
+        import tiktoken  # type: ignore
+    except ImportError:
+        return None
+    try:
+        if model:
+            try:
+                return tiktoken.encoding_for_model(model)
+            except KeyError:
+                pass
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as exc:
+        if not _encoding_warned:
+            _encoding_warned = True
+            logger.warning("tiktoken encoding unavailable, estimating tokens: %s", exc)
+        return None
+
+
+def count_tokens(text: str, model: str | None = None) -> int:
+    """Return the number of tokens of ``text`` for ``model``.
+
+    Without ``tiktoken`` a character is counted as 2/7 of a token and
+    non-ASCII characters, such as Turkish letters, count twice.
+    """
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text))
+    non_ascii = len(text) - len(text.encode("ascii", "ignore"))
+    return math.ceil((len(text) + non_ascii) / 3.5)
+
+
+def count_messages(messages: List[Dict[str, str]], model: str | None = None) -> int:
+    """Return the prompt tokens of chat ``messages`` including overhead."""
+    return REPLY_OVERHEAD + sum(
+        MESSAGE_OVERHEAD + count_tokens(m.get("content", ""), model) for m in messages
+    )
+
+
+def context_window(model: str) -> int:
+    """Return the context window of ``model``.
+
+    ``LLM_CONTEXT_WINDOW`` overrides the built-in table, which is useful for
+    fine-tuned or self-hosted models.
+    """
+    override = os.getenv("LLM_CONTEXT_WINDOW")
+    if override:
+        return int(override)
+    matches = [prefix for prefix in CONTEXT_WINDOWS if model.startswith(prefix)]
+    if not matches:
+        return DEFAULT_CONTEXT_WINDOW
+    return CONTEXT_WINDOWS[max(matches, key=len)]
+
+
+def prompt_budget(model: str) -> Dict[str, int]:
+    """Return the context window, reserved output and prompt budget.
+
+    ``LLM_MAX_OUTPUT_TOKENS`` sets the tokens kept free for the reply.
+    """
+    window = context_window(model)
+    output = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", str(DEFAULT_OUTPUT_TOKENS)))
+    output = min(output, window // 2)
+    return {
+        "context_window": window,
+        "output_tokens": output,
+        "budget": window - output,
+    }
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str | None = None) -> str:
+    """Return ``text`` cut to at most ``max_tokens`` tokens.
+
+    A marker is appended when anything was removed.
+    """
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    limit = max_tokens - count_tokens(TRUNCATION_MARKER, model)
+    if limit <= 0:
+        return ""
+    encoding = _encoding(model)
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:limit]) + TRUNCATION_MARKER
+    # Binary search the longest prefix within the estimate
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(text[:mid], model) <= limit:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low] + TRUNCATION_MARKER
+
+
+def fit_sections(
+    render: Callable[[Dict[str, str]], str],
+    sections: Dict[str, str],
+    order: List[str],
+    budget: int,
+    model: str | None = None,
+) -> Tuple[Dict[str, str], int]:
+    """Trim ``sections`` until ``render(sections)`` fits in ``budget``.
+
+    Sections named in ``order`` are cut one after another, lowest priority
+    first, by just enough tokens to fit. Returns the sections and the token
+    count of the final rendering, which may still exceed ``budget`` when
+    the untouched sections alone are too large.
+    """
+    sections = dict(sections)
+    tokens = count_tokens(render(sections), model)
+    for name in order:
+        while tokens > budget and sections[name]:
+            size = count_tokens(sections[name], model)
+            keep = max(0, size - max(1, tokens - budget))
+            sections[name] = truncate_tokens(sections[name], keep, model)
+            tokens = count_tokens(render(sections), model)
+    return sections, tokens
+
+
+__all__ = [
+    "CONTEXT_WINDOWS",
+    "context_window",
+    "count_messages",
+    "count_tokens",
+    "fit_sections",
+    "prompt_budget",
+    "truncate_tokens",
+]
@@ -2,28 +2,279 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict
+from concurrent.futures import Future, ProcessPoolExecutor
+from io import BytesIO
+from typing import Any, Dict, List, Tuple
 from pathlib import Path
+import multiprocessing
 import os
 import logging
+import threading
 
-from fpdf import FPDF
+from fpdf import FPDF, FPDF_VERSION
 from openpyxl import Workbook
 from uuid import uuid4
 
-DEFAULT_FONT_PATH = Path(__file__).resolve().parents[1] / "Fonts" / "DejaVuSans.ttf"
-
 from GuideManager import GuideManager
 
+DEFAULT_FONT_PATH = Path(__file__).resolve().parents[1] / "Fonts" / "DejaVuSans.ttf"
+
 logger = logging.getLogger(__name__)
 
+# Part of every stored report key; bump it when the report layout changes
+RENDER_VERSION = "1"
+
+# ``_add_font`` copies fpdf's internal font tables, whose layout is only
+# known for this release; other versions parse the font per document.
+SHARED_FONT_VERSION = "1.7.2"
+
+# Font entries of a prototype document by font path, see ``_add_font``
+_font_cache: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+_font_lock = threading.Lock()
+
+
+def _font_entries(font_path: Path) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Return the ``fonts`` and ``font_files`` of a document using ``font_path``.
+
+    The TrueType font is parsed once per process on a prototype document.
+    """
+    key = str(font_path)
+    with _font_lock:
+        entries = _font_cache.get(key)
+        if entries is None:
+            prototype = FPDF()
+            prototype.add_font("DejaVu", "", key, uni=True)
+            entries = (prototype.fonts, prototype.font_files)
+            _font_cache[key] = entries
+        return entries
+
+
+def _add_font(pdf: FPDF, font_path: Path) -> None:
+    """Register ``font_path`` as ``DejaVu`` on ``pdf`` from the font cache.
+
+    Glyph widths and metrics are shared with the prototype; the glyph
+    subset and object numbers written by ``output`` are per document. With
+    an fpdf release other than :data:`SHARED_FONT_VERSION` the font is
+    added with ``add_font`` instead.
+    """
+    if FPDF_VERSION != SHARED_FONT_VERSION:
+        pdf.add_font("DejaVu", "", str(font_path), uni=True)
+        return
+    fonts, font_files = _font_entries(font_path)
+    for key, font in fonts.items():
+        if key not in pdf.fonts:
+            pdf.fonts[key] = {
+                **font,
+                "i": len(pdf.fonts) + 1,
+                "subset": list(font["subset"]),
+            }
+    for name, entry in font_files.items():
+        pdf.font_files.setdefault(name, dict(entry))
+
+
+def clear_font_cache() -> None:
+    """Forget parsed fonts, for example after replacing a font file."""
+    with _font_lock:
+        _font_cache.clear()
+
+
+def _font_path() -> Path:
+    """Return the Unicode font to embed, honouring ``FONT_PATH``."""
+    env_font = os.getenv("FONT_PATH")
+    if env_font:
+        font_path = Path(env_font)
+    else:
+        font_path = DEFAULT_FONT_PATH
+    if not font_path.exists():
+        fallback = Path("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+        if fallback.exists():
+            font_path = fallback
+        else:
+            raise FileNotFoundError(
+                "Font file not found. Checked "
+                f"{font_path} and {fallback}. Set FONT_PATH to override."
+            )
+    return font_path
+
+
+def render_version() -> str:
+    """Return an identifier of the renderer output for stored report keys.
+
+    It changes with :data:`RENDER_VERSION`, the fpdf release and the font
+    file, including when ``FONT_PATH`` points to another file or the font
+    is replaced in place.
+    """
+    try:
+        font_path = _font_path()
+        stat = font_path.stat()
+        font = f"{font_path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+    except OSError:
+        font = ""
+    return f"{RENDER_VERSION}|fpdf-{FPDF_VERSION}|{font}"
+
+
+def _entries(analysis: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """Return ``(step, response)`` pairs of ``analysis`` without repeats."""
+    entries = []
+    seen = set()
+    for key, value in analysis.items():
+        if key == "full_text" and "full_report" in analysis:
+            continue
+        response = value.get("response", "") if isinstance(value, dict) else str(value)
+        if response in seen:
+            continue
+        seen.add(response)
+        entries.append((key, response))
+    return entries
+
+
+def _build_pdf(
+    entries: List[Tuple[str, str]],
+    complaint_info: Dict[str, str],
+    font_path: Path,
+) -> FPDF:
+    """Return the laid out PDF report."""
+    pdf = FPDF()
+    pdf.add_page()
+    # Register a Unicode font for non-Latin characters
+    _add_font(pdf, font_path)
+    pdf.set_font("DejaVu", size=12)
+    pdf.cell(0, 10, txt="Analysis Report", ln=1)
+    pdf.cell(0, 10, txt=f"Customer: {complaint_info.get('customer', '')}", ln=1)
+    pdf.cell(0, 10, txt=f"Subject: {complaint_info.get('subject', '')}", ln=1)
+    pdf.cell(0, 10, txt=f"Part Code: {complaint_info.get('part_code', '')}", ln=1)
+    pdf.ln(5)
+    for key, response in entries:
+        line = f"{key}: {response}"
+        width = getattr(pdf, "epw", 0)
+        pdf.multi_cell(width, 10, txt=line)
+    return pdf
+
+
+def _write_pdf(
+    entries: List[Tuple[str, str]],
+    complaint_info: Dict[str, str],
+    font_path: Path,
+    pdf_path: Path,
+) -> None:
+    """Render the PDF report to ``pdf_path``."""
+    pdf = _build_pdf(entries, complaint_info, font_path)
+    try:
+        pdf.output(str(pdf_path))
+    except Exception:
+        logger.exception("Failed to create report file")
+        raise
+
+
+def _render_pdf(
+    entries: List[Tuple[str, str]],
+    complaint_info: Dict[str, str],
+    font_path: Path,
+) -> bytes:
+    """Return the PDF report as bytes."""
+    pdf = _build_pdf(entries, complaint_info, font_path)
+    try:
+        # fpdf keeps the binary document in a latin-1 string
+        return pdf.output(dest="S").encode("latin-1")
+    except Exception:
+        logger.exception("Failed to create report file")
+        raise
+
+
+def _build_workbook(
+    entries: List[Tuple[str, str]], complaint_info: Dict[str, str]
+) -> Workbook:
+    """Return the Excel report workbook."""
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Customer", complaint_info.get("customer", "")])
+    ws.append(["Subject", complaint_info.get("subject", "")])
+    ws.append(["Part Code", complaint_info.get("part_code", "")])
+    ws.append([])
+    ws.append(["Step", "Response"])
+    for key, response in entries:
+        ws.append([key, response])
+    return wb
+
+
+def _write_excel(
+    entries: List[Tuple[str, str]],
+    complaint_info: Dict[str, str],
+    excel_path: Path,
+) -> None:
+    """Render the Excel report to ``excel_path``."""
+    wb = _build_workbook(entries, complaint_info)
+    try:
+        wb.save(str(excel_path))
+    except Exception:
+        logger.exception("Failed to create report file")
+        raise
+
+
+def _render_excel(
+    entries: List[Tuple[str, str]], complaint_info: Dict[str, str]
+) -> bytes:
+    """Return the Excel report as bytes."""
+    wb = _build_workbook(entries, complaint_info)
+    buffer = BytesIO()
+    try:
+        wb.save(buffer)
+    except Exception:
+        logger.exception("Failed to create report file")
+        raise
+    return buffer.getvalue()
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+
+def _process_pool(processes: int) -> ProcessPoolExecutor:
+    """Return the shared rendering pool with ``processes`` workers.
+
+    Workers are spawned rather than forked because the API process runs
+    threads, and they keep their font cache between reports.
+    """
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is None or _pool_size != processes:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _pool_size = processes
+        return _pool
+
+
+def shutdown_pool() -> None:
+    """Stop the rendering processes, waiting for queued reports."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
 
 class ReportGenerator:
     """Generates reports for quality-report methods from analyzed data."""
 
-    def __init__(self, guide_manager: GuideManager) -> None:
-        """Initialize with a ``GuideManager`` instance."""
+    def __init__(
+        self, guide_manager: GuideManager, processes: int | None = None
+    ) -> None:
+        """Initialize with a ``GuideManager`` instance.
+
+        With ``processes`` above zero the PDF and the Excel file are
+        rendered at the same time on a shared pool of that many worker
+        processes, keeping the calling process free. It defaults to
+        ``REPORT_PROCESSES`` or ``0``, which renders in the calling thread.
+        """
         self.guide_manager = guide_manager
+        if processes is None:
+            processes = int(os.getenv("REPORT_PROCESSES", "0"))
+        self.processes = max(0, processes)
 
     def generate_template(self, method: str) -> Dict[str, Any]:
         """Return a report template for the given method."""
@@ -34,6 +285,7 @@ class ReportGenerator:
         analysis: Dict[str, Any],
         complaint_info: Dict[str, str],
         output_dir: str | Path = ".",
+        report_id: str | None = None,
     ) -> Dict[str, str]:
         """Create PDF and Excel reports from the analysis results.
 
@@ -45,6 +297,9 @@ class ReportGenerator:
             Information about the complaint such as customer, subject and part code.
         output_dir: str | Path, optional
             Directory in which to save the generated files.
+        report_id: str | None, optional
+            Identifier used in the file names; a random one by default.
+            Existing files with the same identifier are overwritten.
 
         Returns
         -------
@@ -55,76 +310,65 @@ class ReportGenerator:
         out_dir = Path(output_dir)
         out_dir.mkdir(parents=True, exist_ok=True)
 
-        unique_id = uuid4().hex
+        unique_id = report_id or uuid4().hex
         pdf_path = out_dir / f"report_{unique_id}.pdf"
         excel_path = out_dir / f"report_{unique_id}.xlsx"
 
-        # Create PDF
-        pdf = FPDF()
-        pdf.add_page()
-        # Register a Unicode font for non-Latin characters
-        env_font = os.getenv("FONT_PATH")
-        if env_font:
-            font_path = Path(env_font)
-        else:
-            font_path = DEFAULT_FONT_PATH
-        if not font_path.exists():
-            fallback = Path("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
-            if fallback.exists():
-                font_path = fallback
-            else:
-                raise FileNotFoundError(
-                    "Font file not found. Checked "
-                    f"{font_path} and {fallback}. Set FONT_PATH to override."
-                )
-        pdf.add_font("DejaVu", "", str(font_path), uni=True)
-        pdf.set_font("DejaVu", size=12)
-        pdf.cell(0, 10, txt="Analysis Report", ln=1)
-        customer = complaint_info.get("customer", "")
-        subject = complaint_info.get("subject", "")
-        part_code = complaint_info.get("part_code", "")
-        pdf.cell(0, 10, txt=f"Customer: {customer}", ln=1)
-        pdf.cell(0, 10, txt=f"Subject: {subject}", ln=1)
-        pdf.cell(0, 10, txt=f"Part Code: {part_code}", ln=1)
-        pdf.ln(5)
-        entries = []
-        seen = set()
-        for key, value in analysis.items():
-            if key == "full_text" and "full_report" in analysis:
-                continue
-            response = value.get("response", "") if isinstance(value, dict) else str(value)
-            if response in seen:
-                continue
-            seen.add(response)
-            entries.append((key, response))
-
-        for key, response in entries:
-            line = f"{key}: {response}"
-            width = getattr(pdf, "epw", 0)
-            pdf.multi_cell(width, 10, txt=line)
-        try:
-            pdf.output(str(pdf_path))
-        except Exception:
-            logger.exception("Failed to create report file")
-            raise
-
-        # Create Excel
-        wb = Workbook()
-        ws = wb.active
-        ws.append(["Customer", customer])
-        ws.append(["Subject", subject])
-        ws.append(["Part Code", part_code])
-        ws.append([])
-        ws.append(["Step", "Response"])
-        for key, response in entries:
-            ws.append([key, response])
-        try:
-            wb.save(str(excel_path))
-        except Exception:
-            logger.exception("Failed to create report file")
-            raise
-
+        font_path = _font_path()
+        entries = _entries(analysis)
+        self._run(
+            (_write_pdf, entries, complaint_info, font_path, pdf_path),
+            (_write_excel, entries, complaint_info, excel_path),
+        )
         return {"pdf": str(pdf_path), "excel": str(excel_path)}
 
+    def render(
+        self,
+        analysis: Dict[str, Any],
+        complaint_info: Dict[str, str],
+        kinds: Tuple[str, ...] = ("pdf", "excel"),
+    ) -> Dict[str, bytes]:
+        """Return the reports as bytes without touching disk.
+
+        Takes the same data as :meth:`generate` and returns the file
+        contents of the requested ``kinds`` (``pdf`` and ``excel``).
+        """
+        entries = _entries(analysis)
+        tasks: Dict[str, Tuple[Any, ...]] = {}
+        if "pdf" in kinds:
+            tasks["pdf"] = (_render_pdf, entries, complaint_info, _font_path())
+        if "excel" in kinds:
+            tasks["excel"] = (_render_excel, entries, complaint_info)
+        return dict(zip(tasks, self._run(*tasks.values())))
+
+    def _run(self, *tasks: Tuple[Any, ...]) -> List[Any]:
+        """Return the results of ``(function, *args)`` tasks.
+
+        The tasks run at the same time on the process pool when
+        :attr:`processes` is set and one after another otherwise.
+        """
+        if not self.processes:
+            return [task[0](*task[1:]) for task in tasks]
+        pool = _process_pool(self.processes)
+        futures: List[Future[Any]] = [pool.submit(*task) for task in tasks]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception:
+                logger.exception("Failed to create report file")
+                raise
+        return results
+
+
+from .store import DiskReportStore, MemoryReportStore, report_key  # noqa: E402
 
-__all__ = ["ReportGenerator"]
+__all__ = [
+    "DiskReportStore",
+    "MemoryReportStore",
+    "ReportGenerator",
+    "clear_font_cache",
+    "render_version",
+    "report_key",
+    "shutdown_pool",
+]
@@ -0,0 +1,306 @@
+"""Storage of rendered reports in memory and on disk."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+import hashlib
+import json
+import logging
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_DISK_BYTES = 1024 * 1024 * 1024
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60
+DEFAULT_GRACE = 15 * 60
+SUFFIX_KINDS = {".pdf": "pdf", ".xlsx": "excel"}
+
+logger = logging.getLogger(__name__)
+
+
+def report_key(
+    analysis: Dict[str, Any], complaint_info: Dict[str, str], version: str = ""
+) -> str:
+    """Return the content hash identifying the report of the given data.
+
+    ``version`` identifies the renderer, see
+    :func:`ReportGenerator.render_version`, so reports rendered by an older
+    layout or font are not reused.
+    """
+    payload = json.dumps(
+        [version, analysis, complaint_info],
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _hit_rate(hits: int, misses: int) -> float:
+    return round(hits / (hits + misses), 4) if hits + misses else 0.0
+
+
+class MemoryReportStore:
+    """Keep rendered report files in memory, bounded by their total size.
+
+    Reports are stored by id as a mapping of file kind (``pdf``, ``excel``)
+    to bytes. When the files exceed ``max_bytes`` in total the least
+    recently used reports are dropped.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """Initialize an empty store holding at most ``max_bytes``."""
+        self.max_bytes = max_bytes
+        self._reports: OrderedDict[str, Dict[str, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _size(files: Dict[str, bytes]) -> int:
+        return sum(len(data) for data in files.values())
+
+    def put(self, report_id: str, files: Dict[str, bytes]) -> None:
+        """Store ``files`` under ``report_id``, evicting old reports."""
+        with self._lock:
+            old = self._reports.pop(report_id, None)
+            if old is not None:
+                self.bytes -= self._size(old)
+            self._reports[report_id] = dict(files)
+            self.bytes += self._size(files)
+            # Always keep the newest report, even when it alone is too large
+            while self.bytes > self.max_bytes and len(self._reports) > 1:
+                _, evicted = self._reports.popitem(last=False)
+                self.bytes -= self._size(evicted)
+                self.evictions += 1
+
+    def get(self, report_id: str, kind: str) -> bytes | None:
+        """Return the ``kind`` file of a report or ``None`` if unknown."""
+        with self._lock:
+            files = self._reports.get(report_id)
+            data = files.get(kind) if files is not None else None
+            if data is None:
+                self.misses += 1
+                return None
+            self._reports.move_to_end(report_id)
+            self.hits += 1
+            return data
+
+    def stats(self) -> Dict[str, int]:
+        """Return the report count, size and lookup counters."""
+        with self._lock:
+            return {
+                "reports": len(self._reports),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": _hit_rate(self.hits, self.misses),
+                "evictions": self.evictions,
+            }
+
+    def __len__(self) -> int:
+        return len(self._reports)
+
+
+class DiskReportStore:
+    """Keep report files in a directory under a retention policy.
+
+    Reports are identified by :func:`report_key`, so repeating a request
+    reuses the files rendered before instead of writing new ones. Reports
+    older than ``max_age`` seconds are deleted, and the least recently used
+    reports are deleted while all files exceed ``max_bytes``; ``0``
+    disables either limit. Reports returned within the last ``grace``
+    seconds are never deleted, so their URLs stay valid for the clients
+    that received them. Limits are applied when reports are added and by
+    :meth:`prune`, which should be called periodically. ``report_*.pdf``
+    and ``report_*.xlsx`` files already in the directory are adopted on
+    start.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        max_bytes: int = DEFAULT_DISK_BYTES,
+        max_age: float = DEFAULT_MAX_AGE,
+        grace: float = DEFAULT_GRACE,
+    ) -> None:
+        """Initialize the store over ``directory`` and apply the limits."""
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.grace = grace
+        # key -> {"paths": {kind: path}, "size": bytes, "created": timestamp,
+        #         "used": timestamp of the last time the paths were returned}
+        self._reports: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._render_locks = [threading.Lock() for _ in range(32)]
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._scan()
+
+    def _scan(self) -> None:
+        """Index the report files already in the directory, oldest first."""
+        if not self.directory.is_dir():
+            return
+        groups: Dict[str, Dict[str, Path]] = {}
+        for path in self.directory.glob("report_*"):
+            kind = SUFFIX_KINDS.get(path.suffix)
+            if kind is not None and path.is_file():
+                groups.setdefault(path.stem[len("report_") :], {})[kind] = path
+        found: List[Tuple[float, str, Dict[str, Path]]] = []
+        for key, paths in groups.items():
+            stats = [path.stat() for path in paths.values()]
+            found.append((max(st.st_mtime for st in stats), key, paths))
+        with self._lock:
+            for created, key, paths in sorted(found):
+                self._reports[key] = {
+                    "paths": {kind: str(path) for kind, path in paths.items()},
+                    "size": sum(path.stat().st_size for path in paths.values()),
+                    "created": created,
+                    "used": created,
+                }
+                self.bytes += self._reports[key]["size"]
+            self._enforce()
+
+    def _remove(self, key: str) -> None:
+        """Forget report ``key`` and delete its files inside the directory."""
+        entry = self._reports.pop(key)
+        self.bytes -= entry["size"]
+        for path in map(Path, entry["paths"].values()):
+            if path.parent.resolve() != self.directory.resolve():
+                continue
+            try:
+                path.unlink(missing_ok=True)
+            except OSError as exc:
+                logger.warning("Could not delete report file %s: %s", path, exc)
+
+    def _recent(self, entry: Dict[str, Any], now: float) -> bool:
+        """Return whether the paths of ``entry`` were returned within ``grace``."""
+        return now - entry["used"] < self.grace
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return (
+            bool(self.max_age)
+            and now - entry["created"] >= self.max_age
+            and not self._recent(entry, now)
+        )
+
+    def _enforce(self, keep: str | None = None) -> int:
+        """Delete expired reports, then the least recently used over size.
+
+        Returns the number of deleted reports.
+        """
+        now = time.time()
+        expired = [
+            key
+            for key, entry in self._reports.items()
+            if key != keep and self._expired(entry, now)
+        ]
+        for key in expired:
+            self._remove(key)
+        removed = len(expired)
+        while self.max_bytes and self.bytes > self.max_bytes:
+            key = next(iter(self._reports))
+            # Later entries were used even more recently
+            if key == keep or self._recent(self._reports[key], now):
+                break
+            self._remove(key)
+            removed += 1
+        if removed:
+            self.evictions += removed
+            logger.info("Removed %d stored reports", removed)
+        return removed
+
+    def prune(self) -> int:
+        """Apply the limits now and return the number of deleted reports."""
+        with self._lock:
+            return self._enforce()
+
+    def get(self, key: str) -> Dict[str, str] | None:
+        """Return the file paths of report ``key`` or ``None`` if missing.
+
+        Reports whose files were deleted behind the store's back count as
+        missing.
+        """
+        with self._lock:
+            entry = self._reports.get(key)
+            if entry is not None and (
+                self._expired(entry, time.time())
+                or not all(Path(p).is_file() for p in entry["paths"].values())
+            ):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            entry["used"] = time.time()
+            self._reports.move_to_end(key)
+            self.hits += 1
+            return dict(entry["paths"])
+
+    def add(self, key: str, paths: Dict[str, str]) -> Dict[str, str]:
+        """Record the files of a newly rendered report and return ``paths``.
+
+        Older reports are deleted as needed to respect the limits; the new
+        report itself is always kept.
+        """
+        size = 0
+        for path in paths.values():
+            try:
+                size += Path(path).stat().st_size
+            except OSError:
+                pass
+        with self._lock:
+            if key in self._reports:
+                self.bytes -= self._reports.pop(key)["size"]
+            now = time.time()
+            self._reports[key] = {
+                "paths": dict(paths),
+                "size": size,
+                "created": now,
+                "used": now,
+            }
+            self.bytes += size
+            self._enforce(keep=key)
+        return paths
+
+    def get_or_create(
+        self, key: str, create: Callable[[str], Dict[str, str]]
+    ) -> Dict[str, str]:
+        """Return the paths of report ``key``, calling ``create(key)`` if missing.
+
+        Concurrent calls for the same key render the report only once.
+        """
+        with self._render_locks[hash(key) % len(self._render_locks)]:
+            paths = self.get(key)
+            if paths is None:
+                paths = self.add(key, create(key))
+            return paths
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the disk usage and lookup counters."""
+        with self._lock:
+            return {
+                "reports": len(self._reports),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "max_age": self.max_age,
+                "grace": self.grace,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": _hit_rate(self.hits, self.misses),
+                "evictions": self.evictions,
+            }
+
+    def __len__(self) -> int:
+        return len(self._reports)
+
+
+__all__ = ["DiskReportStore", "MemoryReportStore", "report_key"]
@@ -5,7 +5,16 @@ from __future__ import annotations
 import os
 import logging
 from pathlib import Path
-
+from typing import Dict, Iterator, List
+
+from LLMClient import (
+    Completer,
+    ResponseCache,
+    count_messages,
+    fit_sections,
+    prompt_budget,
+    tagged,
+)
 
 FALLBACK_PROMPT = (
     "Review the following report for clarity and correctness.\n"
@@ -22,13 +31,27 @@ class Review:
     """Reviews generated reports or analysis results."""
 
     def __init__(
-        self, model: str | None = None, template_path: str | None = None
+        self,
+        model: str | None = None,
+        template_path: str | None = None,
+        cache: ResponseCache | None = None,
     ) -> None:
-        """Initialize with optional LLM model name and prompt template."""
+        """Initialize with optional LLM model name and prompt template.
+
+        Responses are stored in ``cache`` when given, otherwise in the shared
+        cache enabled with ``LLM_CACHE``.
+        """
         if model is None:
             model = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
         self.model = model
+        self.cache = cache
         self.logger = logging.getLogger(__name__)
+        self._completer = Completer(
+            "review",
+            ReviewLLMError,
+            self.logger,
+            "Review",
+        )
 
         if template_path is None:
             # Önce PROMPTS_DIR environment variable'ını kontrol et
@@ -61,45 +84,44 @@ class Review:
             )
             self.template = FALLBACK_PROMPT
 
+    @staticmethod
+    def _messages(prompt: str) -> List[Dict[str, str]]:
+        """Return the chat messages for ``prompt``."""
+        return [{"role": "user", "content": prompt}]
+
     def _query_llm(self, prompt: str) -> str:
         """Return the LLM response for the given prompt."""
-        self.logger.debug("Review._query_llm start")
-        try:
-            from openai import OpenAI  # type: ignore
-        except ImportError as exc:  # pragma: no cover - optional dependency
-            raise ReviewLLMError("openai package is not installed") from exc
-
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ReviewLLMError("OPENAI_API_KEY not set")
-        client = OpenAI(api_key=api_key)
-
-        try:
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-            )
-            tokens = getattr(
-                getattr(response, "usage", None),
-                "total_tokens",
-                None,
-            )
-            if tokens is not None:
-                self.logger.info("Review tokens used: %s", tokens)
-            content = response.choices[0].message.content
-            result = content.strip()
-            self.logger.debug("Review._query_llm end")
-            return result
-        except Exception as exc:  # pragma: no cover - network issues
-            message = str(exc).lower()
-            if "invalid" in message or "incorrect" in message:
-                raise ReviewLLMError("Invalid OpenAI API key") from exc
-            self.logger.error("Review error: %s", exc)
-            self.logger.debug("Review._query_llm end")
-            return f"LLM review placeholder for: {prompt[:50]}"
+        return self._completer.complete(self.model, self._messages(prompt), self.cache)
+
+    async def _query_llm_async(self, prompt: str) -> str:
+        """Return the LLM response for ``prompt`` without blocking."""
+        return await self._completer.complete_async(
+            self.model, self._messages(prompt), self.cache
+        )
+
+    def _stream_llm(
+        self, prompt: str, tags: Dict[str, str] | None = None
+    ) -> Iterator[str]:
+        """Yield the LLM response for the prompt as it is generated.
+
+        ``tags`` label the call in the LLM metrics.
+
+        Raises
+        ------
+        ReviewLLMError
+            If the request fails, including after part of the answer was
+            yielded; no placeholder text is produced.
+        """
+        return self._completer.stream(
+            self.model, self._messages(prompt), self.cache, tags
+        )
 
     def _build_prompt(self, text: str, **context: str) -> str:
-        """Return the review prompt filled with context and text."""
+        """Return the review prompt filled with context and text.
+
+        When the prompt would not fit the prompt budget of the model, the
+        guideline JSON is shortened first and the report text second.
+        """
         params = {
             "method": context.get("method", ""),
             "customer": context.get("customer", ""),
@@ -109,7 +131,22 @@ class Review:
             "guideline_json": context.get("guideline_json", ""),
             "language": context.get("language", ""),
         }
-        return self.template.format(**params)
+        overhead = count_messages([{"role": "user", "content": ""}], self.model)
+        budget = prompt_budget(self.model)["budget"] - overhead
+        fitted, tokens = fit_sections(
+            lambda sections: self.template.format(**sections),
+            params,
+            ["guideline_json", "initial_report_text"],
+            budget,
+            self.model,
+        )
+        if fitted != params:
+            self.logger.warning(
+                "Review prompt trimmed to %d tokens to fit the context of %s",
+                tokens,
+                self.model,
+            )
+        return self.template.format(**fitted)
 
     def perform(self, text: str, **context: str) -> str:
         """Return a reviewed version of ``text``.
@@ -118,7 +155,23 @@ class Review:
         response language.
         """
         prompt = self._build_prompt(text, **context)
-        return self._query_llm(prompt)
+        with tagged(method=context.get("method", ""), step="review"):
+            return self._query_llm(prompt)
+
+    async def perform_async(self, text: str, **context: str) -> str:
+        """Async counterpart of :meth:`perform` with the same arguments."""
+        prompt = self._build_prompt(text, **context)
+        with tagged(method=context.get("method", ""), step="review"):
+            return await self._query_llm_async(prompt)
+
+    def perform_stream(self, text: str, **context: str) -> Iterator[str]:
+        """Yield the reviewed version of ``text`` in chunks as it arrives.
+
+        Takes the same arguments as :meth:`perform`.
+        """
+        prompt = self._build_prompt(text, **context)
+        tags = {"method": context.get("method", ""), "step": "review"}
+        yield from self._stream_llm(prompt, tags)
 
 
 __all__ = ["Review", "ReviewLLMError"]
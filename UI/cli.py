@@ -12,7 +12,7 @@ from GuideManager import GuideManager
 from LLMAnalyzer import LLMAnalyzer
 from ReportGenerator import ReportGenerator
 from Review import Review
-from ComplaintSearch import ComplaintStore
+from ComplaintSearch import create_store
 
 
 METHODS = ["8D", "5N1K", "A3", "DMAIC", "Ishikawa"]
@@ -29,6 +29,11 @@ def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
     parser.add_argument("--part-code", help="Related part code")
     parser.add_argument("--directives", help="Additional user directives")
     parser.add_argument("--search", help="Search past complaints")
+    parser.add_argument(
+        "--store",
+        choices=["json", "jsonl", "sqlite"],
+        help="Complaint store backend (default: COMPLAINT_STORE_BACKEND or json)",
+    )
     return parser.parse_args(args)
 
 
@@ -38,7 +43,7 @@ def main(args: Optional[List[str]] = None) -> None:
     options = parse_args(args)
 
     if options.search:
-        store = ComplaintStore()
+        store = create_store(options.store)
         results = store.search(options.search)
         print(json.dumps(results, ensure_ascii=False, indent=2))
         return
@@ -60,7 +65,7 @@ def main(args: Optional[List[str]] = None) -> None:
         "subject": subject,
         "part_code": part_code,
     }
-    ComplaintStore().add_complaint(details)
+    create_store(options.store).add_complaint(details)
     analysis = analyzer.analyze(details, guideline, directives)
 
     out_dir = Path(options.output)
@@ -6,38 +6,97 @@ used by the Quality Reporter service.
 
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
 from pathlib import Path
+from uuid import uuid4
+import asyncio
+import itertools
+import json
 import logging
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from dotenv import set_key
 
 from GuideManager import GuideManager
 from LLMAnalyzer import LLMAnalyzer
+from LLMClient import get_metrics, get_response_cache
 from Review import Review
-from ReportGenerator import ReportGenerator
-from ComplaintSearch import ComplaintStore, ExcelClaimsSearcher, normalize_text
+from ReportGenerator import (
+    DiskReportStore,
+    MemoryReportStore,
+    ReportGenerator,
+    render_version,
+    report_key,
+    shutdown_pool,
+)
+from ComplaintSearch import ExcelClaimsSearcher, create_store, normalize_text
 from EightDScanner import EightDScanner
+from JobQueue import JobRunner, JobStore
 from PromptManager import PromptManager
 import os
 
 REPORT_DIR = Path(__file__).resolve().parents[1] / "reports"
-REPORT_DIR.mkdir(parents=True, exist_ok=True)
+# "disk" writes reports to REPORT_DIR, "memory" keeps them in a bounded LRU
+REPORT_STORAGE = os.getenv("REPORT_STORAGE", "disk").strip().lower()
+if REPORT_STORAGE not in {"disk", "memory"}:
+    raise ValueError(f"Unknown REPORT_STORAGE: {REPORT_STORAGE}")
+if REPORT_STORAGE == "disk":
+    REPORT_DIR.mkdir(parents=True, exist_ok=True)
+REPORT_MEDIA_TYPES = {
+    "pdf": ("application/pdf", "pdf"),
+    "excel": (
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "xlsx",
+    ),
+}
 
 EIGHT_D_DIR = Path(__file__).resolve().parents[1] / "eight_d_reports"
 
-app = FastAPI(title="DB Kalite Asistanı API")
+
+async def _prune_reports(interval: float) -> None:
+    """Apply the stored report limits every ``interval`` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(_report_disk.prune)
+        except Exception:
+            logger.exception("Pruning stored reports failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Resume interrupted background jobs and stop report workers on exit.
+
+    With disk storage, stored reports are pruned every
+    ``REPORT_PRUNE_MINUTES`` so an idle server still removes old files.
+    """
+    _jobs.resume()
+    _report_jobs.resume()
+    pruner = None
+    if REPORT_STORAGE != "memory":
+        interval = float(os.getenv("REPORT_PRUNE_MINUTES", "60")) * 60
+        pruner = asyncio.create_task(_prune_reports(interval))
+    yield
+    if pruner is not None:
+        pruner.cancel()
+    shutdown_pool()
+
+
+app = FastAPI(title="DB Kalite Asistanı API", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
 )
-app.mount("/reports", StaticFiles(directory=str(REPORT_DIR)), name="reports")
+if REPORT_STORAGE == "disk":
+    app.mount("/reports", StaticFiles(directory=str(REPORT_DIR)), name="reports")
 
 logger = logging.getLogger(__name__)
 
@@ -58,6 +117,8 @@ def setup(body: SetupBody) -> Dict[str, str]:
     env_path.touch(exist_ok=True)
     set_key(str(env_path), "OPENAI_API_KEY", body.apiKey)
     set_key(str(env_path), "COMPLAINTS_XLSX_PATH", body.excelPath)
+    # The shared LLM client is rebuilt on the next call with the new key
+    os.environ["OPENAI_API_KEY"] = body.apiKey
     return {"status": "ok"}
 
 
@@ -80,12 +141,23 @@ ALIAS_TO_HEADER = {
 # Shared component instances
 _guide_manager = GuideManager()
 _prompt_manager = PromptManager()
-analyzer = LLMAnalyzer()
+_scanner = EightDScanner(EIGHT_D_DIR)
+analyzer = LLMAnalyzer(cases=_scanner.index)
 reviewer = Review()
 reporter = ReportGenerator(_guide_manager)
-_store = ComplaintStore()
+_report_memory = MemoryReportStore(
+    int(float(os.getenv("REPORT_MEMORY_MB", "64")) * 1024 * 1024)
+)
+_report_disk = DiskReportStore(
+    REPORT_DIR,
+    int(float(os.getenv("REPORT_MAX_MB", "1024")) * 1024 * 1024),
+    float(os.getenv("REPORT_MAX_AGE_DAYS", "30")) * 24 * 60 * 60,
+)
+_store = create_store()
 _excel_searcher = ExcelClaimsSearcher()
-_scanner = EightDScanner(EIGHT_D_DIR)
+_jobs = JobRunner(JobStore(os.getenv("JOBS_DB_PATH", "jobs.db")))
+# Reports get their own workers so they never queue behind batch analyses
+_report_jobs = JobRunner(_jobs.store, int(os.getenv("REPORT_JOB_WORKERS", "2")))
 
 
 @app.get("/health")
@@ -95,6 +167,26 @@ def health() -> Dict[str, bool]:
     return {"config_missing": missing}
 
 
+@app.get("/metrics/llm")
+def llm_metrics() -> Dict[str, Any]:
+    """Return token usage and latency of LLM calls per method and step.
+
+    ``cache`` holds the response cache counters when the cache is enabled.
+    """
+    cache = get_response_cache()
+    return {
+        "calls": get_metrics().summary(),
+        "cache": cache.stats() if cache is not None else None,
+    }
+
+
+@app.get("/metrics/reports")
+def report_metrics() -> Dict[str, Any]:
+    """Return size and hit rate of the report storage in use."""
+    store = _report_memory if REPORT_STORAGE == "memory" else _report_disk
+    return {"storage": REPORT_STORAGE, **store.stats()}
+
+
 class AnalyzeBody(BaseModel):
     details: Dict[str, Any]
     guideline: Dict[str, Any]
@@ -103,11 +195,11 @@ class AnalyzeBody(BaseModel):
 
 
 @app.post("/analyze")
-def analyze(body: AnalyzeBody) -> Dict[str, Any]:
+async def analyze(body: AnalyzeBody) -> Dict[str, Any]:
     """Return analysis results from ``LLMAnalyzer``."""
     logger.info("Analyze request body: %s", body.dict())
     try:
-        result = analyzer.analyze(
+        result = await analyzer.analyze_async(
             body.details,
             body.guideline,
             body.directives,
@@ -120,62 +212,305 @@ def analyze(body: AnalyzeBody) -> Dict[str, Any]:
     return result
 
 
+def _analyze_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one batch item through ``LLMAnalyzer``."""
+    body = AnalyzeBody(**item)
+    return analyzer.analyze(
+        body.details,
+        body.guideline,
+        body.directives,
+        body.language,
+    )
+
+
+_jobs.register("analyze", _analyze_item)
+
+
+class BatchAnalyzeBody(BaseModel):
+    items: List[AnalyzeBody]
+
+
+@app.post("/analyze/batch")
+def analyze_batch(body: BatchAnalyzeBody) -> Dict[str, Any]:
+    """Queue analyses for many complaints and return the job id."""
+    items = [item.dict() for item in body.items]
+    job_id = _jobs.submit("analyze", items)
+    return {"job_id": job_id, "total": len(items)}
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str) -> Dict[str, Any]:
+    """Return status, progress and finished results of a background job."""
+    job = _jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def _event_stream(events: Iterator[Dict[str, str]], name: str) -> StreamingResponse:
+    """Return ``events`` as a Server-Sent Events response.
+
+    The first event is fetched before responding so that configuration
+    errors still produce a 500 status. Later failures are sent as an
+    ``error`` event and a finished stream ends with a ``done`` event.
+    """
+    try:
+        first = next(events, None)
+    except Exception as exc:
+        logger.exception("%s stream failed", name)
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+    def body() -> Iterator[str]:
+        pending = [] if first is None else [first]
+        try:
+            for event in itertools.chain(pending, events):
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        except Exception as exc:
+            logger.exception("%s stream failed", name)
+            detail = json.dumps({"detail": str(exc)}, ensure_ascii=False)
+            yield f"event: error\ndata: {detail}\n\n"
+            return
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/analyze/stream")
+def analyze_stream(body: AnalyzeBody) -> StreamingResponse:
+    """Stream analysis tokens from ``LLMAnalyzer`` as Server-Sent Events.
+
+    Each event carries the ``step`` id and the next text ``delta``.
+    """
+    logger.info("Analyze stream request body: %s", body.dict())
+    events = analyzer.analyze_stream(
+        body.details,
+        body.guideline,
+        body.directives,
+        body.language,
+    )
+    return _event_stream(events, "Analyze")
+
+
 class ReviewBody(BaseModel):
     text: str
     context: Dict[str, str] = {}
 
 
 @app.post("/review")
-def review(body: ReviewBody) -> Dict[str, str]:
+async def review(body: ReviewBody) -> Dict[str, str]:
     """Return reviewed text using ``Review``."""
     logger.info("Review request body: %s", body.dict())
     try:
-        result = reviewer.perform(body.text, **body.context)
+        result = await reviewer.perform_async(body.text, **body.context)
     except Exception as exc:  # pragma: no cover - network issues
         raise HTTPException(status_code=500, detail=str(exc)) from exc
     logger.info("Review result: %s", result)
     return {"result": result}
 
 
+@app.post("/review/stream")
+def review_stream(body: ReviewBody) -> StreamingResponse:
+    """Stream reviewed text from ``Review`` as Server-Sent Events."""
+    logger.info("Review stream request body: %s", body.dict())
+    events = (
+        {"delta": delta} for delta in reviewer.perform_stream(body.text, **body.context)
+    )
+    return _event_stream(events, "Review")
+
+
 class ReportBody(BaseModel):
     analysis: Dict[str, Any]
     complaint_info: Dict[str, str]
     output_dir: str = "."
 
 
+def _report_urls(paths: Dict[str, str]) -> Dict[str, str]:
+    """Return the ``/reports`` URLs of generated report files."""
+    return {
+        "pdf": f"/reports/{Path(paths['pdf']).name}",
+        "excel": f"/reports/{Path(paths['excel']).name}",
+    }
+
+
+def _store_report(
+    analysis: Dict[str, Any], complaint_info: Dict[str, str]
+) -> Dict[str, str]:
+    """Render a report into the configured storage and return its URLs.
+
+    With ``REPORT_STORAGE=memory`` the files never touch the disk and are
+    served by ``GET /report/files/{report_id}/{kind}`` until evicted. On
+    disk identical requests share the files named by their content hash.
+    """
+    if REPORT_STORAGE != "memory":
+        paths = _report_disk.get_or_create(
+            report_key(analysis, complaint_info, render_version()),
+            lambda key: reporter.generate(analysis, complaint_info, REPORT_DIR, key),
+        )
+        return _report_urls(paths)
+    report_id = uuid4().hex
+    _report_memory.put(report_id, reporter.render(analysis, complaint_info))
+    return {kind: f"/report/files/{report_id}/{kind}" for kind in ("pdf", "excel")}
+
+
+def _file_response(data: bytes, name: str, kind: str) -> Response:
+    """Return report bytes as a download named ``name``."""
+    media_type, suffix = REPORT_MEDIA_TYPES[kind]
+    return Response(
+        data,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{suffix}"'},
+    )
+
+
 @app.post("/report")
-def report(body: ReportBody) -> Dict[str, str]:
-    """Generate PDF and Excel reports via ``ReportGenerator``."""
+async def report(body: ReportBody) -> Dict[str, str]:
+    """Generate PDF and Excel reports via ``ReportGenerator``.
+
+    Suited to small payloads; long reports can be queued with
+    ``POST /report/jobs`` instead.
+    """
     logger.info("Report request body: %s", body.dict())
     try:
-        paths = reporter.generate(
-            body.analysis,
-            body.complaint_info,
-            REPORT_DIR,
+        # Rendering is blocking and runs in the worker thread pool
+        result = await run_in_threadpool(
+            _store_report, body.analysis, body.complaint_info
         )
     except Exception as exc:  # pragma: no cover - unexpected failure
         logger.exception("Report generation failed")
         raise HTTPException(status_code=500, detail=str(exc)) from exc
-    result = {
-        "pdf": f"/reports/{Path(paths['pdf']).name}",
-        "excel": f"/reports/{Path(paths['excel']).name}",
-    }
     logger.info("Report result: %s", result)
     return result
 
 
+@app.post("/report/download")
+async def report_download(body: ReportBody, kind: str = "pdf") -> Response:
+    """Render a report and return the ``pdf`` or ``excel`` file directly.
+
+    Nothing is stored, so the file cannot be fetched again later.
+    """
+    if kind not in REPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=404, detail="Unknown report format")
+    try:
+        files = await run_in_threadpool(
+            reporter.render, body.analysis, body.complaint_info, (kind,)
+        )
+    except Exception as exc:  # pragma: no cover - unexpected failure
+        logger.exception("Report generation failed")
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+    return _file_response(files[kind], "report", kind)
+
+
+@app.get("/report/files/{report_id}/{kind}")
+def report_file(report_id: str, kind: str) -> Response:
+    """Return a report file kept in memory.
+
+    Responds with 404 once the report has been evicted.
+    """
+    if kind not in REPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=404, detail="Unknown report format")
+    data = _report_memory.get(report_id, kind)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Report file not found")
+    return _file_response(data, f"report_{report_id}", kind)
+
+
+def _report_item(item: Dict[str, Any]) -> Dict[str, str]:
+    """Render one queued report and return its URLs."""
+    body = ReportBody(**item)
+    return _store_report(body.analysis, body.complaint_info)
+
+
+_report_jobs.register("report", _report_item)
+
+
+def _report_job(job_id: str) -> Dict[str, Any]:
+    """Return the state of report job ``job_id`` or raise HTTP 404.
+
+    ``status`` is ``queued``, ``running``, ``completed`` or ``failed``; a
+    completed job carries the ``pdf`` and ``excel`` URLs.
+    """
+    job = _report_jobs.get(job_id)
+    if job is None or job["kind"] != "report":
+        raise HTTPException(status_code=404, detail="Report job not found")
+    result: Dict[str, Any] = {"id": job_id, "status": job["status"]}
+    if job["results"]:
+        outcome = job["results"][0]
+        if outcome["status"] == "failed":
+            result.update(status="failed", error=outcome["error"])
+        else:
+            result.update(outcome["result"])
+    return result
+
+
+@app.post("/report/jobs")
+def report_job(body: ReportBody) -> Dict[str, str]:
+    """Queue report rendering and return the job id immediately."""
+    job_id = _report_jobs.submit("report", [body.dict()])
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/report/jobs/{job_id}")
+def report_job_status(job_id: str) -> Dict[str, Any]:
+    """Return the status of a queued report and its URLs once rendered."""
+    return _report_job(job_id)
+
+
+@app.get("/report/jobs/{job_id}/{kind}")
+def report_job_download(job_id: str, kind: str) -> Response:
+    """Return the ``pdf`` or ``excel`` file of a rendered report.
+
+    Responds with 409 while the report is still being rendered and with
+    500 if rendering failed.
+    """
+    if kind not in REPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=404, detail="Unknown report format")
+    job = _report_job(job_id)
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job["error"])
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail="Report not ready")
+    if job[kind].startswith("/report/files/"):
+        return report_file(job[kind].split("/")[3], kind)
+    path = REPORT_DIR / Path(job[kind]).name
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Report file not found")
+    return FileResponse(path, filename=path.name)
+
+
 @app.get("/complaints")
 def complaints(
     request: Request,
     year: Optional[int] = None,
     start_year: Optional[int] = None,
     end_year: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    fields: Optional[str] = None,
+    rank: bool = False,
 ) -> Dict[str, Any]:
-    """Return complaint queries from JSON store and Excel file."""
+    """Return complaint queries from JSON store and Excel file.
+
+    ``limit``/``offset`` paginate the Excel matches and add a ``next_offset``
+    cursor to the response, ``fields`` is a comma-separated list of columns
+    to return and ``rank`` orders matches by fuzzy score.
+    """
     logger.info("Complaints query params: %s", request.query_params)
     keyword = request.query_params.get("keyword")
     store_results = _store.search(keyword) if keyword else []
-    known = {"keyword", "year", "start_year", "end_year"}
+    known = {
+        "keyword",
+        "year",
+        "start_year",
+        "end_year",
+        "limit",
+        "offset",
+        "fields",
+        "rank",
+    }
     filters: Dict[str, str] = {
         k: v for k, v in request.query_params.items() if k not in known
     }
@@ -186,6 +521,13 @@ def complaints(
         if isinstance(val, str):
             val = val.strip()
         normalized[mapped] = val
+    projection = None
+    if fields:
+        projection = [
+            ALIAS_TO_HEADER.get(normalize_text(f), f.strip())
+            for f in fields.split(",")
+            if f.strip()
+        ]
     excel_results = []
     has_year_filter = any(
         [
@@ -202,11 +544,25 @@ def complaints(
                 year,
                 start_year=start_year,
                 end_year=end_year,
+                # One extra row tells whether another page exists
+                limit=None if limit is None else limit + 1,
+                offset=offset,
+                fields=projection,
+                rank=rank,
             )
         except FileNotFoundError as exc:
             raise HTTPException(status_code=500, detail=str(exc)) from exc
-    result = {"store": store_results, "excel": excel_results}
-    logger.info("Complaints result: %s", result)
+    result: Dict[str, Any] = {"store": store_results, "excel": excel_results}
+    if limit is not None:
+        has_more = len(excel_results) > limit
+        result["excel"] = excel_results[:limit]
+        result["next_offset"] = offset + limit if has_more else None
+    logger.info(
+        "Complaints result: %d store, %d excel records",
+        len(store_results),
+        len(result["excel"]),
+    )
+    logger.debug("Complaints result: %s", result)
     return result
 
 
@@ -240,6 +596,27 @@ def options(field: str, request: Request) -> Dict[str, Any]:
     return result
 
 
+@app.get("/facets")
+def facets(request: Request) -> Dict[str, Any]:
+    """Return value counts for several Excel columns in a single scan.
+
+    Repeat the ``fields`` query parameter to select columns; all columns
+    are returned when it is omitted.
+    """
+    logger.info("Facets query params: %s", request.query_params)
+    fields = request.query_params.getlist("fields")
+    headers = [ALIAS_TO_HEADER.get(normalize_text(f), f) for f in fields]
+    try:
+        counts = _excel_searcher.facets(headers or None)
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+    if fields:
+        counts = {field: counts[header] for field, header in zip(fields, headers)}
+    result = {"facets": counts}
+    logger.debug("Facets result: %s", result)
+    return result
+
+
 @app.get("/guide/{method}")
 def guide(method: str, request: Request) -> Dict[str, Any]:
     """Return guideline data for ``method``."""
@@ -268,11 +645,11 @@ def reset_guide(method: str) -> Dict[str, str]:
 
 
 @app.post("/scan_8d")
-def scan_8d() -> Dict[str, Any]:
+async def scan_8d() -> Dict[str, Any]:
     """Scan 8D Excel reports and store rows in SQLite."""
     logger.info("Scanning 8D reports")
     try:
-        count = _scanner.scan()
+        count = await run_in_threadpool(_scanner.scan)
     except Exception as exc:  # pragma: no cover - unexpected failure
         logger.exception("Scan failed")
         raise HTTPException(status_code=500, detail=str(exc)) from exc
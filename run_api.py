@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 from pathlib import Path
+import multiprocessing
 import os
 import logging
 from dotenv import load_dotenv
@@ -51,4 +52,6 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    # Frozen builds re-run this script in REPORT_PROCESSES workers
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,99 @@
+"""Measure per-report latency of ``ReportGenerator.generate``.
+
+Compares reports that parse the font for every document, as before the
+process-wide font cache, with reports reusing the cached font and, with
+``--processes``, with the PDF and Excel file rendered in worker processes::
+
+    python scripts/bench_reports.py --reports 50
+    python scripts/bench_reports.py --no-disk-cache
+    python scripts/bench_reports.py --processes 2
+
+``--no-disk-cache`` disables the ``.pkl`` metrics files fpdf writes next to
+the font, as happens when the font directory is read-only (for example in
+a packaged build), so every uncached report parses the TrueType file.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Callable, List
+import argparse
+import statistics
+import sys
+import time
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import fpdf.fpdf  # noqa: E402
+
+from GuideManager import GuideManager  # noqa: E402
+from ReportGenerator import (  # noqa: E402
+    ReportGenerator,
+    clear_font_cache,
+    shutdown_pool,
+)
+
+ANALYSIS = {
+    f"D{i}": {"response": "Kök neden analizi ve kalıcı aksiyon planı. " * 10}
+    for i in range(1, 9)
+}
+INFO = {"customer": "Müşteri", "subject": "Yüzey çatlağı", "part_code": "K-001"}
+
+
+def _measure(run: Callable[[], None], reports: int) -> List[float]:
+    """Return the latency of ``reports`` calls of ``run`` in milliseconds."""
+    run()  # warm up imports and the font cache
+    timings = []
+    for _ in range(reports):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main() -> None:
+    """Run the benchmark and print a latency table."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reports", type=int, default=30)
+    parser.add_argument("--no-disk-cache", action="store_true")
+    parser.add_argument("--processes", type=int, default=0)
+    args = parser.parse_args()
+    if args.no_disk_cache:
+        fpdf.fpdf.FPDF_CACHE_MODE = 1
+
+    generator = ReportGenerator(GuideManager())
+    with TemporaryDirectory() as tmp:
+
+        def cold() -> None:
+            clear_font_cache()
+            generator.generate(ANALYSIS, INFO, tmp)
+
+        def warm() -> None:
+            generator.generate(ANALYSIS, INFO, tmp)
+
+        results = {
+            "font per report": _measure(cold, args.reports),
+            "cached font": _measure(warm, args.reports),
+        }
+        if args.processes:
+            parallel = ReportGenerator(GuideManager(), processes=args.processes)
+            name = f"{args.processes} processes"
+            results[name] = _measure(
+                lambda: parallel.generate(ANALYSIS, INFO, tmp), args.reports
+            )
+            shutdown_pool()
+
+    print(f"{'mode':<16} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, timings in results.items():
+        timings.sort()
+        p95 = timings[max(0, round(0.95 * len(timings)) - 1)]
+        print(
+            f"{name:<16} {statistics.mean(timings):8.1f} "
+            f"{statistics.median(timings):8.1f} {p95:8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import threading
 import unittest
 from unittest.mock import patch
 
@@ -8,7 +9,9 @@ from fastapi.testclient import TestClient
 import tempfile
 from pathlib import Path
 from ComplaintSearch import ComplaintStore
+from JobQueue import JobRunner, JobStore
 from LLMAnalyzer import OpenAIError
+from Review import ReviewLLMError
 
 base_prompts = Path(__file__).resolve().parents[1] / "Prompts"
 base_guides = Path(__file__).resolve().parents[1] / "Guidelines"
@@ -21,8 +24,15 @@ import api  # noqa: E402
 class APITest(unittest.TestCase):
     """Tests for FastAPI endpoints."""
 
+    PAGE_DEFAULTS = {"limit": None, "offset": 0, "fields": None, "rank": False}
+
     def setUp(self) -> None:
         self.client = TestClient(api.app, raise_server_exceptions=False)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        disk = patch.object(api, "_report_disk", api.DiskReportStore(tmp.name))
+        disk.start()
+        self.addCleanup(disk.stop)
 
     def test_cors_preflight(self) -> None:
         """OPTIONS request should include CORS headers."""
@@ -44,12 +54,12 @@ class APITest(unittest.TestCase):
             "language": "Türkçe",
         }
         with patch.object(
-            api.analyzer, "analyze", return_value={"ok": 1}
+            api.analyzer, "analyze_async", return_value={"ok": 1}
         ) as mock_analyze:
             response = self.client.post("/analyze", json=payload)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json(), {"ok": 1})
-        mock_analyze.assert_called_with(
+        mock_analyze.assert_awaited_with(
             payload["details"],
             payload["guideline"],
             "",
@@ -63,7 +73,7 @@ class APITest(unittest.TestCase):
             "directives": "",
             "language": "Türkçe",
         }
-        with patch.object(api.analyzer, "analyze", return_value={"ok": 1}):
+        with patch.object(api.analyzer, "analyze_async", return_value={"ok": 1}):
             with self.assertLogs("api", level="INFO") as cm:
                 response = self.client.post("/analyze", json=payload)
         self.assertEqual(response.status_code, 200)
@@ -78,18 +88,94 @@ class APITest(unittest.TestCase):
             "directives": "",
             "language": "Türkçe",
         }
-        with patch.object(api.analyzer, "analyze", side_effect=OpenAIError("fail")):
+        with patch.object(api.analyzer, "analyze_async", side_effect=OpenAIError("fail")):
             response = self.client.post("/analyze", json=payload)
         self.assertEqual(response.status_code, 500)
         self.assertEqual(response.json()["detail"], "fail")
 
     def test_review_endpoint(self) -> None:
         body = {"text": "t", "context": {"a": "b"}}
-        with patch.object(api.reviewer, "perform", return_value="r") as mock_perf:
+        with patch.object(api.reviewer, "perform_async", return_value="r") as mock_perf:
             response = self.client.post("/review", json=body)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json(), {"result": "r"})
-        mock_perf.assert_called_with("t", a="b")
+        mock_perf.assert_awaited_with("t", a="b")
+
+    def test_analyze_stream_endpoint(self) -> None:
+        payload = {"details": {}, "guideline": {}}
+        events = iter([{"step": "D1", "delta": "a"}, {"step": "D2", "delta": "ç"}])
+        with patch.object(api.analyzer, "analyze_stream", return_value=events):
+            response = self.client.post("/analyze/stream", json=payload)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        self.assertEqual(
+            response.text,
+            'data: {"step": "D1", "delta": "a"}\n\n'
+            'data: {"step": "D2", "delta": "ç"}\n\n'
+            "event: done\ndata: {}\n\n",
+        )
+
+    def test_stream_error_after_first_event(self) -> None:
+        payload = {"details": {}, "guideline": {}}
+
+        def failing(*args, **kwargs):
+            yield {"step": "full_text", "delta": "Merhaba "}
+            raise OpenAIError("LLM stream failed: reset")
+
+        with patch.object(api.analyzer, "analyze_stream", side_effect=failing):
+            with self.assertLogs("api", level="ERROR"):
+                response = self.client.post("/analyze/stream", json=payload)
+        self.assertEqual(
+            response.text,
+            'data: {"step": "full_text", "delta": "Merhaba "}\n\n'
+            'event: error\ndata: {"detail": "LLM stream failed: reset"}\n\n',
+        )
+        self.assertNotIn("event: done", response.text)
+
+    def test_stream_error_before_first_event(self) -> None:
+        body = {"text": "t", "context": {}}
+
+        def failing(*args, **kwargs):
+            raise ReviewLLMError("OPENAI_API_KEY not set")
+            yield ""
+
+        with patch.object(api.reviewer, "perform_stream", side_effect=failing):
+            response = self.client.post("/review/stream", json=body)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json()["detail"], "OPENAI_API_KEY not set")
+
+    def test_llm_metrics_endpoint(self) -> None:
+        rows = [{"component": "analyzer", "step": "D1", "calls": 1}]
+        with patch.object(api, "get_metrics") as mock_metrics, patch.dict(
+            os.environ, {"LLM_CACHE": ""}
+        ):
+            mock_metrics.return_value.summary.return_value = rows
+            response = self.client.get("/metrics/llm")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"calls": rows, "cache": None})
+
+    def test_analyze_batch_job(self) -> None:
+        item = {"details": {"complaint": "c"}, "guideline": {"fields": []}}
+        with tempfile.TemporaryDirectory() as tmp:
+            runner = JobRunner(JobStore(Path(tmp) / "jobs.db"), max_workers=2)
+            runner.register("analyze", api._analyze_item)
+            with patch.object(api, "_jobs", runner), patch.object(
+                api.analyzer, "analyze", return_value={"ok": 1}
+            ) as mock_analyze:
+                response = self.client.post(
+                    "/analyze/batch", json={"items": [item, item]}
+                )
+                self.assertEqual(response.status_code, 200)
+                data = response.json()
+                self.assertEqual(data["total"], 2)
+                runner.shutdown()
+                job = self.client.get(f"/jobs/{data['job_id']}").json()
+                missing = self.client.get("/jobs/unknown")
+        self.assertEqual(job["status"], "completed")
+        self.assertEqual(job["completed"], 2)
+        self.assertEqual(job["results"][1], {"index": 1, "status": "done", "result": {"ok": 1}})
+        mock_analyze.assert_called_with({"complaint": "c"}, {"fields": []}, "", "Türkçe")
+        self.assertEqual(missing.status_code, 404)
 
     def test_report_endpoint(self) -> None:
         body = {"analysis": {}, "complaint_info": {}, "output_dir": "."}
@@ -101,7 +187,118 @@ class APITest(unittest.TestCase):
             response.json(),
             {"pdf": "/reports/p.pdf", "excel": "/reports/e.xlsx"},
         )
-        mock_gen.assert_called_with({}, {}, api.REPORT_DIR)
+        key = api.report_key({}, {}, api.render_version())
+        mock_gen.assert_called_with({}, {}, api.REPORT_DIR, key)
+
+    def test_report_reuses_identical_report(self) -> None:
+        body = {"analysis": {"D1": {"response": "r"}}, "complaint_info": {}}
+        with tempfile.TemporaryDirectory() as tmp:
+            store = api.DiskReportStore(tmp)
+
+            def generate(analysis, info, output_dir, report_id):
+                paths = {
+                    "pdf": str(Path(tmp) / f"report_{report_id}.pdf"),
+                    "excel": str(Path(tmp) / f"report_{report_id}.xlsx"),
+                }
+                for path in paths.values():
+                    Path(path).write_bytes(b"data")
+                return paths
+
+            with patch.object(api, "_report_disk", store), patch.object(
+                api.reporter, "generate", side_effect=generate
+            ) as mock_gen:
+                first = self.client.post("/report", json=body).json()
+                second = self.client.post("/report", json=body).json()
+                metrics = self.client.get("/metrics/reports").json()
+        self.assertEqual(first, second)
+        key = api.report_key(body["analysis"], {}, api.render_version())
+        self.assertIn(key, first["pdf"])
+        self.assertEqual(mock_gen.call_count, 1)
+        self.assertEqual(metrics["storage"], "disk")
+        self.assertEqual(metrics["reports"], 1)
+        self.assertEqual(metrics["bytes"], 8)
+        self.assertEqual(metrics["hit_rate"], 0.5)
+
+    def test_report_job_lifecycle(self) -> None:
+        body = {"analysis": {"D1": {"response": "r"}}, "complaint_info": {}}
+        with tempfile.TemporaryDirectory() as tmp:
+            store = JobStore(Path(tmp) / "jobs.db")
+            runner = JobRunner(store, max_workers=1)
+            runner.register("report", api._report_item)
+            pdf = api.REPORT_DIR / "job_test.pdf"
+            pdf.write_bytes(b"%PDF-")
+            paths = {"pdf": str(pdf), "excel": "/tmp/job_test.xlsx"}
+            try:
+                with patch.object(api, "_report_jobs", runner), patch.object(
+                    api.reporter, "generate", return_value=paths
+                ) as mock_gen:
+                    queued = self.client.post("/report/jobs", json=body).json()
+                    runner.shutdown()
+                    url = f"/report/jobs/{queued['job_id']}"
+                    status = self.client.get(url).json()
+                    download = self.client.get(f"{url}/pdf")
+                    missing_file = self.client.get(f"{url}/excel")
+                    pending = store.create("report", [body])
+                    not_ready = self.client.get(f"/report/jobs/{pending}/pdf")
+                    unknown = self.client.get("/report/jobs/unknown")
+            finally:
+                pdf.unlink()
+        self.assertEqual(queued["status"], "queued")
+        self.assertEqual(
+            status,
+            {
+                "id": queued["job_id"],
+                "status": "completed",
+                "pdf": "/reports/job_test.pdf",
+                "excel": "/reports/job_test.xlsx",
+            },
+        )
+        self.assertEqual(download.content, b"%PDF-")
+        self.assertEqual(missing_file.status_code, 404)
+        self.assertEqual(not_ready.status_code, 409)
+        self.assertEqual(unknown.status_code, 404)
+        key = api.report_key(body["analysis"], {}, api.render_version())
+        mock_gen.assert_called_with(body["analysis"], {}, api.REPORT_DIR, key)
+
+    def test_report_jobs_do_not_wait_for_batch_jobs(self) -> None:
+        body = {"analysis": {"D1": {"response": "r"}}, "complaint_info": {}}
+        item = {"details": {"complaint": "c"}, "guideline": {"fields": []}}
+        release = threading.Event()
+        with tempfile.TemporaryDirectory() as tmp:
+            store = JobStore(Path(tmp) / "jobs.db")
+            batch = JobRunner(store, max_workers=1)
+            batch.register("analyze", api._analyze_item)
+            reports = JobRunner(store, max_workers=1)
+            reports.register("report", api._report_item)
+            paths = {"pdf": "/tmp/r.pdf", "excel": "/tmp/r.xlsx"}
+            with patch.object(api, "_jobs", batch), patch.object(
+                api, "_report_jobs", reports
+            ), patch.object(
+                api.analyzer, "analyze", side_effect=lambda *a: release.wait(5)
+            ), patch.object(api.reporter, "generate", return_value=paths):
+                self.client.post("/analyze/batch", json={"items": [item, item]})
+                job_id = self.client.post("/report/jobs", json=body).json()["job_id"]
+                reports.shutdown()
+                status = self.client.get(f"/report/jobs/{job_id}").json()["status"]
+                release.set()
+                batch.shutdown()
+        self.assertEqual(status, "completed")
+
+    def test_report_job_failure(self) -> None:
+        body = {"analysis": {}, "complaint_info": {}}
+        with tempfile.TemporaryDirectory() as tmp:
+            runner = JobRunner(JobStore(Path(tmp) / "jobs.db"), max_workers=1)
+            runner.register("report", api._report_item)
+            with patch.object(api, "_report_jobs", runner), patch.object(
+                api.reporter, "generate", side_effect=RuntimeError("boom")
+            ), self.assertLogs("JobQueue", level="ERROR"):
+                job_id = self.client.post("/report/jobs", json=body).json()["job_id"]
+                runner.shutdown()
+                status = self.client.get(f"/report/jobs/{job_id}").json()
+                download = self.client.get(f"/report/jobs/{job_id}/pdf")
+        self.assertEqual(status["status"], "failed")
+        self.assertEqual(status["error"], "boom")
+        self.assertEqual(download.status_code, 500)
 
     def test_report_endpoint_error(self) -> None:
         """Errors from ``ReportGenerator`` should return HTTP 500."""
@@ -113,6 +310,40 @@ class APITest(unittest.TestCase):
         self.assertEqual(response.json()["detail"], "boom")
         self.assertIn("Report generation failed", "\n".join(cm.output))
 
+    def test_report_memory_storage(self) -> None:
+        body = {"analysis": {"D1": {"response": "r"}}, "complaint_info": {}}
+        files = {"pdf": b"%PDF-", "excel": b"PK"}
+        store = api.MemoryReportStore()
+        with patch.object(api, "REPORT_STORAGE", "memory"), patch.object(
+            api, "_report_memory", store
+        ), patch.object(api.reporter, "render", return_value=files), patch.object(
+            api.reporter, "generate"
+        ) as mock_gen:
+            urls = self.client.post("/report", json=body).json()
+            pdf = self.client.get(urls["pdf"])
+            excel = self.client.get(urls["excel"])
+            unknown = self.client.get("/report/files/unknown/pdf")
+        mock_gen.assert_not_called()
+        self.assertTrue(urls["pdf"].startswith("/report/files/"))
+        self.assertEqual(pdf.content, b"%PDF-")
+        self.assertEqual(pdf.headers["content-type"], "application/pdf")
+        self.assertIn(".pdf", pdf.headers["content-disposition"])
+        self.assertEqual(excel.content, b"PK")
+        self.assertIn(".xlsx", excel.headers["content-disposition"])
+        self.assertEqual(unknown.status_code, 404)
+
+    def test_report_download(self) -> None:
+        body = {"analysis": {"D1": {"response": "r"}}, "complaint_info": {}}
+        with patch.object(
+            api.reporter, "render", return_value={"excel": b"PK"}
+        ) as mock_render:
+            response = self.client.post("/report/download?kind=excel", json=body)
+            unknown = self.client.post("/report/download?kind=doc", json=body)
+        self.assertEqual(response.content, b"PK")
+        self.assertIn("spreadsheetml", response.headers["content-type"])
+        self.assertEqual(unknown.status_code, 404)
+        mock_render.assert_called_once_with(body["analysis"], {}, ("excel",))
+
     def test_reports_static_mount(self) -> None:
         tmp_file = api.REPORT_DIR / "test.txt"
         tmp_file.write_text("hi")
@@ -135,7 +366,7 @@ class APITest(unittest.TestCase):
         self.assertEqual(response.json(), {"store": [{"id": 1}], "excel": [{"id": 2}]})
         mock_store.assert_called_with("k")
         mock_excel.assert_called_with(
-            {"Müşteri Adı": "c"}, None, start_year=None, end_year=None
+            {"Müşteri Adı": "c"}, None, start_year=None, end_year=None, **self.PAGE_DEFAULTS
         )
 
     def test_complaints_endpoint_year_range(self) -> None:
@@ -144,7 +375,7 @@ class APITest(unittest.TestCase):
             response = self.client.get("/complaints", params=params)
         self.assertEqual(response.status_code, 200)
         mock_excel.assert_called_with(
-            {"Müşteri Adı": "c"}, None, start_year=2020, end_year=2022
+            {"Müşteri Adı": "c"}, None, start_year=2020, end_year=2022, **self.PAGE_DEFAULTS
         )
 
     def test_complaints_extra_filters_forwarded(self) -> None:
@@ -156,7 +387,7 @@ class APITest(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         mock_store.assert_not_called()
         mock_excel.assert_called_with(
-            {"foo": "bar", "Müşteri Adı": "c"}, None, start_year=None, end_year=None
+            {"foo": "bar", "Müşteri Adı": "c"}, None, start_year=None, end_year=None, **self.PAGE_DEFAULTS
         )
 
     def test_complaints_alias_turkish_key(self) -> None:
@@ -165,7 +396,7 @@ class APITest(unittest.TestCase):
             response = self.client.get("/complaints", params=params)
         self.assertEqual(response.status_code, 200)
         mock_excel.assert_called_with(
-            {"Müşteri Adı": "c"}, None, start_year=None, end_year=None
+            {"Müşteri Adı": "c"}, None, start_year=None, end_year=None, **self.PAGE_DEFAULTS
         )
 
     def test_options_endpoint(self) -> None:
@@ -179,6 +410,28 @@ class APITest(unittest.TestCase):
         self.assertEqual(response.json(), {"values": ["a", "b"]})
         mock_opts.assert_called_with("Müşteri Adı")
 
+    def test_facets_endpoint(self) -> None:
+        counts = {"Müşteri Adı": {"a": 2}, "foo": {}}
+        with patch.object(
+            api._excel_searcher, "facets", return_value=counts
+        ) as mock_facets:
+            response = self.client.get(
+                "/facets", params=[("fields", "customer"), ("fields", "foo")]
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(), {"facets": {"customer": {"a": 2}, "foo": {}}}
+        )
+        mock_facets.assert_called_with(["Müşteri Adı", "foo"])
+
+    def test_facets_endpoint_all_columns(self) -> None:
+        with patch.object(
+            api._excel_searcher, "facets", return_value={"x": {"a": 1}}
+        ) as mock_facets:
+            response = self.client.get("/facets")
+        self.assertEqual(response.json(), {"facets": {"x": {"a": 1}}})
+        mock_facets.assert_called_with(None)
+
     def test_guide_endpoint(self) -> None:
         with patch.object(
             api._guide_manager,
@@ -211,11 +464,46 @@ class APITest(unittest.TestCase):
 
     def test_review_endpoint_error(self) -> None:
         body = {"text": "t", "context": {}}
-        with patch.object(api.reviewer, "perform", side_effect=Exception("boom")):
+        with patch.object(api.reviewer, "perform_async", side_effect=Exception("boom")):
             response = self.client.post("/review", json=body)
         self.assertEqual(response.status_code, 500)
         self.assertIn("boom", response.json()["detail"])
 
+    def test_complaints_pagination_and_projection(self) -> None:
+        params = {
+            "customer": "c",
+            "limit": 2,
+            "offset": 4,
+            "fields": "customer, konu",
+            "rank": "true",
+        }
+        rows = [{"id": 1}, {"id": 2}, {"id": 3}]
+        with patch.object(
+            api._excel_searcher, "search", return_value=rows
+        ) as mock_excel:
+            response = self.client.get("/complaints", params=params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {"store": [], "excel": [{"id": 1}, {"id": 2}], "next_offset": 6},
+        )
+        mock_excel.assert_called_with(
+            {"Müşteri Adı": "c"},
+            None,
+            start_year=None,
+            end_year=None,
+            limit=3,
+            offset=4,
+            fields=["Müşteri Adı", "Konu"],
+            rank=True,
+        )
+
+    def test_complaints_last_page(self) -> None:
+        params = {"customer": "c", "limit": 5}
+        with patch.object(api._excel_searcher, "search", return_value=[{"id": 1}]):
+            response = self.client.get("/complaints", params=params)
+        self.assertIsNone(response.json()["next_offset"])
+
     def test_complaints_endpoint_error(self) -> None:
         with patch.object(
             api._excel_searcher, "search", side_effect=ValueError("fail")
@@ -7,6 +7,7 @@ from unittest.mock import patch
 from pathlib import Path
 
 from ComplaintSearch.claims_excel import ExcelClaimsSearcher
+from ComplaintSearch.trigram_index import TrigramIndex
 from openpyxl import Workbook, load_workbook
 
 
@@ -115,6 +116,58 @@ class ExcelClaimsSearchTest(unittest.TestCase):
             customers = searcher.unique_values("customer")
             self.assertEqual(customers, ["ACME", "BETA"])
 
+    def test_pagination_projection_and_rank(self) -> None:
+        """Results can be paged, projected and ranked by fuzzy score."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            file_path = os.path.join(tmpdir, "claims.xlsx")
+            self._create_file(file_path)
+            wb = load_workbook(file_path)
+            ws = wb.active
+            ws.append(["noize", "GAMMA", "door", "X3", datetime(2023, 2, 1)])
+            ws.append(["noise", "DELTA", "door", "X4", datetime(2023, 3, 1)])
+            wb.save(file_path)
+            searcher = ExcelClaimsSearcher(file_path)
+
+            plain = searcher.search({"complaint": "noise"}, fields=["Customer"])
+            self.assertEqual(
+                plain,
+                [{"customer": "ACME"}, {"customer": "GAMMA"}, {"customer": "DELTA"}],
+            )
+            ranked = searcher.search(
+                {"complaint": "noise"}, fields=["customer"], rank=True, limit=2
+            )
+            self.assertEqual(ranked, [{"customer": "ACME"}, {"customer": "DELTA"}])
+            page = searcher.search(
+                {"complaint": "noise"}, fields=["customer"], rank=True,
+                limit=2, offset=2,
+            )
+            self.assertEqual(page, [{"customer": "GAMMA"}])
+            unranked = searcher.search({}, limit=1, offset=1)
+            self.assertEqual(unranked[0]["customer"], "BETA")
+
+    def test_facets(self) -> None:
+        """``facets`` should count values per column in one cached pass."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            file_path = os.path.join(tmpdir, "claims.xlsx")
+            self._create_file(file_path)
+            wb = load_workbook(file_path)
+            wb.active.append(["noise", "ACME", None, "X1", datetime(2024, 1, 1)])
+            wb.save(file_path)
+
+            searcher = ExcelClaimsSearcher(file_path)
+            result = searcher.facets(["customer", "Subject", "missing"])
+            self.assertEqual(
+                result,
+                {
+                    "customer": {"ACME": 2, "BETA": 1},
+                    "Subject": {"body": 1, "engine": 1},
+                    "missing": {},
+                },
+            )
+            everything = searcher.facets()
+            self.assertEqual(everything["complaint"], {"crack": 1, "noise": 2})
+            self.assertEqual(len(everything), 5)
+
     def test_env_path_used(self) -> None:
         """File path should come from ``COMPLAINTS_XLSX_PATH`` when not provided."""
         with tempfile.TemporaryDirectory() as tmpdir:
@@ -146,6 +199,117 @@ class ExcelClaimsSearchTest(unittest.TestCase):
             overlap = searcher.search({}, year=2023, start_year=2022, end_year=2023)
             self.assertEqual(len(overlap), 1)
 
+    def test_year_partitions(self) -> None:
+        """Year filters should use partitions built once per file version."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            file_path = os.path.join(tmpdir, "claims.xlsx")
+            self._create_file(file_path)
+            wb = load_workbook(file_path)
+            ws = wb.active
+            ws.append(["iso", "GAMMA", "door", "X3", "2021-03-04"])
+            ws.append(["blank", "DELTA", "door", "X4", None])
+            ws.append(["bad", "EPS", "door", "X5", "not a date"])
+            wb.save(file_path)
+
+            searcher = ExcelClaimsSearcher(file_path)
+            with self.assertLogs("ComplaintSearch.claims_excel", "WARNING") as log:
+                result = searcher.search({}, year=2021)
+            self.assertIn("Skipping 1 claims rows", "\n".join(log.output))
+            self.assertEqual([r["customer"] for r in result], ["GAMMA", "DELTA"])
+
+            table = searcher._load_table()
+            self.assertEqual(sorted(table.years), [2021, 2022, 2023])
+            ranged = searcher.search({}, start_year=2022)
+            self.assertEqual(
+                [r["customer"] for r in ranged], ["ACME", "BETA", "DELTA"]
+            )
+            everything = searcher.search({})
+            self.assertNotIn("EPS", [r["customer"] for r in everything])
+            self.assertIsNone(table.rows_in_years())
+            self.assertEqual(searcher.search({"complaint": "bad"}), [])
+
+    def test_table_cache_persisted(self) -> None:
+        """Parsed rows should be reused from the cache dir until the file changes."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            file_path = os.path.join(tmpdir, "claims.xlsx")
+            cache_dir = Path(tmpdir) / "cache"
+            self._create_file(file_path)
+            ExcelClaimsSearcher(file_path, cache_dir).search({"customer": "ACME"})
+            cache_files = list(cache_dir.glob("*.json"))
+            self.assertEqual(len(cache_files), 1)
+
+            with patch(
+                "ComplaintSearch.claims_excel.load_workbook",
+                side_effect=AssertionError("workbook re-parsed"),
+            ):
+                searcher = ExcelClaimsSearcher(file_path, cache_dir)
+                self.assertEqual(len(searcher.search({"customer": "BETA"})), 1)
+                self.assertEqual(searcher.unique_values("customer"), ["ACME", "BETA"])
+                self.assertEqual(
+                    searcher.search({"customer": "ACME"}, fields=["date"]),
+                    [{"date": datetime(2023, 1, 1)}],
+                )
+
+            wb = load_workbook(file_path)
+            wb.active.append(["dent", "GAMMA", "door", "X3", datetime(2024, 1, 1)])
+            wb.save(file_path)
+            customers = searcher.unique_values("customer")
+            self.assertEqual(customers, ["ACME", "BETA", "GAMMA"])
+
+    def test_table_cache_env_and_invalid_file(self) -> None:
+        """``CLAIMS_CACHE_DIR`` enables the cache; bad files are re-parsed."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            file_path = os.path.join(tmpdir, "claims.xlsx")
+            self._create_file(file_path)
+            with patch.dict(os.environ, {"CLAIMS_CACHE_DIR": tmpdir}):
+                searcher = ExcelClaimsSearcher(file_path)
+            searcher.search({})
+            (cache_file,) = Path(tmpdir).glob("claims_*.json")
+            cache_file.write_text("cos\nsystem\n(S'echo'\ntR.")
+            with self.assertLogs("ComplaintSearch.claims_excel", "WARNING"):
+                fresh = ExcelClaimsSearcher(file_path, tmpdir)
+                self.assertEqual(len(fresh.search({})), 2)
+
+    def test_table_cache_not_persisted(self) -> None:
+        """Without a cache dir the table is kept in memory only."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            file_path = os.path.join(tmpdir, "claims.xlsx")
+            self._create_file(file_path)
+            with patch.dict(os.environ, {"CLAIMS_CACHE_DIR": ""}):
+                searcher = ExcelClaimsSearcher(file_path)
+            searcher.search({})
+            self.assertEqual(os.listdir(tmpdir), ["claims.xlsx"])
+            with patch(
+                "ComplaintSearch.claims_excel.load_workbook",
+                side_effect=AssertionError("workbook re-parsed"),
+            ):
+                self.assertEqual(len(searcher.search({})), 2)
+
+
+class TrigramIndexTest(unittest.TestCase):
+    """Tests for the trigram index used by ExcelClaimsSearcher."""
+
+    def setUp(self) -> None:
+        self.index = TrigramIndex(
+            ["noise in engine", "acme", "crack", "acme", "noize", "ac"]
+        )
+
+    def _rows(self, value_ids) -> set:
+        return {row for value_id in value_ids for row in self.index.rows[value_id]}
+
+    def test_distinct_values_grouped(self) -> None:
+        self.assertEqual(self._rows(self.index.exact("acme")), {1, 3})
+
+    def test_containing(self) -> None:
+        self.assertEqual(self._rows(self.index.containing("engine")), {0})
+        self.assertEqual(self._rows(self.index.containing("ac")), {1, 2, 3, 5})
+        self.assertEqual(self.index.containing("missing"), set())
+
+    def test_similar_matches_sequence_matcher(self) -> None:
+        matches = self.index.similar("noise", 0.8)
+        self.assertEqual(self._rows(matches), {4})
+        self.assertEqual(list(matches.values()), [0.8])
+
 
 if __name__ == "__main__":
     unittest.main()
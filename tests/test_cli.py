@@ -85,7 +85,7 @@ class CLITest(unittest.TestCase):
             tmpdir,
         )
 
-    @patch("UI.cli.ComplaintStore")
+    @patch("UI.cli.create_store")
     def test_search_option(self, mock_store) -> None:
         mock_store.return_value.search.return_value = [
             {"complaint": "a"}
@@ -94,8 +94,16 @@ class CLITest(unittest.TestCase):
             cli.main(["--search", "a"])
             output = buf.getvalue()
         mock_store.return_value.search.assert_called_with("a")
+        mock_store.assert_called_with(None)
         self.assertIn("complaint", output)
 
+    @patch("UI.cli.create_store")
+    def test_search_store_backend(self, mock_store) -> None:
+        mock_store.return_value.search.return_value = []
+        with io.StringIO() as buf, redirect_stdout(buf):
+            cli.main(["--search", "a", "--store", "sqlite"])
+        mock_store.assert_called_with("sqlite")
+
 
 if __name__ == "__main__":
     unittest.main()
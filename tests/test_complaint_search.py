@@ -1,7 +1,17 @@
+import json
 import tempfile
 import unittest
+from pathlib import Path
+from unittest.mock import patch
 
-from ComplaintSearch import ComplaintStore
+from ComplaintSearch import (
+    ComplaintStore,
+    JsonlComplaintStore,
+    SQLiteComplaintStore,
+    create_store,
+    normalize_many,
+    normalize_text,
+)
 
 
 class ComplaintStoreTest(unittest.TestCase):
@@ -50,5 +60,133 @@ class ComplaintStoreTest(unittest.TestCase):
             self.assertEqual(typo[0]["customer"], "BETA")
 
 
+class JsonlComplaintStoreTest(unittest.TestCase):
+    """Tests for the append-only JSON Lines store."""
+
+    RECORD = {
+        "complaint": "noise issue",
+        "customer": "ACME",
+        "subject": "engine",
+        "part_code": "X1",
+    }
+
+    def test_append_and_incremental_refresh(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "complaints.jsonl"
+            store = JsonlComplaintStore(path)
+            other = JsonlComplaintStore(path)
+            store.add_complaint(self.RECORD)
+            self.assertEqual(store.search("noise"), [self.RECORD])
+            other.add_complaint({**self.RECORD, "customer": "BETA"})
+            self.assertEqual(len(path.read_text(encoding="utf-8").splitlines()), 2)
+            with patch("json.loads", wraps=json.loads) as loads:
+                results = store.search("noise")
+            self.assertEqual([r["customer"] for r in results], ["ACME", "BETA"])
+            self.assertEqual(loads.call_count, 1)
+
+    def test_compact_drops_corrupt_lines(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "complaints.jsonl"
+            store = JsonlComplaintStore(path)
+            store.add_complaint(self.RECORD)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("{broken\n")
+            with self.assertLogs("ComplaintSearch.jsonl_store", "WARNING"):
+                self.assertEqual(len(store.search("noise")), 1)
+            self.assertEqual(store.compact(), 1)
+            self.assertEqual(
+                path.read_text(encoding="utf-8").splitlines(),
+                [json.dumps(self.RECORD, ensure_ascii=False)],
+            )
+            store.add_complaint(self.RECORD)
+            self.assertEqual(len(store.search("noise")), 2)
+
+    def test_migrates_legacy_json(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            legacy = ComplaintStore(Path(tmpdir) / "complaints.json")
+            legacy.add_complaint(self.RECORD)
+            store = create_store("jsonl", Path(tmpdir) / "complaints.jsonl")
+            self.assertIsInstance(store, JsonlComplaintStore)
+            self.assertEqual(store.search("acme"), [self.RECORD])
+            legacy.add_complaint({**self.RECORD, "customer": "BETA"})
+            again = create_store("jsonl", Path(tmpdir) / "complaints.jsonl")
+            self.assertEqual(len(again.search("noise")), 1)
+
+
+class SQLiteComplaintStoreTest(unittest.TestCase):
+    """Tests for the SQLite FTS5 complaint store."""
+
+    def _store(self, tmpdir: str) -> SQLiteComplaintStore:
+        store = SQLiteComplaintStore(Path(tmpdir) / "complaints.db")
+        store.add_complaint({
+            "complaint": "M\u00fc\u015fteri \u015fikayet",
+            "customer": "ACME",
+            "subject": "engine",
+            "part_code": "X1",
+        })
+        store.add_complaint({
+            "complaint": "noise issue",
+            "customer": "BETA",
+            "subject": "door",
+            "part_code": "X2",
+        })
+        return store
+
+    def test_substring_and_fuzzy(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = self._store(tmpdir)
+            self.assertEqual(
+                [r["customer"] for r in store.search("Şikayet")], ["ACME"]
+            )
+            self.assertEqual(
+                [r["customer"] for r in store.search("noize issue")], ["BETA"]
+            )
+            self.assertEqual([r["customer"] for r in store.search("x")], ["ACME", "BETA"])
+            self.assertEqual(store.search("missing"), [])
+
+    def test_short_keyword_fuzzy(self) -> None:
+        """Keywords without trigrams keep the fuzzy hits of a full scan."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = self._store(tmpdir)
+            store.add_complaint({"complaint": "leak", "customer": "GAMMA", "part_code": "XA1"})
+            self.assertEqual([r["customer"] for r in store.search("x1")], ["ACME", "GAMMA"])
+
+    def test_fuzzy_check_limited_to_candidates(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = self._store(tmpdir)
+            with patch.object(
+                SQLiteComplaintStore, "_match", wraps=store._match
+            ) as match:
+                store.search("noise")
+            self.assertEqual([r["customer"] for r in match.call_args[0][0]], ["BETA"])
+
+    def test_create_store_migrates_json(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            legacy = ComplaintStore(Path(tmpdir) / "complaints.json")
+            legacy.add_complaint({"complaint": "crack", "customer": "C"})
+            store = create_store("sqlite", Path(tmpdir) / "complaints.db")
+            self.assertIsInstance(store, SQLiteComplaintStore)
+            self.assertEqual(store.search("crack"), [{"complaint": "crack", "customer": "C"}])
+
+
+class NormalizeTextTest(unittest.TestCase):
+    """Tests for the table-driven text normalizer."""
+
+    def test_turkish_and_punctuation(self) -> None:
+        self.assertEqual(
+            normalize_text("  Müşteri   ŞİKAYETİ: çatlak, ğ!  "),
+            "musteri sikayeti catlak g",
+        )
+        self.assertEqual(normalize_text("ılık\u00a0su\tﬁltre"), "lk su filtre")
+        self.assertEqual(normalize_text("snake_case-Key"), "snake_casekey")
+        self.assertEqual(normalize_text(""), "")
+
+    def test_normalize_many(self) -> None:
+        values = ["Çatlak", "ACME", "Çatlak", " - "]
+        self.assertEqual(
+            normalize_many(values), [normalize_text(v) for v in values]
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,8 +1,9 @@
 import sqlite3
+import time
 from pathlib import Path
 import unittest
 
-from EightDScanner import EightDScanner
+from EightDScanner import CaseIndex, EightDScanner
 from openpyxl import Workbook
 
 
@@ -40,6 +41,66 @@ class TestEightDScanner(unittest.TestCase):
             rows = list(conn.execute("SELECT material_code, description, customer, root_cause, permanent_action FROM reports"))
         self.assertEqual(rows, [("123", "desc", "cust", "root", "action")])
 
+    def test_scan_updates_similarity_index(self) -> None:
+        self._create_excel(self.dir / "test.xlsx")
+        scanner = EightDScanner(self.dir, self.db_path)
+        self.assertEqual(scanner.index.similar("123", "desc"), [])
+        scanner.scan()
+        self.assertEqual(len(scanner.index), 1)
+        self.assertEqual(scanner.index.similar("123", "")[0]["root_cause"], "root")
+
+
+class TestCaseIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.dir = Path("tests/temp_index")
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.dir / "data.db"
+        EightDScanner(self.dir, self.db_path)
+
+    def tearDown(self) -> None:
+        for item in self.dir.glob("*"):
+            item.unlink()
+        self.dir.rmdir()
+
+    def _insert(self, rows) -> None:  # type: ignore
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executemany(
+                "INSERT INTO reports(material_code, description, customer, root_cause, permanent_action) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def test_ranks_by_description_and_part_code(self) -> None:
+        self._insert(
+            [
+                ("A1", "Yüzeyde çatlak ve çizik", "c", "kalıp", "bakım"),
+                ("B2", "Yüzeyde çatlak", "c", "malzeme", "tedarikçi"),
+                ("C3", "Ambalaj hasarı", "c", "taşıma", "koli"),
+            ]
+        )
+        index = CaseIndex(self.db_path)
+        results = index.similar("B2", "yüzey ÇATLAK", k=2)
+        self.assertEqual([r["material_code"] for r in results], ["B2", "A1"])
+        self.assertGreater(results[0]["score"], results[1]["score"])
+        self.assertEqual(index.similar("", "bilinmeyen"), [])
+
+    def test_refresh_is_incremental_and_lookup_fast(self) -> None:
+        words = ["çatlak", "çizik", "deformasyon", "pas", "boya", "ölçü", "çapak"]
+        self._insert(
+            [
+                (f"P{i % 500}", f"{words[i % 7]} {words[i % 5]} hata {i}", "c", "r", "a")
+                for i in range(20000)
+            ]
+        )
+        index = CaseIndex(self.db_path)
+        self.assertEqual(index.refresh(), 20000)
+        self._insert([("NEW", "benzersiz sızıntı", "c", "conta", "değişti")])
+        self.assertEqual(index.refresh(), 1)
+        self.assertEqual(index.similar("", "sızıntı")[0]["material_code"], "NEW")
+        started = time.perf_counter()
+        for _ in range(10):
+            index.similar("P7", "çatlak pas hata", k=5)
+        self.assertLess((time.perf_counter() - started) / 10, 0.5)
+
 
 if __name__ == "__main__":
     unittest.main()
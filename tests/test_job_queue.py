@@ -0,0 +1,164 @@
+import sqlite3
+import threading
+import time
+import unittest
+from contextlib import closing
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from JobQueue import JobRunner, JobStore
+
+
+class JobQueueTest(unittest.TestCase):
+    """Tests for the persistent job runner."""
+
+    def setUp(self) -> None:
+        self.tmpdir = TemporaryDirectory()
+        self.path = Path(self.tmpdir.name) / "jobs.db"
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def _expire_claims(self) -> None:
+        """Make running items look abandoned by a stopped process."""
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            conn.execute("UPDATE job_items SET updated = 0 WHERE status = 'running'")
+
+    def test_results_and_failures_are_recorded(self) -> None:
+        runner = JobRunner(JobStore(self.path), max_workers=2)
+
+        def handler(item):
+            if item["n"] == 1:
+                raise ValueError("bad item")
+            return {"double": item["n"] * 2}
+
+        runner.register("double", handler)
+        job_id = runner.submit("double", [{"n": 0}, {"n": 1}, {"n": 2}])
+        runner.shutdown()
+        job = runner.get(job_id)
+        self.assertEqual(job["status"], "completed")
+        self.assertEqual((job["total"], job["completed"], job["failed"]), (3, 2, 1))
+        self.assertEqual(
+            job["results"],
+            [
+                {"index": 0, "status": "done", "result": {"double": 0}},
+                {"index": 1, "status": "failed", "error": "bad item"},
+                {"index": 2, "status": "done", "result": {"double": 4}},
+            ],
+        )
+        self.assertIsNone(runner.get("missing"))
+
+    def test_partial_progress_and_resume(self) -> None:
+        # Simulate a process that stopped while the job was in progress
+        store = JobStore(self.path)
+        job_id = store.create("echo", [0, 1, 2])
+        store.update_item(job_id, 0, "done", result=0)
+        store.update_item(job_id, 1, "running")
+        self._expire_claims()
+        job = store.get(job_id)
+        self.assertEqual(job["status"], "running")
+        self.assertEqual(job["results"], [{"index": 0, "status": "done", "result": 0}])
+
+        runner = JobRunner(JobStore(self.path), max_workers=2)
+        runner.register("echo", lambda item: item * 10)
+        self.assertEqual(runner.resume(), 2)
+        runner.shutdown()
+        job = runner.get(job_id)
+        self.assertEqual(job["status"], "completed")
+        self.assertEqual([r["result"] for r in job["results"]], [0, 10, 20])
+
+    def test_concurrent_resume_runs_items_once(self) -> None:
+        # Two processes sharing the database resume the same stopped job
+        store = JobStore(self.path)
+        job_id = store.create("count", [0, 1, 2])
+        store.update_item(job_id, 0, "running")
+        self._expire_claims()
+        calls = []
+
+        def handler(item):
+            calls.append(item)
+            return item
+
+        runners = [JobRunner(JobStore(self.path), max_workers=2) for _ in range(2)]
+        for runner in runners:
+            runner.register("count", handler)
+        for runner in runners:
+            runner.resume()
+        for runner in runners:
+            runner.shutdown()
+        self.assertEqual(sorted(calls), [0, 1, 2])
+        self.assertEqual(store.get(job_id)["status"], "completed")
+
+    def test_claim_is_atomic(self) -> None:
+        store = JobStore(self.path)
+        job_id = store.create("echo", [0])
+        started = store.get(job_id)["created"]
+        self.assertTrue(store.claim(job_id, 0, "a", started))
+        self.assertFalse(store.claim(job_id, 0, "b", started))
+        # A running item whose claim was not renewed was abandoned
+        self.assertTrue(store.claim(job_id, 0, "b", float("inf")))
+
+    def test_live_runner_keeps_its_items(self) -> None:
+        started = threading.Event()
+        release = threading.Event()
+        runs = []
+
+        def slow(item):
+            runs.append(item)
+            started.set()
+            release.wait(5)
+            return item
+
+        first = JobRunner(JobStore(self.path), max_workers=1, lease=0.2)
+        first.register("slow", slow)
+        job_id = first.submit("slow", [1])
+        self.assertTrue(started.wait(5))
+        second = JobRunner(JobStore(self.path), max_workers=1, lease=0.2)
+        second.register("slow", slow)
+        self.assertEqual(second.resume(), 0)
+        # Outlive the lease several times while the first runner renews it
+        time.sleep(0.6)
+        release.set()
+        first.shutdown()
+        second.shutdown()
+        self.assertEqual(runs, [1])
+        self.assertEqual(first.get(job_id)["status"], "completed")
+
+    def test_abandoned_items_are_taken_over(self) -> None:
+        store = JobStore(self.path)
+        job_id = store.create("echo", [0])
+        store.claim(job_id, 0, "gone", 0.0)
+        done = threading.Event()
+
+        def handler(item):
+            done.set()
+            return item
+
+        runner = JobRunner(JobStore(self.path), max_workers=1, lease=0.1)
+        runner.register("echo", handler)
+        self.assertEqual(runner.resume(), 0)
+        self.assertTrue(done.wait(5))
+        runner.shutdown()
+        self.assertEqual(store.get(job_id)["status"], "completed")
+
+    def test_queued_until_started(self) -> None:
+        release = threading.Event()
+        runner = JobRunner(JobStore(self.path), max_workers=1)
+        runner.register("wait", lambda item: release.wait(5))
+        first = runner.submit("wait", [1])
+        second = runner.submit("wait", [2])
+        self.assertEqual(runner.get(second)["status"], "queued")
+        release.set()
+        runner.shutdown()
+        self.assertEqual(runner.get(first)["status"], "completed")
+        self.assertEqual(runner.get(second)["status"], "completed")
+
+    def test_unknown_kind_rejected(self) -> None:
+        runner = JobRunner(JobStore(self.path), max_workers=1)
+        with self.assertRaises(KeyError):
+            runner.submit("missing", [1])
+        runner.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
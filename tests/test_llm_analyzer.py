@@ -1,9 +1,13 @@
+import asyncio
+import threading
+import time
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import AsyncMock, patch, MagicMock
 from pathlib import Path
 import types
 
 from GuideManager import GuideManager
+from LLMClient import reset_clients
 
 from LLMAnalyzer import DEFAULT_8D_PROMPT, LLMAnalyzer, OpenAIError
 
@@ -12,6 +16,7 @@ class LLMAnalyzerTest(unittest.TestCase):
     """Tests for LLMAnalyzer.analyze."""
 
     def setUp(self) -> None:
+        reset_clients()
         self.analyzer = LLMAnalyzer()
         self.guideline = {"fields": [{"id": "Step1"}, {"id": "Step2"}]}
 
@@ -36,6 +41,34 @@ class LLMAnalyzerTest(unittest.TestCase):
         result = self.analyzer.analyze(details, guideline)
         self.assertEqual(set(result.keys()), {"D1", "D2"})
 
+    def test_concurrent_steps_keep_order(self) -> None:
+        """Steps should run in parallel up to the limit and keep their order."""
+        analyzer = LLMAnalyzer(max_concurrency=2)
+        guideline = {"fields": [{"id": f"S{i}"} for i in range(5)]}
+        lock = threading.Lock()
+        active = [0]
+        peak = [0]
+
+        def fake_query(system_prompt: str, user_prompt: str) -> str:
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+            return user_prompt
+
+        with patch.object(analyzer, "_query_llm", side_effect=fake_query):
+            result = analyzer.analyze({"complaint": "c"}, guideline, language="")
+        self.assertEqual(list(result), [f"S{i}" for i in range(5)])
+        self.assertEqual(peak[0], 2)
+
+    def test_max_concurrency_env(self) -> None:
+        """``LLM_MAX_CONCURRENCY`` should set the default step concurrency."""
+        with patch.dict("os.environ", {"LLM_MAX_CONCURRENCY": "4"}):
+            self.assertEqual(LLMAnalyzer().max_concurrency, 4)
+        self.assertEqual(LLMAnalyzer(max_concurrency=0).max_concurrency, 1)
+
     @patch.object(LLMAnalyzer, "_query_llm", return_value="ok")
     @patch.object(LLMAnalyzer, "_load_8d_prompt", return_value=DEFAULT_8D_PROMPT)
     def test_8d_returns_full_text(self, mock_load, mock_query) -> None:  # type: ignore
@@ -69,6 +102,29 @@ class LLMAnalyzerTest(unittest.TestCase):
         call_args = mock_query.call_args[0]
         self.assertIn("Kullanıcıdan gelen özel talimatlar:\nd", call_args[1])
 
+    @patch.object(LLMAnalyzer, "_query_llm", return_value="ok")
+    def test_similar_cases_added_to_prompt(self, mock_query) -> None:  # type: ignore
+        """Similar past 8D reports should be added when an index is given."""
+        cases = MagicMock()
+        cases.similar.return_value = [
+            {
+                "material_code": "p",
+                "description": "çatlak",
+                "root_cause": "kalıp aşınması",
+                "permanent_action": "kalıp yenilendi",
+            }
+        ]
+        analyzer = LLMAnalyzer(cases=cases, similar_cases=2)
+        guideline = {"method": "8D", "fields": []}
+        details = {"complaint": "c", "subject": "s", "part_code": "p"}
+        analyzer.analyze(details, guideline, directives="d")
+        cases.similar.assert_called_with("p", "s c", 2)
+        prompt = mock_query.call_args[0][1]
+        self.assertIn("Kök Neden: kalıp aşınması", prompt)
+        self.assertLess(prompt.index("kalıp aşınması"), prompt.index("talimatlar"))
+        self.analyzer.analyze(details, guideline)
+        self.assertNotIn("Benzer geçmiş", mock_query.call_args[0][1])
+
     @patch.object(LLMAnalyzer, "_query_llm", return_value="ok")
     def test_directives_added_to_regular_prompt(self, mock_query) -> None:  # type: ignore
         """Directives should be appended for non-8D methods."""
@@ -100,16 +156,16 @@ class LLMAnalyzerTest(unittest.TestCase):
         call_args = mock_query.call_args[0]
         self.assertEqual(call_args[0], "CUSTOM")
 
-    def test_query_llm_fallback(self) -> None:
-        """``_query_llm`` should return a placeholder for non-auth errors."""
+    def test_query_llm_network_error_raises(self) -> None:
+        """API failures should raise ``OpenAIError`` instead of a placeholder."""
         mock_openai = types.ModuleType("openai")
         mock_client = MagicMock()
         mock_client.chat.completions.create.side_effect = Exception("network")
         mock_openai.OpenAI = MagicMock(return_value=mock_client)
         with patch.dict("sys.modules", {"openai": mock_openai}):
             with patch.dict("os.environ", {"OPENAI_API_KEY": "key"}):
-                result = self.analyzer._query_llm("sys", "prompt")
-        self.assertTrue(result.startswith("LLM response placeholder"))
+                with self.assertRaises(OpenAIError):
+                    self.analyzer._query_llm("sys", "prompt")
 
     def test_query_llm_logs_error(self) -> None:
         """Network errors should be logged for easier debugging."""
@@ -121,7 +177,8 @@ class LLMAnalyzerTest(unittest.TestCase):
         with patch.dict("sys.modules", {"openai": mock_openai}):
             with patch.dict("os.environ", {"OPENAI_API_KEY": "key"}):
                 with self.assertLogs("LLMAnalyzer", level="ERROR") as log:
-                    self.analyzer._query_llm("sys", "prompt")
+                    with self.assertRaises(OpenAIError):
+                        self.analyzer._query_llm("sys", "prompt")
         self.assertIn(f"LLMAnalyzer error: {exc}", "\n".join(log.output))
 
     def test_missing_api_key_raises(self) -> None:
@@ -144,6 +201,24 @@ class LLMAnalyzerTest(unittest.TestCase):
                 with self.assertRaises(OpenAIError):
                     self.analyzer._query_llm("sys", "prompt")
 
+    def test_client_reused_across_calls(self) -> None:
+        """The OpenAI client should be built once per API key."""
+        mock_openai = types.ModuleType("openai")
+        mock_client = MagicMock()
+        mock_client.chat.completions.create.side_effect = Exception("network")
+        mock_openai.OpenAI = MagicMock(return_value=mock_client)
+        with patch.dict("sys.modules", {"openai": mock_openai}):
+            with patch.dict("os.environ", {"OPENAI_API_KEY": "key"}):
+                for _ in range(2):
+                    with self.assertRaises(OpenAIError):
+                        self.analyzer._query_llm("sys", "prompt")
+            self.assertEqual(mock_openai.OpenAI.call_count, 1)
+            with patch.dict("os.environ", {"OPENAI_API_KEY": "other"}):
+                with self.assertRaises(OpenAIError):
+                    self.analyzer._query_llm("sys", "prompt")
+        self.assertEqual(mock_openai.OpenAI.call_count, 2)
+        self.assertEqual(mock_openai.OpenAI.call_args.kwargs["api_key"], "other")
+
     def test_init_uses_openai_model_env(self) -> None:
         """Default model should come from ``OPENAI_MODEL`` env variable."""
         with patch.dict("os.environ", {"OPENAI_MODEL": "gpt-test"}):
@@ -174,6 +249,142 @@ class LLMAnalyzerTest(unittest.TestCase):
         self.assertIn("LLMAnalyzer returned: ok", messages)
         self.assertIn("LLMAnalyzer._query_llm end", messages)
 
+    def test_analyze_async_uses_async_client(self) -> None:
+        """``analyze_async`` should await the async client for every step."""
+        mock_openai = types.ModuleType("openai")
+        mock_client = MagicMock()
+
+        async def create(**kwargs):
+            await asyncio.sleep(0)
+            message = types.SimpleNamespace(content=" ok ")
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+        mock_client.chat.completions.create = AsyncMock(side_effect=create)
+        mock_openai.AsyncOpenAI = MagicMock(return_value=mock_client)
+        analyzer = LLMAnalyzer(max_concurrency=2)
+        guideline = {"fields": [{"id": f"S{i}"} for i in range(3)]}
+        with patch.dict("sys.modules", {"openai": mock_openai}):
+            with patch.dict("os.environ", {"OPENAI_API_KEY": "key"}):
+                result = asyncio.run(
+                    analyzer.analyze_async({"complaint": "c"}, guideline, language="")
+                )
+        self.assertEqual(
+            result,
+            {f"S{i}": {"response": "ok"} for i in range(3)},
+        )
+        self.assertEqual(mock_client.chat.completions.create.await_count, 3)
+        mock_openai.AsyncOpenAI.assert_called_once()
+
+    def test_structured_mode_single_call_with_fallback(self) -> None:
+        """Structured mode should ask once and re-query only missing steps."""
+        analyzer = LLMAnalyzer(structured=True)
+        guideline = {"fields": [{"id": "S1"}, {"id": "S2"}, {"id": "S3"}]}
+        calls = []
+
+        def fake_query(system_prompt, user_prompt, json_mode=False):
+            calls.append((user_prompt, json_mode))
+            if json_mode:
+                return '{"S1": "one", "S2": {"k": "v"}, "S3": "  "}'
+            return "fallback"
+
+        with patch.object(analyzer, "_query_llm", side_effect=fake_query):
+            result = analyzer.analyze({"complaint": "c"}, guideline, "kısa yaz")
+        self.assertEqual(
+            result,
+            {
+                "S1": {"response": "one"},
+                "S2": {"response": '{"k": "v"}'},
+                "S3": {"response": "fallback"},
+            },
+        )
+        self.assertEqual(len(calls), 2)
+        combined, json_mode = calls[0]
+        self.assertTrue(json_mode)
+        self.assertIn("JSON", combined)
+        self.assertEqual(combined.count("kısa yaz"), 1)
+        self.assertIn("kısa yaz", calls[1][0])
+
+    def test_structured_mode_invalid_json_queries_each_step(self) -> None:
+        analyzer = LLMAnalyzer(structured=True)
+        with patch.object(analyzer, "_query_llm", return_value="not json") as mock_query:
+            result = analyzer.analyze({"complaint": "c"}, self.guideline)
+        self.assertEqual(
+            result,
+            {"Step1": {"response": "not json"}, "Step2": {"response": "not json"}},
+        )
+        self.assertEqual(mock_query.call_count, 3)
+
+    def test_structured_mode_plans_once(self) -> None:
+        """Past cases and step prompts should be built once per analysis."""
+        cases = MagicMock()
+        cases.similar.return_value = []
+        analyzer = LLMAnalyzer(structured=True, cases=cases, similar_cases=2)
+        answer = '{"Step1": "a", "Step2": "b"}'
+        with patch.object(analyzer, "_query_llm", return_value=answer), patch.object(
+            analyzer, "_bare_plan", wraps=analyzer._bare_plan
+        ) as bare_plan:
+            analyzer.analyze({"complaint": "c"}, self.guideline)
+        self.assertEqual(cases.similar.call_count, 1)
+        self.assertEqual(bare_plan.call_count, 1)
+
+    def test_structured_mode_env(self) -> None:
+        with patch.dict("os.environ", {"LLM_STRUCTURED_STEPS": "1"}):
+            self.assertTrue(LLMAnalyzer().structured)
+        with patch.dict("os.environ", {"LLM_STRUCTURED_STEPS": ""}):
+            self.assertFalse(LLMAnalyzer().structured)
+
+    def test_analyze_stream_tags_steps(self) -> None:
+        """Streamed deltas should be tagged with their step id in order."""
+        mock_openai = types.ModuleType("openai")
+
+        def chunk(text):
+            delta = types.SimpleNamespace(content=text)
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)])
+
+        mock_client = MagicMock()
+        mock_client.chat.completions.create.side_effect = lambda **kw: iter(
+            [chunk("a"), types.SimpleNamespace(choices=[]), chunk(None), chunk("b")]
+        )
+        mock_openai.OpenAI = MagicMock(return_value=mock_client)
+        with patch.dict("sys.modules", {"openai": mock_openai}):
+            with patch.dict("os.environ", {"OPENAI_API_KEY": "key"}):
+                events = list(
+                    self.analyzer.analyze_stream({"complaint": "c"}, self.guideline)
+                )
+        self.assertEqual(
+            events,
+            [
+                {"step": "Step1", "delta": "a"},
+                {"step": "Step1", "delta": "b"},
+                {"step": "Step2", "delta": "a"},
+                {"step": "Step2", "delta": "b"},
+            ],
+        )
+        self.assertTrue(mock_client.chat.completions.create.call_args.kwargs["stream"])
+
+    def test_analyze_stream_raises_mid_stream(self) -> None:
+        """A stream failing after some deltas should raise, not end quietly."""
+        mock_openai = types.ModuleType("openai")
+
+        def chunks(**kwargs):
+            delta = types.SimpleNamespace(content="Merhaba ")
+            yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)])
+            raise ConnectionError("reset")
+
+        mock_client = MagicMock()
+        mock_client.chat.completions.create.side_effect = chunks
+        mock_openai.OpenAI = MagicMock(return_value=mock_client)
+        events = []
+        with patch.dict("sys.modules", {"openai": mock_openai}), patch.dict(
+            "os.environ", {"OPENAI_API_KEY": "key", "LLM_MAX_RETRIES": "0"}
+        ), self.assertLogs("LLMAnalyzer", level="ERROR"):
+            with self.assertRaises(OpenAIError):
+                for event in self.analyzer.analyze_stream(
+                    {"complaint": "c"}, self.guideline
+                ):
+                    events.append(event)
+        self.assertEqual(events, [{"step": "Step1", "delta": "Merhaba "}])
+
 
 if __name__ == "__main__":
     unittest.main()
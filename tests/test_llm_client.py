@@ -0,0 +1,568 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import types
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import MagicMock, patch
+
+from LLMAnalyzer import LLMAnalyzer, OpenAIError
+from LLMClient import (
+    ClientProvider,
+    Completer,
+    ResponseCache,
+    get_backend,
+    get_response_cache,
+    iter_deltas,
+    reset_clients,
+)
+from LLMClient.metrics import LLMMetrics, tagged
+from LLMClient.ratelimit import (
+    AIMDController,
+    LLMUnavailableError,
+    RateLimiter,
+    TokenBucket,
+)
+from LLMClient.stub import StubClient, StubLLM, get_stub_llm, parse_distribution
+from LLMClient.stub_server import create_app
+from LLMClient.tokens import (
+    _encoding,
+    context_window,
+    count_tokens,
+    fit_sections,
+    prompt_budget,
+    truncate_tokens,
+)
+
+
+class ClientProviderTest(unittest.TestCase):
+    """Tests for the shared OpenAI client provider."""
+
+    def _mock_openai(self) -> types.ModuleType:
+        module = types.ModuleType("openai")
+        module.OpenAI = MagicMock(side_effect=lambda **kw: MagicMock())
+        return module
+
+    def test_rebuilds_only_on_config_change(self) -> None:
+        provider = ClientProvider(max_connections=3, timeout=5.0)
+        mock_openai = self._mock_openai()
+        with patch.dict("sys.modules", {"openai": mock_openai}):
+            first = provider.get("key")
+            self.assertIs(provider.get("key"), first)
+            other_url = provider.get("key", "http://localhost:9000/v1")
+            self.assertIsNot(other_url, first)
+            self.assertIsNot(provider.get("key2", "http://localhost:9000/v1"), other_url)
+        self.assertEqual(mock_openai.OpenAI.call_count, 3)
+        kwargs = mock_openai.OpenAI.call_args.kwargs
+        self.assertEqual(kwargs["base_url"], "http://localhost:9000/v1")
+        self.assertEqual(kwargs["timeout"], 5.0)
+
+    def test_env_settings_and_reset(self) -> None:
+        provider = ClientProvider()
+        mock_openai = self._mock_openai()
+        with patch.dict("sys.modules", {"openai": mock_openai}), patch.dict(
+            "os.environ", {"OPENAI_TIMEOUT": "12"}
+        ):
+            first = provider.get("key")
+            provider.reset()
+            self.assertIsNot(provider.get("key"), first)
+        self.assertEqual(mock_openai.OpenAI.call_args.kwargs["timeout"], 12.0)
+
+    def test_pool_limits_passed_to_http_client(self) -> None:
+        provider = ClientProvider(max_connections=7, timeout=1.0)
+        mock_openai = self._mock_openai()
+        mock_openai.DefaultHttpxClient = MagicMock()
+        with patch.dict("sys.modules", {"openai": mock_openai}):
+            provider.get("key")
+        limits = mock_openai.DefaultHttpxClient.call_args.kwargs["limits"]
+        self.assertEqual(limits.max_connections, 7)
+        self.assertEqual(limits.max_keepalive_connections, 7)
+
+
+class ResponseCacheTest(unittest.TestCase):
+    """Tests for the LLM response cache."""
+
+    def test_disk_tier_survives_restart(self) -> None:
+        with TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "cache.db"
+            cache = ResponseCache(path)
+            self.assertIsNone(cache.get("m", "sys", "user"))
+            cache.put("m", "sys", "user", "answer")
+            self.assertEqual(cache.get("m", "sys", "user"), "answer")
+            self.assertIsNone(cache.get("other", "sys", "user"))
+
+            reopened = ResponseCache(path)
+            self.assertEqual(reopened.get("m", "sys", "user"), "answer")
+            self.assertEqual(
+                reopened.stats(),
+                {
+                    "hits": 1,
+                    "disk_hits": 1,
+                    "misses": 0,
+                    "hit_rate": 1.0,
+                    "memory_entries": 1,
+                },
+            )
+
+    def test_ttl_and_lru_eviction(self) -> None:
+        with TemporaryDirectory() as tmpdir:
+            cache = ResponseCache(
+                Path(tmpdir) / "cache.db", ttl=10, max_entries=2, memory_entries=1
+            )
+            with patch("LLMClient.cache.time.time", return_value=100.0):
+                cache.put("m", None, "a", "A")
+            with patch("LLMClient.cache.time.time", return_value=101.0):
+                cache.put("m", None, "b", "B")
+            with patch("LLMClient.cache.time.time", return_value=101.5):
+                self.assertEqual(cache.get("m", None, "a"), "A")
+            with patch("LLMClient.cache.time.time", return_value=102.0):
+                cache.put("m", None, "c", "C")
+                self.assertIsNone(cache.get("m", None, "b"))
+                self.assertEqual(cache.get("m", None, "a"), "A")
+            with patch("LLMClient.cache.time.time", return_value=111.0):
+                self.assertIsNone(cache.get("m", None, "a"))
+                self.assertEqual(cache.get("m", None, "c"), "C")
+
+    def test_env_opt_in(self) -> None:
+        with patch.dict(os.environ, {"LLM_CACHE": ""}):
+            self.assertIsNone(get_response_cache())
+        with patch.dict(os.environ, {"LLM_CACHE": "1", "LLM_CACHE_PATH": ""}):
+            cache = get_response_cache()
+            self.assertIsNotNone(cache)
+            self.assertIsNone(cache.path)
+            self.assertIs(get_response_cache(), cache)
+
+    def test_analyzer_skips_llm_on_hit(self) -> None:
+        reset_clients()
+        mock_openai = types.ModuleType("openai")
+        client = MagicMock()
+        client.chat.completions.create.return_value = MagicMock(
+            choices=[MagicMock(message=MagicMock(content="result"))]
+        )
+        mock_openai.OpenAI = MagicMock(return_value=client)
+        analyzer = LLMAnalyzer(model="m", cache=ResponseCache())
+        with patch.dict("sys.modules", {"openai": mock_openai}), patch.dict(
+            os.environ, {"OPENAI_API_KEY": "key"}
+        ):
+            self.assertEqual(analyzer._query_llm("sys", "user"), "result")
+            self.assertEqual(analyzer._query_llm("sys", "user"), "result")
+        reset_clients()
+        client.chat.completions.create.assert_called_once()
+        self.assertEqual(analyzer.cache.stats()["hits"], 1)
+
+    def test_disk_tier_read_without_lock(self) -> None:
+        with TemporaryDirectory() as tmpdir:
+            cache = ResponseCache(Path(tmpdir) / "cache.db", memory_entries=0)
+            connect = cache._connect
+            held = []
+
+            def checked_connect():
+                held.append(cache._lock.locked())
+                return connect()
+
+            with patch.object(cache, "_connect", side_effect=checked_connect):
+                cache.put("m", None, "user", "answer")
+                self.assertEqual(cache.get("m", None, "user"), "answer")
+        self.assertEqual(held, [False, False])
+
+
+class CompleterTest(unittest.TestCase):
+    """Tests for the completion helper shared by the components."""
+
+    def setUp(self) -> None:
+        self.completer = Completer(
+            "test", ValueError, logging.getLogger("test"), "Test"
+        )
+        self.messages = [{"role": "user", "content": "soru"}]
+
+    def test_async_cache_and_metrics_off_the_event_loop(self) -> None:
+        threads = {}
+
+        class RecordingCache(ResponseCache):
+            def get(self, *args):
+                threads["get"] = threading.get_ident()
+                return super().get(*args)
+
+            def put(self, *args):
+                threads["put"] = threading.get_ident()
+                super().put(*args)
+
+        metrics = MagicMock()
+        metrics.record.side_effect = lambda *a, **k: threads.setdefault(
+            "record", threading.get_ident()
+        )
+        response = types.SimpleNamespace(
+            choices=[
+                types.SimpleNamespace(message=types.SimpleNamespace(content=" ok "))
+            ],
+            usage=None,
+        )
+        client = MagicMock()
+        client.chat.completions.create = MagicMock(
+            side_effect=lambda **kw: asyncio.sleep(0, response)
+        )
+
+        async def run() -> str:
+            threads["loop"] = threading.get_ident()
+            return await self.completer.complete_async(
+                "m", self.messages, RecordingCache()
+            )
+
+        with patch.dict(os.environ, {"LLM_BACKEND": "stub"}), patch(
+            "LLMClient.completion.get_async_client", return_value=client
+        ), patch("LLMClient.completion.get_metrics", return_value=metrics):
+            self.assertEqual(asyncio.run(run()), "ok")
+        loop = threads.pop("loop")
+        self.assertEqual(set(threads), {"get", "put", "record"})
+        self.assertNotIn(loop, threads.values())
+
+    def test_failures_raise_error_type(self) -> None:
+        client = MagicMock()
+        client.chat.completions.create.side_effect = RuntimeError("network")
+        with patch.dict(os.environ, {"LLM_BACKEND": "stub", "LLM_CACHE": ""}), patch(
+            "LLMClient.completion.get_client", return_value=client
+        ), self.assertLogs("test", level="ERROR"):
+            with self.assertRaises(ValueError):
+                self.completer.complete("m", self.messages)
+            with self.assertRaises(ValueError):
+                list(self.completer.stream("m", self.messages))
+
+    def test_missing_api_key_raises(self) -> None:
+        env = {"LLM_BACKEND": "openai", "OPENAI_API_KEY": "", "LLM_CACHE": ""}
+        with patch.dict(os.environ, env), patch(
+            "LLMClient.completion.get_client"
+        ) as get_client:
+            with self.assertRaises(ValueError):
+                self.completer.complete("m", self.messages)
+            with self.assertRaises(ValueError):
+                asyncio.run(self.completer.complete_async("m", self.messages))
+            with self.assertRaises(ValueError):
+                list(self.completer.stream("m", self.messages))
+        get_client.assert_not_called()
+
+
+class StatusError(Exception):
+    """Stand-in for an OpenAI API error carrying a status code."""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+        self.response = types.SimpleNamespace(headers=headers or {})
+
+
+class RateLimiterTest(unittest.TestCase):
+    """Tests for the token buckets, AIMD controller and retries."""
+
+    def test_token_bucket_waits_for_debt(self) -> None:
+        with patch("LLMClient.ratelimit.time.monotonic", return_value=0.0):
+            bucket = TokenBucket(per_minute=60)
+            self.assertEqual(bucket.reserve(50), 0.0)
+            self.assertAlmostEqual(bucket.reserve(20), 10.0)
+            bucket.adjust(-20)
+            self.assertEqual(bucket.reserve(10), 0.0)
+        with patch("LLMClient.ratelimit.time.monotonic", return_value=30.0):
+            self.assertEqual(bucket.reserve(30), 0.0)
+
+    def test_aimd_shrinks_once_per_burst_and_grows(self) -> None:
+        controller = AIMDController(maximum=8, cooldown=1.0)
+        with patch("LLMClient.ratelimit.time.monotonic", return_value=10.0):
+            controller.on_throttle()
+            controller.on_throttle()
+        self.assertEqual(controller.limit, 4.0)
+        for _ in range(4):
+            controller.on_success()
+        self.assertGreater(controller.limit, 4.9)
+        self.assertTrue(all(controller.try_acquire() for _ in range(4)))
+        self.assertFalse(controller.try_acquire())
+        controller.release()
+        self.assertTrue(controller.try_acquire())
+
+    def test_async_acquire_woken_by_release(self) -> None:
+        controller = AIMDController(maximum=1)
+        controller.acquire()
+
+        async def run() -> None:
+            waiter = asyncio.ensure_future(controller.acquire_async())
+            await asyncio.sleep(0)
+            self.assertFalse(waiter.done())
+            threading.Thread(target=controller.release).start()
+            await asyncio.wait_for(waiter, 5)
+
+        asyncio.run(run())
+        self.assertEqual(controller.in_flight, 1)
+
+    def test_retries_honour_retry_after(self) -> None:
+        limiter = RateLimiter(max_in_flight=16, max_retries=3)
+        func = MagicMock(
+            side_effect=[StatusError(429, {"retry-after": "7"}), StatusError(503), "ok"]
+        )
+        with patch("LLMClient.ratelimit.time.sleep") as sleep, patch(
+            "LLMClient.ratelimit.random.uniform", return_value=1.0
+        ):
+            self.assertEqual(limiter.call(func), "ok")
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [7.0, 2.0])
+        self.assertEqual(limiter.concurrency.limit, 8.0 + 1 / 8.0)
+        self.assertEqual(limiter.concurrency.in_flight, 0)
+
+    def test_non_retryable_and_exhausted(self) -> None:
+        limiter = RateLimiter(max_retries=1)
+        with self.assertRaises(StatusError):
+            limiter.call(MagicMock(side_effect=StatusError(400)))
+        with patch("LLMClient.ratelimit.time.sleep"):
+            with self.assertRaises(LLMUnavailableError):
+                limiter.call(MagicMock(side_effect=StatusError(500)))
+
+    def test_analyzer_raises_when_retries_exhausted(self) -> None:
+        reset_clients()
+        mock_openai = types.ModuleType("openai")
+        client = MagicMock()
+        client.chat.completions.create.side_effect = StatusError(429)
+        mock_openai.OpenAI = MagicMock(return_value=client)
+        env = {"OPENAI_API_KEY": "key", "LLM_MAX_RETRIES": "2"}
+        with patch.dict("sys.modules", {"openai": mock_openai}), patch.dict(
+            os.environ, env
+        ), patch("LLMClient.ratelimit.time.sleep"):
+            with self.assertRaises(OpenAIError):
+                LLMAnalyzer()._query_llm("sys", "user")
+        reset_clients()
+        self.assertEqual(client.chat.completions.create.call_count, 3)
+
+
+class LLMMetricsTest(unittest.TestCase):
+    """Tests for LLM call metrics."""
+
+    def test_summary_groups_by_tags(self) -> None:
+        metrics = LLMMetrics(prices={"m": (1.0, 2.0)})
+        usage = types.SimpleNamespace(
+            prompt_tokens=100, completion_tokens=50, total_tokens=150
+        )
+        with tagged(method="A3"):
+            for latency in (0.1, 0.2, 0.3, 0.4):
+                with tagged(step="S1"):
+                    metrics.record("analyzer", "m", latency, usage)
+            metrics.record("analyzer", "m", 1.0, error=True, tags={"step": "S2"})
+        rows = metrics.summary()
+        self.assertEqual([r["step"] for r in rows], ["S1", "S2"])
+        first = rows[0]
+        self.assertEqual(first["method"], "A3")
+        self.assertEqual((first["calls"], first["total_tokens"]), (4, 600))
+        self.assertEqual(first["latency_p50"], 0.2)
+        self.assertEqual(first["latency_p99"], 0.4)
+        self.assertAlmostEqual(first["cost"], 0.8)
+        self.assertEqual((rows[1]["method"], rows[1]["errors"]), ("", 1))
+
+    def test_persists_json_lines(self) -> None:
+        with TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "metrics.jsonl"
+            metrics = LLMMetrics(path)
+            metrics.record("review", "m", 0.5, tags={"method": "8D", "step": "review"})
+            metrics.record("review", "m", 0.7, tags={"method": "8D", "step": "review"})
+            lines = path.read_text(encoding="utf-8").splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('"method": "8D"', lines[0])
+
+    def test_analyzer_records_step_tags(self) -> None:
+        reset_clients()
+        mock_openai = types.ModuleType("openai")
+        client = MagicMock()
+        usage = types.SimpleNamespace(prompt_tokens=3, completion_tokens=2, total_tokens=5)
+        client.chat.completions.create.return_value = types.SimpleNamespace(
+            choices=[types.SimpleNamespace(message=types.SimpleNamespace(content="x"))],
+            usage=usage,
+        )
+        mock_openai.OpenAI = MagicMock(return_value=client)
+        metrics = LLMMetrics()
+        guideline = {"fields": [{"id": "S1"}, {"id": "S2"}]}
+        with patch.dict("sys.modules", {"openai": mock_openai}), patch.dict(
+            os.environ, {"OPENAI_API_KEY": "key"}
+        ), patch("LLMClient.completion.get_metrics", return_value=metrics):
+            LLMAnalyzer(max_concurrency=2).analyze({"complaint": "c"}, guideline)
+        reset_clients()
+        rows = {r["step"]: r for r in metrics.summary()}
+        self.assertEqual(set(rows), {"S1", "S2"})
+        self.assertEqual(rows["S1"]["component"], "analyzer")
+        self.assertEqual(rows["S2"]["total_tokens"], 5)
+
+
+class TokenBudgetTest(unittest.TestCase):
+    """Tests for local token counting and prompt budgets."""
+
+    def test_context_window_by_prefix_and_override(self) -> None:
+        with patch.dict(os.environ, {}, clear=False):
+            os.environ.pop("LLM_CONTEXT_WINDOW", None)
+            self.assertEqual(context_window("gpt-4"), 8192)
+            self.assertEqual(context_window("gpt-4o-mini"), 128000)
+            self.assertEqual(context_window("gpt-3.5-turbo-0125"), 16385)
+            self.assertEqual(context_window("local-model"), 8192)
+        env = {"LLM_CONTEXT_WINDOW": "2000", "LLM_MAX_OUTPUT_TOKENS": "500"}
+        with patch.dict(os.environ, env):
+            self.assertEqual(
+                prompt_budget("gpt-4o"),
+                {"context_window": 2000, "output_tokens": 500, "budget": 1500},
+            )
+
+    def test_encoding_failure_falls_back_to_estimate(self) -> None:
+        tiktoken = types.ModuleType("tiktoken")
+        tiktoken.encoding_for_model = MagicMock(side_effect=KeyError("model"))
+        tiktoken.get_encoding = MagicMock(side_effect=OSError("offline"))
+        _encoding.cache_clear()
+        try:
+            with patch.dict("sys.modules", {"tiktoken": tiktoken}), patch(
+                "LLMClient.tokens._encoding_warned", False
+            ), self.assertLogs("LLMClient.tokens", level="WARNING") as log:
+                self.assertEqual(count_tokens("abcdefg", "gpt-x"), 2)
+                self.assertEqual(count_tokens("abcdefg", "gpt-y"), 2)
+        finally:
+            _encoding.cache_clear()
+        self.assertEqual(len(log.output), 1)
+
+    def test_truncate_tokens(self) -> None:
+        text = "kelime " * 500
+        self.assertEqual(truncate_tokens("short", 10), "short")
+        cut = truncate_tokens(text, 50)
+        self.assertLessEqual(count_tokens(cut), 50)
+        self.assertTrue(cut.endswith("[...]"))
+        self.assertTrue(text.startswith(cut[: -len("\n[...]")]))
+
+    def test_fit_sections_trims_lowest_priority_first(self) -> None:
+        sections = {"main": "ana metin " * 50, "extra": "ek " * 500}
+
+        def render(parts: dict) -> str:
+            return parts["main"] + "\n" + parts["extra"]
+
+        fitted, tokens = fit_sections(render, sections, ["extra", "main"], 200)
+        self.assertLessEqual(tokens, 200)
+        self.assertEqual(fitted["main"], sections["main"])
+        self.assertLess(len(fitted["extra"]), len(sections["extra"]))
+
+    def test_analyzer_trims_directives_and_rejects_oversized(self) -> None:
+        analyzer = LLMAnalyzer(model="gpt-4")
+        env = {"LLM_CONTEXT_WINDOW": "1000", "LLM_MAX_OUTPUT_TOKENS": "200"}
+        with patch.dict(os.environ, env):
+            prompt = analyzer._append_instructions("Şikayet", "talimat " * 2000, "")
+            self.assertIn("Şikayet", prompt)
+            self.assertLessEqual(
+                count_tokens(prompt), prompt_budget(analyzer.model)["budget"]
+            )
+            with patch.dict(os.environ, {"OPENAI_API_KEY": "key"}), patch(
+                "LLMClient.completion.get_client"
+            ) as get:
+                with self.assertRaises(OpenAIError):
+                    analyzer._query_llm("sistem " * 2000, "user")
+            get.assert_not_called()
+
+
+class StubBackendTest(unittest.TestCase):
+    """Tests for the local stub backend and its HTTP server."""
+
+    def _stub(self) -> StubLLM:
+        return StubLLM(latency="0", tokens_per_second="1e6", completion_tokens="20")
+
+    def test_parse_distribution(self) -> None:
+        import random
+
+        rng = random.Random(1)
+        self.assertEqual(parse_distribution("0.5")(rng), 0.5)
+        value = parse_distribution("uniform:1,2")(rng)
+        self.assertTrue(1 <= value <= 2)
+        self.assertGreaterEqual(parse_distribution("normal:0,5")(rng), 0.0)
+        with self.assertRaises(ValueError):
+            parse_distribution("uniform:1")
+        with self.assertRaises(ValueError):
+            parse_distribution("gamma:1,2")
+
+    def test_deterministic_completion_and_stream(self) -> None:
+        client = StubClient(self._stub())
+        messages = [{"role": "user", "content": "Şikayet"}]
+        first = client.chat.completions.create(model="m", messages=messages)
+        second = client.chat.completions.create(model="m", messages=messages)
+        text = first.choices[0].message.content
+        self.assertEqual(text, second.choices[0].message.content)
+        self.assertEqual(first.usage.completion_tokens, 20)
+        usage = []
+        stream = client.chat.completions.create(
+            model="m",
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        self.assertEqual("".join(iter_deltas(stream, usage.append)), text)
+        self.assertEqual(usage[0].total_tokens, first.usage.total_tokens)
+
+    def test_analyzer_uses_stub_without_api_key(self) -> None:
+        env = {
+            "LLM_BACKEND": "stub",
+            "LLM_STUB_LATENCY": "0",
+            "LLM_STUB_TOKENS_PER_SECOND": "1e6",
+            "LLM_STUB_COMPLETION_TOKENS": "5",
+        }
+        with patch.dict(os.environ, env):
+            os.environ.pop("OPENAI_API_KEY", None)
+            analyzer = LLMAnalyzer()
+            answer = analyzer._query_llm("sys", "user")
+            self.assertEqual(len(answer.split()), 5)
+            self.assertEqual(asyncio.run(analyzer._query_llm_async("sys", "user")), answer)
+        with patch.dict(os.environ, {"LLM_BACKEND": "other"}):
+            with self.assertRaises(ValueError):
+                get_backend()
+
+    def test_json_mode_answers_each_step(self) -> None:
+        client = StubClient(self._stub())
+        prompt = "### D1\nEkip\n\n### D2\nProblem\n---\nJSON"
+        response = client.chat.completions.create(
+            model="m",
+            messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"},
+        )
+        data = json.loads(response.choices[0].message.content)
+        self.assertEqual(list(data), ["D1", "D2"])
+        self.assertEqual(len(" ".join(data.values()).split()), 20)
+
+    def test_structured_analysis_makes_one_call(self) -> None:
+        env = {
+            "LLM_BACKEND": "stub",
+            "LLM_CACHE": "",
+            "LLM_STUB_LATENCY": "0",
+            "LLM_STUB_TOKENS_PER_SECOND": "1e6",
+            "LLM_STUB_COMPLETION_TOKENS": "30",
+        }
+        guideline = {"fields": [{"id": "S1"}, {"id": "S2"}, {"id": "S3"}]}
+        with patch.dict(os.environ, env):
+            llm = get_stub_llm()
+            with patch.object(llm, "create", wraps=llm.create) as create:
+                result = LLMAnalyzer(structured=True).analyze(
+                    {"complaint": "c"}, guideline
+                )
+        create.assert_called_once()
+        self.assertEqual(list(result), ["S1", "S2", "S3"])
+        self.assertTrue(all(step["response"] for step in result.values()))
+
+    def test_server_speaks_openai_protocol(self) -> None:
+        from fastapi.testclient import TestClient
+
+        client = TestClient(create_app(self._stub()))
+        body = {"model": "m", "messages": [{"role": "user", "content": "x"}]}
+        data = client.post("/v1/chat/completions", json=body).json()
+        text = data["choices"][0]["message"]["content"]
+        self.assertEqual(data["usage"]["completion_tokens"], 20)
+        body.update(stream=True, stream_options={"include_usage": True})
+        resp = client.post("/v1/chat/completions", json=body)
+        events = [
+            line[len("data: ") :]
+            for line in resp.text.splitlines()
+            if line.startswith("data: ")
+        ]
+        self.assertEqual(events[-1], "[DONE]")
+        chunks = [json.loads(event) for event in events[:-1]]
+        streamed = "".join(
+            c["choices"][0]["delta"].get("content", "") for c in chunks if c["choices"]
+        )
+        self.assertEqual(streamed, text)
+        self.assertEqual(chunks[-1]["usage"], data["usage"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,11 +3,19 @@ from pathlib import Path
 import unittest
 from unittest.mock import patch
 import os
+import time
 from fpdf import FPDF
 from openpyxl import Workbook
 
 from GuideManager import GuideManager
-from ReportGenerator import ReportGenerator
+import ReportGenerator as report_module
+from ReportGenerator import (
+    DiskReportStore,
+    MemoryReportStore,
+    ReportGenerator,
+    clear_font_cache,
+    shutdown_pool,
+)
 
 
 class ReportGeneratorTest(unittest.TestCase):
@@ -83,6 +91,7 @@ class ReportGeneratorTest(unittest.TestCase):
             called.append(fname)
             return original_add_font(self, family, style, fname, uni)
 
+        clear_font_cache()
         with tempfile.TemporaryDirectory() as tmpdir, \
              patch.dict(os.environ, {"FONT_PATH": str(font)}, clear=False), \
              patch.object(FPDF, "add_font", new=wrapped_add_font):
@@ -90,6 +99,34 @@ class ReportGeneratorTest(unittest.TestCase):
 
         self.assertEqual(Path(called[0]), font)
 
+    def test_font_parsed_once_per_process(self) -> None:
+        """Reports after the first should reuse the parsed font."""
+        analysis = {"Adım": {"response": "İşlem tamam"}}
+        info = {"customer": "Müşteri"}
+        clear_font_cache()
+        with tempfile.TemporaryDirectory() as tmpdir, \
+             patch.object(FPDF, "add_font", autospec=True, side_effect=FPDF.add_font) as add:
+            paths = [self.generator.generate(analysis, info, tmpdir) for _ in range(3)]
+            sizes = {Path(p["pdf"]).stat().st_size for p in paths}
+            header = Path(paths[-1]["pdf"]).read_bytes()[:5]
+
+        self.assertEqual(add.call_count, 1)
+        self.assertEqual(len(sizes), 1)
+        self.assertEqual(header, b"%PDF-")
+
+    def test_other_fpdf_versions_add_font_per_document(self) -> None:
+        """Unknown fpdf releases should not get the cached font tables."""
+        analysis = {"Adım": {"response": "İşlem tamam"}}
+        info = {"customer": "Müşteri"}
+        clear_font_cache()
+        with tempfile.TemporaryDirectory() as tmpdir, \
+             patch("ReportGenerator.FPDF_VERSION", "1.7.3"), \
+             patch.object(FPDF, "add_font", autospec=True, side_effect=FPDF.add_font) as add:
+            for _ in range(2):
+                self.generator.generate(analysis, info, tmpdir)
+
+        self.assertEqual(add.call_count, 2)
+
     def test_generate_uses_epw_if_available(self) -> None:
         """``epw`` attribute should control cell width when present."""
         analysis = {"Step": {"response": "foo"}}
@@ -150,6 +187,60 @@ class ReportGeneratorTest(unittest.TestCase):
         occurrences = [line for line in pdf.lines if 'dup' in line]
         self.assertEqual(len(occurrences), 1)
 
+    def test_generate_in_process_pool(self) -> None:
+        """Both files should be rendered by the reusable worker pool."""
+        analysis = {"Adım1": {"response": "İşlem tamam"}}
+        info = {"customer": "Müşteri"}
+        generator = ReportGenerator(self.manager, processes=2)
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                first = generator.generate(analysis, info, tmpdir)
+                pool = report_module._pool
+                second = generator.generate(analysis, info, tmpdir)
+                self.assertIs(report_module._pool, pool)
+                for paths in (first, second):
+                    self.assertEqual(Path(paths["pdf"]).read_bytes()[:5], b"%PDF-")
+                    self.assertTrue(Path(paths["excel"]).exists())
+                # A directory in place of the PDF makes the worker fail
+                (Path(tmpdir) / "report_taken.pdf").mkdir()
+                with patch("ReportGenerator.uuid4") as mock_uuid, \
+                     self.assertRaises(OSError), \
+                     self.assertLogs("ReportGenerator", level="ERROR"):
+                    mock_uuid.return_value.hex = "taken"
+                    generator.generate(analysis, info, tmpdir)
+        finally:
+            shutdown_pool()
+        self.assertIsNone(report_module._pool)
+
+    def test_render_returns_bytes(self) -> None:
+        analysis = {"Step1": {"response": "Kök neden"}}
+        info = {"customer": "Müşteri"}
+        with patch.object(FPDF, "output", wraps=FPDF.output, autospec=True) as out:
+            files = self.generator.render(analysis, info)
+            pdf_only = self.generator.render(analysis, info, ("pdf",))
+        self.assertEqual(out.call_args.kwargs, {"dest": "S"})
+        self.assertTrue(files["pdf"].startswith(b"%PDF-"))
+        self.assertTrue(files["excel"].startswith(b"PK"))
+        self.assertEqual(list(pdf_only), ["pdf"])
+
+    def test_generate_uses_report_id(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = self.generator.generate({"S": {"response": "x"}}, {}, tmpdir, "abc")
+        self.assertEqual(Path(paths["pdf"]).name, "report_abc.pdf")
+        self.assertEqual(Path(paths["excel"]).name, "report_abc.xlsx")
+
+    def test_render_logs_on_pdf_error(self) -> None:
+        with patch.object(FPDF, "output", side_effect=ValueError("boom")), \
+             self.assertLogs("ReportGenerator", level="ERROR") as log:
+            with self.assertRaises(ValueError):
+                self.generator.render({"Step": {"response": "foo"}}, {})
+        self.assertIn("Failed to create report file", "\n".join(log.output))
+
+    def test_processes_env(self) -> None:
+        with patch.dict(os.environ, {"REPORT_PROCESSES": "3"}):
+            self.assertEqual(ReportGenerator(self.manager).processes, 3)
+        self.assertEqual(ReportGenerator(self.manager, processes=0).processes, 0)
+
     def test_generate_logs_on_pdf_error(self) -> None:
         """Errors during PDF output should be logged and re-raised."""
         analysis = {"Step": {"response": "foo"}}
@@ -175,5 +266,153 @@ class ReportGeneratorTest(unittest.TestCase):
         self.assertIn("Failed to create report file", "\n".join(log.output))
 
 
+class MemoryReportStoreTest(unittest.TestCase):
+    """Tests for MemoryReportStore."""
+
+    def test_evicts_least_recently_used(self) -> None:
+        store = MemoryReportStore(max_bytes=10)
+        store.put("a", {"pdf": b"1234"})
+        store.put("b", {"pdf": b"1234"})
+        self.assertEqual(store.get("a", "pdf"), b"1234")
+        store.put("c", {"pdf": b"1234"})
+        self.assertIsNone(store.get("b", "pdf"))
+        self.assertEqual(store.get("a", "pdf"), b"1234")
+        self.assertIsNone(store.get("a", "excel"))
+        stats = store.stats()
+        self.assertEqual(stats["reports"], 2)
+        self.assertEqual(stats["bytes"], 8)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 2))
+
+    def test_keeps_oversized_report(self) -> None:
+        store = MemoryReportStore(max_bytes=2)
+        store.put("a", {"pdf": b"1"})
+        store.put("b", {"pdf": b"12345"})
+        self.assertEqual(len(store), 1)
+        self.assertEqual(store.get("b", "pdf"), b"12345")
+
+
+class DiskReportStoreTest(unittest.TestCase):
+    """Tests for DiskReportStore."""
+
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+
+    def _create(self, key: str, size: int = 4) -> dict:
+        paths = {
+            "pdf": str(self.dir / f"report_{key}.pdf"),
+            "excel": str(self.dir / f"report_{key}.xlsx"),
+        }
+        for path in paths.values():
+            Path(path).write_bytes(b"x" * size)
+        return paths
+
+    def test_report_key_is_content_hash(self) -> None:
+        key = report_module.report_key({"D1": {"response": "r"}}, {"a": "b"})
+        self.assertEqual(
+            key, report_module.report_key({"D1": {"response": "r"}}, {"a": "b"})
+        )
+        self.assertNotEqual(key, report_module.report_key({}, {"a": "b"}))
+        self.assertNotEqual(
+            key, report_module.report_key({"D1": {"response": "r"}}, {"a": "b"}, "v2")
+        )
+        self.assertEqual(len(key), 64)
+
+    def test_render_version_tracks_font_file(self) -> None:
+        font = Path(__file__).resolve().parents[1] / "Fonts" / "DejaVuSans.ttf"
+        copy = self.dir / "font.ttf"
+        copy.write_bytes(font.read_bytes())
+        with patch.dict(os.environ, {"FONT_PATH": str(font)}):
+            version = report_module.render_version()
+        with patch.dict(os.environ, {"FONT_PATH": str(copy)}):
+            moved = report_module.render_version()
+            copy.write_bytes(font.read_bytes() + b"\0")
+            replaced = report_module.render_version()
+        self.assertEqual(len({version, moved, replaced}), 3)
+        self.assertTrue(version.startswith(report_module.RENDER_VERSION))
+
+    def test_get_or_create_renders_once(self) -> None:
+        store = DiskReportStore(self.dir)
+        calls = []
+
+        def create(key: str) -> dict:
+            calls.append(key)
+            return self._create(key)
+
+        first = store.get_or_create("k", create)
+        second = store.get_or_create("k", create)
+        self.assertEqual(first, second)
+        self.assertEqual(calls, ["k"])
+        stats = store.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["bytes"], 8)
+        Path(first["pdf"]).unlink()
+        store.get_or_create("k", create)
+        self.assertEqual(calls, ["k", "k"])
+
+    def test_evicts_least_recently_used_over_size(self) -> None:
+        store = DiskReportStore(self.dir, max_bytes=20, max_age=0, grace=0)
+        store.add("a", self._create("a"))
+        store.add("b", self._create("b"))
+        self.assertIsNotNone(store.get("a"))
+        store.add("c", self._create("c", size=6))
+        self.assertIsNone(store.get("b"))
+        self.assertFalse((self.dir / "report_b.pdf").exists())
+        self.assertIsNotNone(store.get("a"))
+        self.assertEqual(store.stats()["bytes"], 20)
+        self.assertEqual(store.stats()["evictions"], 1)
+
+    def test_expires_and_adopts_existing_files(self) -> None:
+        self._create("old")
+        past = time.time() - 100
+        for path in self.dir.iterdir():
+            os.utime(path, (past, past))
+        self._create("new")
+        store = DiskReportStore(self.dir, max_bytes=0, max_age=50, grace=0)
+        self.assertIsNone(store.get("old"))
+        self.assertFalse((self.dir / "report_old.xlsx").exists())
+        self.assertEqual(
+            store.get("new"), {
+                "pdf": str(self.dir / "report_new.pdf"),
+                "excel": str(self.dir / "report_new.xlsx"),
+            }
+        )
+
+    def test_recently_returned_reports_are_kept(self) -> None:
+        store = DiskReportStore(self.dir, max_bytes=10, max_age=0, grace=60)
+        store.add("a", self._create("a"))
+        store.add("b", self._create("b"))
+        self.assertTrue((self.dir / "report_a.pdf").exists())
+        self.assertEqual(store.prune(), 0)
+        later = time.time() + 120
+        with patch("ReportGenerator.store.time.time", return_value=later):
+            self.assertIsNotNone(store.get("b"))
+            self.assertEqual(store.prune(), 1)
+        self.assertFalse((self.dir / "report_a.pdf").exists())
+        self.assertTrue((self.dir / "report_b.pdf").exists())
+
+    def test_prune_expires_idle_reports(self) -> None:
+        store = DiskReportStore(self.dir, max_bytes=0, max_age=50, grace=0)
+        store.add("a", self._create("a"))
+        self.assertEqual(store.prune(), 0)
+        later = time.time() + 100
+        with patch("ReportGenerator.store.time.time", return_value=later):
+            self.assertEqual(store.prune(), 1)
+        self.assertEqual(list(self.dir.iterdir()), [])
+        self.assertEqual(store.stats()["evictions"], 1)
+
+    def test_keeps_files_outside_directory(self) -> None:
+        with tempfile.TemporaryDirectory() as other:
+            outside = Path(other) / "report_x.pdf"
+            outside.write_bytes(b"x" * 10)
+            store = DiskReportStore(self.dir, max_bytes=5, max_age=0, grace=0)
+            store.add("x", {"pdf": str(outside)})
+            store.add("y", self._create("y"))
+            self.assertTrue(outside.exists())
+            self.assertEqual(len(store), 1)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,10 +1,11 @@
 import os
 import tempfile
+import types
 import unittest
 from pathlib import Path
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
-from Review import Review
+from Review import Review, ReviewLLMError
 
 
 class ReviewPromptTest(unittest.TestCase):
@@ -46,5 +47,46 @@ class ReviewPromptTest(unittest.TestCase):
             self.assertEqual(review.template, self.default_content)
 
 
+class ReviewBudgetTest(unittest.TestCase):
+    """Tests for fitting the review prompt into the model context."""
+
+    def test_guideline_json_trimmed_before_report(self) -> None:
+        review = Review(model="gpt-4")
+        review.template = "{initial_report_text}\n{guideline_json}"
+        env = {"LLM_CONTEXT_WINDOW": "1000", "LLM_MAX_OUTPUT_TOKENS": "200"}
+        with patch.dict(os.environ, env):
+            prompt = review._build_prompt(
+                "RAPOR " * 50, guideline_json='{"adim": "tanim"} ' * 1000
+            )
+        self.assertTrue(prompt.startswith("RAPOR " * 50))
+        self.assertTrue(prompt.endswith("[...]"))
+        self.assertLess(len(prompt), 4000)
+
+    def test_oversized_prompt_rejected_before_request(self) -> None:
+        review = Review(model="gpt-4")
+        env = {"LLM_CONTEXT_WINDOW": "1000", "OPENAI_API_KEY": "key"}
+        with patch.dict(os.environ, env), patch(
+            "LLMClient.completion.get_client"
+        ) as get:
+            with self.assertRaises(ReviewLLMError):
+                review._query_llm("metin " * 2000)
+        get.assert_not_called()
+
+
+class ReviewStreamTest(unittest.TestCase):
+    """Tests for Review.perform_stream."""
+
+    def test_failure_before_first_delta_raises(self) -> None:
+        mock_openai = types.ModuleType("openai")
+        mock_client = MagicMock()
+        mock_client.chat.completions.create.side_effect = ValueError("bad request")
+        mock_openai.OpenAI = MagicMock(return_value=mock_client)
+        with patch.dict("sys.modules", {"openai": mock_openai}), patch.dict(
+            os.environ, {"OPENAI_API_KEY": "key", "LLM_CACHE": ""}
+        ), self.assertLogs("Review", level="ERROR"):
+            with self.assertRaises(ReviewLLMError):
+                list(Review().perform_stream("metin"))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -2,6 +2,7 @@ import os
 import unittest
 from pathlib import Path
 from tempfile import TemporaryDirectory
+from unittest.mock import patch
 
 from fastapi.testclient import TestClient
 from dotenv import dotenv_values
@@ -13,6 +14,8 @@ class SetupEndpointTest(unittest.TestCase):
     """Tests for the /setup endpoint."""
 
     def setUp(self) -> None:
+        self.env = patch.dict(os.environ)
+        self.env.start()
         self.tmpdir = TemporaryDirectory()
         self.env_path = Path(self.tmpdir.name) / ".env"
         os.environ["ENV_FILE"] = str(self.env_path)
@@ -20,7 +23,7 @@ class SetupEndpointTest(unittest.TestCase):
 
     def tearDown(self) -> None:
         self.tmpdir.cleanup()
-        os.environ.pop("ENV_FILE", None)
+        self.env.stop()
 
     def test_setup_writes_env_file(self) -> None:
         response = self.client.post(
@@ -31,6 +34,7 @@ class SetupEndpointTest(unittest.TestCase):
         data = dotenv_values(self.env_path)
         self.assertEqual(data.get("OPENAI_API_KEY"), "sk-test")
         self.assertEqual(data.get("COMPLAINTS_XLSX_PATH"), "/tmp/test.xlsx")
+        self.assertEqual(os.environ["OPENAI_API_KEY"], "sk-test")
 
 
 if __name__ == "__main__":